@@ -4,8 +4,8 @@ from django.utils.decorators import method_decorator
 from django.core.exceptions import ValidationError
 from .models import (
     Category, Product, ProductImage, StoreProduct, 
-    Ingredient, StoreIngredient, ProductIngredient,
-    ProductSuggestion, ProductReview
+    Ingredient, StoreIngredient, ProductIngredient, IngredientProduct,
+    ProductSuggestion, ProductReview, ImportJob, StockHold
 )
 
 def is_admin_or_superuser(user):
@@ -95,6 +95,9 @@ class ProductAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
     inlines = [ProductImageInline]
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(**Product.image_count_annotation())
+    
     def image_count(self, obj):
         """Show total image count (main + additional)"""
         additional_count = obj.additional_images_count
@@ -179,10 +182,17 @@ class IngredientAdmin(admin.ModelAdmin):
     list_filter = ('is_active', 'created_at')
     search_fields = ('name', 'description')
 
+@admin.register(IngredientProduct)
+class IngredientProductAdmin(admin.ModelAdmin):
+    list_display = ('ingredient', 'product', 'is_manual', 'updated_at')
+    list_filter = ('is_manual',)
+    search_fields = ('ingredient__name', 'product__name')
+    autocomplete_fields = ('product',)
+
 @admin.register(ProductSuggestion)
 class ProductSuggestionAdmin(admin.ModelAdmin):
-    list_display = ('product', 'suggested_product', 'suggestion_type', 'weight', 'is_active')
-    list_filter = ('suggestion_type', 'is_active', 'created_at')
+    list_display = ('product', 'suggested_product', 'suggestion_type', 'weight', 'is_active', 'is_generated')
+    list_filter = ('suggestion_type', 'is_active', 'is_generated', 'created_at')
     search_fields = ('product__name', 'suggested_product__name')
 
 @admin.register(ProductReview)
@@ -190,3 +200,17 @@ class ProductReviewAdmin(admin.ModelAdmin):
     list_display = ('product', 'user', 'rating', 'is_verified_purchase', 'created_at')
     list_filter = ('rating', 'is_verified_purchase', 'created_at')
     search_fields = ('product__name', 'user__username', 'review_text')
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('original_name', 'store', 'status', 'processed_rows', 'created_count', 'updated_count', 'error_count', 'created_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('original_name', 'store__name')
+    readonly_fields = ('started_at', 'finished_at')
+
+@admin.register(StockHold)
+class StockHoldAdmin(admin.ModelAdmin):
+    list_display = ('store_product', 'user', 'quantity', 'created_at', 'expires_at')
+    list_filter = ('expires_at',)
+    search_fields = ('store_product__product__name', 'user__username')
+    raw_id_fields = ('store_product', 'user')
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from catalog.services_copurchase import CoPurchaseMatrixBuilder
+
+
+class Command(BaseCommand):
+    help = 'Update the co-purchase matrix from newly delivered orders and rescore "frequently bought together" suggestions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Discard the stored matrix and recount every delivered order'
+        )
+        parser.add_argument(
+            '--top-n',
+            type=int,
+            default=CoPurchaseMatrixBuilder.TOP_N,
+            help='Suggestions to keep per product'
+        )
+        parser.add_argument(
+            '--min-support',
+            type=int,
+            default=CoPurchaseMatrixBuilder.MIN_SUPPORT,
+            help='Minimum number of shared orders for a pair'
+        )
+        parser.add_argument(
+            '--backend',
+            choices=['auto', 'scipy', 'python'],
+            default='auto',
+            help='Counting backend (auto uses SciPy when it is installed)'
+        )
+
+    def handle(self, *args, **options):
+        use_sparse = {'auto': None, 'scipy': True, 'python': False}[options['backend']]
+        try:
+            builder = CoPurchaseMatrixBuilder(
+                full=options['full'],
+                top_n=options['top_n'],
+                min_support=options['min_support'],
+                use_sparse=use_sparse
+            )
+        except ImportError as e:
+            raise CommandError(str(e))
+        
+        mode = 'full rebuild' if options['full'] else 'incremental update'
+        self.stdout.write(f'Building co-purchase matrix ({mode}, {builder.backend} backend)...')
+        
+        run = builder.run()
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully processed {run.orders_processed} orders '
+                f'({run.total_orders} total) and rescored {run.products_updated} products!'
+            )
+        )
@@ -0,0 +1,35 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from catalog.services_inventory import InventoryAnalyticsService
+
+
+class Command(BaseCommand):
+    help = 'Write daily inventory snapshots for every store product (today by default, or a date range to backfill)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            help='First day to snapshot (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--end',
+            help='Last day to snapshot (YYYY-MM-DD, defaults to today)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            end_date = date.fromisoformat(options['end']) if options['end'] else None
+            start_date = date.fromisoformat(options['start']) if options['start'] else end_date
+        except ValueError as e:
+            raise CommandError(str(e))
+        
+        if start_date is None:
+            self.stdout.write('Creating today\'s inventory snapshots...')
+            written = InventoryAnalyticsService.create_daily_snapshot()
+        else:
+            self.stdout.write(f'Creating inventory snapshots from {start_date} to {end_date or "today"}...')
+            written = InventoryAnalyticsService.create_snapshots(start_date, end_date)
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully wrote {written} inventory snapshots!')
+        )
@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from catalog.models import Product
+from catalog.services_sku import SkuAllocator
 
 
 class Command(BaseCommand):
@@ -16,29 +18,38 @@ class Command(BaseCommand):
         dry_run = options['dry_run']
         
         # Find products without SKUs
-        products_without_sku = Product.objects.filter(sku__isnull=True)
+        products_without_sku = list(
+            Product.objects.filter(sku__isnull=True).select_related('category').order_by('id')
+        )
         
-        if not products_without_sku.exists():
+        if not products_without_sku:
             self.stdout.write(
                 self.style.SUCCESS('All products already have SKUs!')
             )
             return
         
         self.stdout.write(
-            f'Found {products_without_sku.count()} products without SKUs:'
+            f'Found {len(products_without_sku)} products without SKUs:'
         )
         
+        if dry_run:
+            # Preview the numbers per prefix without reserving them
+            by_prefix = {}
+            for product in products_without_sku:
+                by_prefix.setdefault(SkuAllocator.prefix_for(product), []).append(product)
+            for prefix, products in by_prefix.items():
+                for product, sku in zip(products, SkuAllocator.peek(prefix, len(products))):
+                    product.sku = sku
+        else:
+            # One reserved range per prefix, one bulk write for all products
+            with transaction.atomic():
+                SkuAllocator.assign(products_without_sku)
+                Product.objects.bulk_update(products_without_sku, ['sku'], batch_size=500)
+        
         for product in products_without_sku:
-            # Generate SKU
-            new_sku = product.generate_sku()
-            
             self.stdout.write(
-                f'  - {product.name} ({product.category.name}) -> {new_sku}'
+                f'  - {product.name} ({product.category.name}) -> {product.sku}'
             )
-            
-            if not dry_run:
-                product.sku = new_sku
-                product.save(update_fields=['sku'])
         
         if dry_run:
             self.stdout.write(
@@ -46,5 +57,5 @@ class Command(BaseCommand):
             )
         else:
             self.stdout.write(
-                self.style.SUCCESS(f'\nSuccessfully generated SKUs for {products_without_sku.count()} products!')
+                self.style.SUCCESS(f'\nSuccessfully generated SKUs for {len(products_without_sku)} products!')
             )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from catalog.services_suggestions import map_ingredient_products
+
+
+class Command(BaseCommand):
+    help = 'Map ingredients to the catalog products sold for them ("Complete the Dish")'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--overwrite',
+            action='store_true',
+            help='Re-match ingredients that already have an automatic mapping'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Matching ingredients to products...')
+        
+        mapped, unmatched = map_ingredient_products(overwrite=options['overwrite'])
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully mapped {mapped} ingredients!')
+        )
+        if unmatched:
+            self.stdout.write(
+                self.style.WARNING(f'{unmatched} ingredients have no matching product; map them in the admin.')
+            )
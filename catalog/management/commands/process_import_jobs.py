@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from catalog.models import ImportJob
+from catalog.services_import import ImportJobService
+
+
+class Command(BaseCommand):
+    help = 'Run pending CSV import jobs in this process (e.g. after a restart lost the worker pool)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--job',
+            type=int,
+            help='Only run this job',
+        )
+
+    def handle(self, *args, **options):
+        jobs = ImportJob.objects.filter(status='pending').order_by('created_at')
+        if options['job']:
+            jobs = jobs.filter(pk=options['job'])
+        
+        job_ids = list(jobs.values_list('id', flat=True))
+        if not job_ids:
+            self.stdout.write(self.style.SUCCESS('No pending import jobs.'))
+            return
+        
+        for job_id in job_ids:
+            job = ImportJobService.run(job_id)
+            if job is None:
+                continue
+            style = self.style.SUCCESS if job.status == 'completed' else self.style.ERROR
+            self.stdout.write(style(f'  - Job {job.pk} ({job.original_name}): {job.message}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from catalog.services_search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index from the catalog'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        
+        self.stdout.write(f'Rebuilding search index using {backend.__class__.__name__}...')
+        
+        indexed = backend.rebuild()
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully indexed {indexed} products!')
+        )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from catalog.services_listing import ZipCatalogService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-ZIP product listing table (ZipCatalogEntry)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--zip-area',
+            type=int,
+            action='append',
+            dest='zip_area_ids',
+            help='Only rebuild the given ZipArea ID (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        zip_area_ids = options.get('zip_area_ids')
+        
+        self.stdout.write('Rebuilding ZIP catalog listings...')
+        
+        if zip_area_ids:
+            written = ZipCatalogService.refresh(zip_area_ids=zip_area_ids)
+        else:
+            written = ZipCatalogService.rebuild()
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully wrote {written} listing entries!')
+        )
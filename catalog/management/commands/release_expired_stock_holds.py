@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from catalog.services_stock import StockHoldService
+
+
+class Command(BaseCommand):
+    help = 'Delete expired checkout stock holds (run every minute from cron when celery beat is not used)'
+
+    def handle(self, *args, **options):
+        deleted = StockHoldService.sweep()
+        self.stdout.write(self.style.SUCCESS(f'Released {deleted} expired stock holds.'))
@@ -0,0 +1,57 @@
+from django.db import migrations, OperationalError
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS catalog_product_search USING fts5("
+                "product_id UNINDEXED, name, category, description, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+        except OperationalError:
+            # SQLite compiled without FTS5: search falls back to icontains
+            return
+        schema_editor.execute(
+            "INSERT INTO catalog_product_search (product_id, name, category, description) "
+            "SELECT p.id, p.name, COALESCE(c.name, ''), COALESCE(p.description, '') "
+            "FROM catalog_product p LEFT JOIN catalog_category c ON c.id = p.category_id "
+            "WHERE p.is_active"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE IF NOT EXISTS catalog_product_search ("
+            "product_id bigint PRIMARY KEY REFERENCES catalog_product (id) "
+            "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS catalog_product_search_document_gin "
+            "ON catalog_product_search USING GIN (document)"
+        )
+        schema_editor.execute(
+            "INSERT INTO catalog_product_search (product_id, document) "
+            "SELECT p.id, "
+            "setweight(to_tsvector('simple', COALESCE(p.name, '')), 'A') || "
+            "setweight(to_tsvector('simple', COALESCE(c.name, '')), 'B') || "
+            "setweight(to_tsvector('simple', COALESCE(p.description, '')), 'C') "
+            "FROM catalog_product p LEFT JOIN catalog_category c ON c.id = p.category_id "
+            "WHERE p.is_active"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute("DROP TABLE IF EXISTS catalog_product_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_productimage_is_active_alter_product_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
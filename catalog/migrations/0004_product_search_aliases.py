@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_aliases',
+            field=models.CharField(blank=True, default='', help_text='Comma-separated alternative names used by typeahead search', max_length=255),
+        ),
+    ]
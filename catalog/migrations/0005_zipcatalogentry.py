@@ -0,0 +1,129 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+
+def build_zip_catalog(apps, schema_editor):
+    """
+    Initial fill of ZipCatalogEntry, mirroring ZipCatalogService.rebuild()
+    with the historical models (the service itself tracks the current schema)
+    """
+    Category = apps.get_model('catalog', 'Category')
+    StoreProduct = apps.get_model('catalog', 'StoreProduct')
+    ZipCatalogEntry = apps.get_model('catalog', 'ZipCatalogEntry')
+    StoreZipCoverage = apps.get_model('stores', 'StoreZipCoverage')
+    StoreClosureRequest = apps.get_model('stores', 'StoreClosureRequest')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+
+    closed_store_ids = StoreClosureRequest.objects.filter(
+        status='approved', requested_until__gt=timezone.now()
+    ).values('store_id')
+    zip_areas_by_store = {}
+    for store_id, zip_area_id in StoreZipCoverage.objects.filter(
+        is_active=True, zip_area__is_active=True, store__is_active=True, store__status='open'
+    ).exclude(store_id__in=closed_store_ids).values_list('store_id', 'zip_area_id'):
+        zip_areas_by_store.setdefault(store_id, []).append(zip_area_id)
+    if not zip_areas_by_store:
+        return
+
+    # Cheapest offer per (zip_area, product); in-stock beats out-of-stock, ID breaks ties
+    best = {}
+    for offer in StoreProduct.objects.filter(
+        store_id__in=list(zip_areas_by_store), is_available=True,
+        availability_status='in_stock', product__is_active=True
+    ).values_list(
+        'id', 'store_id', 'product_id', 'price', 'compare_price', 'stock_quantity',
+        'is_featured', 'created_at', 'product__name', 'product__unit_type', 'product__category_id'
+    ).iterator(chunk_size=2000):
+        rank = (offer[5] <= 0, offer[3], offer[0])
+        for zip_area_id in zip_areas_by_store[offer[1]]:
+            current = best.get((zip_area_id, offer[2]))
+            if current is None or rank < current[0]:
+                best[(zip_area_id, offer[2])] = (rank, offer)
+
+    categories = {
+        category_id: (parent_id, slug)
+        for category_id, parent_id, slug in Category.objects.values_list('id', 'parent_id', 'slug')
+    }
+    paths = {}
+
+    def slug_path(category_id):
+        if category_id not in paths:
+            parent_id, slug = categories[category_id]
+            paths[category_id] = f'{slug_path(parent_id)}/{slug}' if parent_id else slug
+        return paths[category_id]
+
+    popularity = dict(
+        OrderItem.objects.exclude(order__status__in=['cancelled', 'refunded']).values(
+            'store_product__product_id'
+        ).annotate(
+            orders=Count('order_id', distinct=True)
+        ).values_list('store_product__product_id', 'orders')
+    )
+
+    ZipCatalogEntry.objects.bulk_create([
+        ZipCatalogEntry(
+            zip_area_id=zip_area_id,
+            product_id=product_id,
+            store_product_id=sp_id,
+            store_id=store_id,
+            product_name=name,
+            unit_type=unit_type or '',
+            category_id=category_id,
+            category_path=slug_path(category_id),
+            price=price,
+            compare_price=compare_price,
+            in_stock=stock_quantity > 0,
+            is_featured=is_featured,
+            listed_at=created_at,
+            popularity_score=popularity.get(product_id, 0),
+        )
+        for (zip_area_id, product_id), (_rank, (
+            sp_id, store_id, _product_id, price, compare_price, stock_quantity,
+            is_featured, created_at, name, unit_type, category_id
+        )) in best.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_product_search_aliases'),
+        ('locations', '0001_initial'),
+        ('orders', '0001_initial'),
+        ('stores', '0006_alter_storestaff_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ZipCatalogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product_name', models.CharField(max_length=200)),
+                ('unit_type', models.CharField(blank=True, default='', max_length=20)),
+                ('category_path', models.CharField(help_text='Slash-separated category slugs from the root, e.g. fresh-meat/chicken', max_length=255)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('compare_price', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('in_stock', models.BooleanField(default=True)),
+                ('is_featured', models.BooleanField(default=False)),
+                ('listed_at', models.DateTimeField(help_text='When the selected StoreProduct was created')),
+                ('popularity_score', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='zip_catalog_entries', to='catalog.category')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='zip_catalog_entries', to='catalog.product')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='zip_catalog_entries', to='stores.store')),
+                ('store_product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='zip_catalog_entries', to='catalog.storeproduct')),
+                ('zip_area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='catalog_entries', to='locations.ziparea')),
+            ],
+            options={
+                'ordering': ['product_name'],
+                'indexes': [models.Index(fields=['zip_area', 'product_name', 'id'], name='catalog_zip_zip_are_85c2ec_idx'), models.Index(fields=['zip_area', 'price', 'id'], name='catalog_zip_zip_are_c305af_idx'), models.Index(fields=['zip_area', 'category_path'], name='catalog_zip_zip_are_239364_idx'), models.Index(fields=['zip_area', '-popularity_score', 'id'], name='catalog_zip_zip_are_762c1b_idx'), models.Index(fields=['zip_area', '-listed_at', '-id'], name='catalog_zip_zip_are_8bb9de_idx')],
+                'unique_together': {('zip_area', 'product')},
+            },
+        ),
+        migrations.RunPython(build_zip_catalog, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import Length
+
+
+def map_ingredients(apps, schema_editor):
+    """Seed mappings with the name matching the suggestion view used to do per request"""
+    Ingredient = apps.get_model('catalog', 'Ingredient')
+    IngredientProduct = apps.get_model('catalog', 'IngredientProduct')
+    Product = apps.get_model('catalog', 'Product')
+
+    products = Product.objects.filter(is_active=True)
+    for ingredient in Ingredient.objects.filter(is_active=True):
+        product = (
+            products.filter(name__iexact=ingredient.name).first() or
+            products.filter(name__icontains=ingredient.name).order_by(Length('name'), 'id').first()
+        )
+        if product is not None:
+            IngredientProduct.objects.create(ingredient=ingredient, product=product)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_zipcatalogentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_manual', models.BooleanField(default=False, help_text='Manual mappings are kept when mappings are regenerated')),
+                ('ingredient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='product_mapping', to='catalog.ingredient')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingredient_mappings', to='catalog.product')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(map_ingredients, migrations.RunPython.noop),
+    ]
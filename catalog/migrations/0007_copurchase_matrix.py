@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_ingredientproduct'),
+        ('stores', '0006_alter_storestaff_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoPurchaseRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('delivered_until', models.DateTimeField(help_text='Orders delivered up to this time are counted')),
+                ('orders_processed', models.PositiveIntegerField(default=0)),
+                ('total_orders', models.PositiveIntegerField(default=0, help_text='Orders counted in the matrix after this run')),
+                ('products_updated', models.PositiveIntegerField(default=0)),
+                ('is_full_rebuild', models.BooleanField(default=False)),
+                ('backend', models.CharField(default='python', max_length=20)),
+            ],
+            options={
+                'ordering': ['-delivered_until'],
+            },
+        ),
+        migrations.AddField(
+            model_name='productsuggestion',
+            name='confidence',
+            field=models.FloatField(blank=True, help_text='P(suggested product | product) over delivered orders', null=True),
+        ),
+        migrations.AddField(
+            model_name='productsuggestion',
+            name='is_generated',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='productsuggestion',
+            name='lift',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ProductCoPurchase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('other_product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.product')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='co_purchases', to='catalog.product')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='co_purchases', to='stores.store')),
+            ],
+            options={
+                'unique_together': {('store', 'product', 'other_product')},
+            },
+        ),
+    ]
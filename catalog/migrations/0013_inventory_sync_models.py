@@ -0,0 +1,134 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:29
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0012_stockhold'),
+        ('stores', '0007_image_derivatives'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InterStoreTransfer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('requested_quantity', models.PositiveIntegerField()),
+                ('approved_quantity', models.PositiveIntegerField(blank=True, null=True)),
+                ('transferred_quantity', models.PositiveIntegerField(default=0)),
+                ('status', models.CharField(choices=[('pending', 'Pending Approval'), ('approved', 'Approved'), ('in_transit', 'In Transit'), ('completed', 'Completed'), ('cancelled', 'Cancelled'), ('rejected', 'Rejected')], default='pending', max_length=15)),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('urgent', 'Urgent')], default='medium', max_length=10)),
+                ('requested_at', models.DateTimeField(auto_now_add=True)),
+                ('approved_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('request_reason', models.TextField()),
+                ('approval_notes', models.TextField(blank=True)),
+                ('completion_notes', models.TextField(blank=True)),
+                ('approved_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='approved_transfers', to=settings.AUTH_USER_MODEL)),
+                ('from_store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transfers_out', to='stores.store')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='catalog.product')),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='requested_transfers', to=settings.AUTH_USER_MODEL)),
+                ('to_store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transfers_in', to='stores.store')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('snapshot_date', models.DateField()),
+                ('opening_stock', models.PositiveIntegerField()),
+                ('closing_stock', models.PositiveIntegerField()),
+                ('stock_in', models.PositiveIntegerField(default=0)),
+                ('stock_out', models.PositiveIntegerField(default=0)),
+                ('adjustments', models.IntegerField(default=0)),
+                ('turnover_rate', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=5)),
+                ('days_of_stock', models.PositiveIntegerField(default=0)),
+                ('average_selling_price', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=8)),
+                ('total_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='catalog.product')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='stores.store')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['snapshot_date', 'store'], name='catalog_inv_snapsho_abfbac_idx'), models.Index(fields=['product', 'snapshot_date'], name='catalog_inv_product_e2b99d_idx')],
+                'unique_together': {('store', 'product', 'snapshot_date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='InventorySyncEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event_type', models.CharField(choices=[('stock_update', 'Stock Update'), ('transfer_request', 'Transfer Request'), ('transfer_complete', 'Transfer Complete'), ('restock_alert', 'Restock Alert'), ('low_stock_warning', 'Low Stock Warning'), ('out_of_stock', 'Out of Stock')], max_length=20)),
+                ('previous_quantity', models.PositiveIntegerField(default=0)),
+                ('new_quantity', models.PositiveIntegerField(default=0)),
+                ('reason', models.CharField(max_length=200)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='catalog.product')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='stores.store')),
+                ('transfer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='catalog.interstoretransfer')),
+                ('triggered_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['product', 'store', 'created_at'], name='catalog_inv_product_4ce8d9_idx'), models.Index(fields=['event_type', 'created_at'], name='catalog_inv_event_t_e60283_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PredictiveRestockRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('minimum_stock_level', models.PositiveIntegerField()),
+                ('reorder_level', models.PositiveIntegerField()),
+                ('maximum_stock_level', models.PositiveIntegerField()),
+                ('avg_daily_demand', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('seasonal_multiplier', models.DecimalField(decimal_places=2, default=Decimal('1.00'), max_digits=3)),
+                ('lead_time_days', models.PositiveIntegerField(default=1)),
+                ('safety_stock_days', models.PositiveIntegerField(default=2)),
+                ('demand_variance', models.DecimalField(decimal_places=2, default=Decimal('0.20'), max_digits=5)),
+                ('is_active', models.BooleanField(default=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='catalog.product')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='stores.store')),
+            ],
+            options={
+                'unique_together': {('product', 'store')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('alert_type', models.CharField(choices=[('low_stock', 'Low Stock'), ('out_of_stock', 'Out of Stock'), ('restock_needed', 'Restock Needed'), ('excess_stock', 'Excess Stock')], max_length=15)),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('critical', 'Critical')], default='medium', max_length=10)),
+                ('current_stock', models.PositiveIntegerField()),
+                ('threshold_level', models.PositiveIntegerField()),
+                ('recommended_restock', models.PositiveIntegerField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('acknowledged_at', models.DateTimeField(blank=True, null=True)),
+                ('action_taken', models.TextField(blank=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('acknowledged_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='catalog.product')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='stores.store')),
+            ],
+            options={
+                'ordering': ['-priority', '-created_at'],
+                'unique_together': {('product', 'store', 'alert_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,117 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:48
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def rebuild_zip_catalog(apps, schema_editor):
+    """
+    Replace the cheapest-offer-only rows with every serving store's offer,
+    ranked per (zip_area, product) as in ZipCatalogService._build_entries
+    """
+    Category = apps.get_model('catalog', 'Category')
+    StoreProduct = apps.get_model('catalog', 'StoreProduct')
+    ZipCatalogEntry = apps.get_model('catalog', 'ZipCatalogEntry')
+    StoreZipCoverage = apps.get_model('stores', 'StoreZipCoverage')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+
+    ZipCatalogEntry.objects.all().delete()
+
+    zip_areas_by_store = {}
+    for store_id, zip_area_id in StoreZipCoverage.objects.filter(
+        is_active=True, zip_area__is_active=True, store__is_active=True, store__status='open'
+    ).values_list('store_id', 'zip_area_id'):
+        zip_areas_by_store.setdefault(store_id, []).append(zip_area_id)
+    if not zip_areas_by_store:
+        return
+
+    offers_by_key = {}
+    for offer in StoreProduct.objects.filter(
+        store_id__in=list(zip_areas_by_store), is_available=True,
+        availability_status='in_stock', product__is_active=True
+    ).values_list(
+        'id', 'store_id', 'product_id', 'price', 'compare_price', 'stock_quantity',
+        'is_featured', 'created_at', 'product__name', 'product__unit_type', 'product__category_id'
+    ).iterator(chunk_size=2000):
+        for zip_area_id in zip_areas_by_store[offer[1]]:
+            offers_by_key.setdefault((zip_area_id, offer[2]), []).append(offer)
+    for key_offers in offers_by_key.values():
+        key_offers.sort(key=lambda offer: (offer[5] <= 0, offer[3], offer[0]))
+
+    categories = {
+        category_id: (parent_id, slug)
+        for category_id, parent_id, slug in Category.objects.values_list('id', 'parent_id', 'slug')
+    }
+    paths = {}
+
+    def slug_path(category_id):
+        if category_id not in paths:
+            parent_id, slug = categories[category_id]
+            paths[category_id] = f'{slug_path(parent_id)}/{slug}' if parent_id else slug
+        return paths[category_id]
+
+    popularity = dict(
+        OrderItem.objects.exclude(order__status__in=['cancelled', 'refunded']).values(
+            'store_product__product_id'
+        ).annotate(
+            orders=Count('order_id', distinct=True)
+        ).values_list('store_product__product_id', 'orders')
+    )
+
+    ZipCatalogEntry.objects.bulk_create([
+        ZipCatalogEntry(
+            zip_area_id=zip_area_id,
+            product_id=product_id,
+            store_product_id=sp_id,
+            store_id=store_id,
+            offer_rank=offer_rank,
+            product_name=name,
+            unit_type=unit_type or '',
+            category_id=category_id,
+            category_path=slug_path(category_id),
+            price=price,
+            compare_price=compare_price,
+            in_stock=stock_quantity > 0,
+            is_featured=is_featured,
+            listed_at=created_at,
+            popularity_score=popularity.get(product_id, 0),
+        )
+        for (zip_area_id, product_id), key_offers in offers_by_key.items()
+        for offer_rank, (
+            sp_id, store_id, _product_id, price, compare_price, stock_quantity,
+            is_featured, created_at, name, unit_type, category_id
+        ) in enumerate(key_offers)
+    ], batch_size=1000)
+
+
+def drop_ranked_offers(apps, schema_editor):
+    """Keep only the cheapest offer per (zip_area, product) for the old unique constraint"""
+    ZipCatalogEntry = apps.get_model('catalog', 'ZipCatalogEntry')
+    ZipCatalogEntry.objects.exclude(offer_rank=0).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0013_inventory_sync_models'),
+        ('locations', '0001_initial'),
+        ('orders', '0001_initial'),
+        ('stores', '0007_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='zipcatalogentry',
+            unique_together={('zip_area', 'product', 'store')},
+        ),
+        migrations.AddField(
+            model_name='zipcatalogentry',
+            name='offer_rank',
+            field=models.PositiveIntegerField(default=0, help_text="Position among the ZIP area's offers of the product, cheapest first"),
+        ),
+        migrations.AddIndex(
+            model_name='zipcatalogentry',
+            index=models.Index(fields=['zip_area', 'product', 'offer_rank'], name='catalog_zip_zip_are_af3c19_idx'),
+        ),
+        migrations.RunPython(rebuild_zip_catalog, drop_ranked_offers),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def key_search_documents_by_product(apps, schema_editor):
+    """Reinsert SQLite FTS5 documents with rowid = product ID for per-product rank lookups"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    if 'catalog_product_search' not in schema_editor.connection.introspection.table_names():
+        # SQLite built without FTS5: search uses the icontains fallback
+        return
+    schema_editor.execute("DELETE FROM catalog_product_search")
+    schema_editor.execute(
+        "INSERT INTO catalog_product_search (rowid, product_id, name, category, description) "
+        "SELECT p.id, p.id, p.name, COALESCE(c.name, ''), COALESCE(p.description, '') "
+        "FROM catalog_product p LEFT JOIN catalog_category c ON c.id = p.category_id "
+        "WHERE p.is_active"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0014_zipcatalogentry_offer_rank'),
+    ]
+
+    operations = [
+        migrations.RunPython(key_search_documents_by_product, migrations.RunPython.noop),
+    ]
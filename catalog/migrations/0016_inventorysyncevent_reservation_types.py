@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0015_product_search_rowid'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='inventorysyncevent',
+            name='event_type',
+            field=models.CharField(choices=[('stock_update', 'Stock Update'), ('reservation', 'Stock Reservation'), ('release', 'Reservation Release'), ('transfer_request', 'Transfer Request'), ('transfer_complete', 'Transfer Complete'), ('restock_alert', 'Restock Alert'), ('low_stock_warning', 'Low Stock Warning'), ('out_of_stock', 'Out of Stock')], max_length=20),
+        ),
+    ]
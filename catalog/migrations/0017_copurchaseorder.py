@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def record_counted_orders(apps, schema_editor):
+    """Orders up to the latest run's watermark have already been counted"""
+    CoPurchaseRun = apps.get_model('catalog', 'CoPurchaseRun')
+    CoPurchaseOrder = apps.get_model('catalog', 'CoPurchaseOrder')
+    Order = apps.get_model('orders', 'Order')
+
+    run = CoPurchaseRun.objects.order_by('-delivered_until').first()
+    if run is None:
+        return
+    order_ids = Order.objects.filter(status='delivered', items__isnull=False).annotate(
+        delivered_at=Coalesce('actual_delivery_time', 'updated_at')
+    ).filter(delivered_at__lte=run.delivered_until).values_list('id', flat=True).distinct()
+    CoPurchaseOrder.objects.bulk_create(
+        (CoPurchaseOrder(order_id=order_id, run_id=run.pk) for order_id in order_ids.iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0016_inventorysyncevent_reservation_types'),
+        ('orders', '0006_order_stock_reserved'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoPurchaseOrder',
+            fields=[
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='orders.order')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counted_orders', to='catalog.copurchaserun')),
+            ],
+        ),
+        migrations.RunPython(record_counted_orders, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.db.models import Count, Prefetch, Q
 from decimal import Decimal
 from core.models import TimeStampedModel
 from stores.models import Store
@@ -14,28 +15,50 @@ class Category(TimeStampedModel):
     slug = models.SlugField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, blank=True, null=True, related_name='subcategories')
     
     is_active = models.BooleanField(default=True)
     sort_order = models.PositiveIntegerField(default=0)
     
     def __str__(self):
-        if self.parent:
-            return f"{self.parent.name} -> {self.name}"
+        if self.parent_id:
+            tree = self._tree()
+            parent_name = tree.get(self.parent_id).name if tree is not None else self.parent.name
+            return f"{parent_name} -> {self.name}"
         return self.name
     
+    def _tree(self):
+        """The cached category tree, if it agrees with this instance's saved hierarchy"""
+        from .services_categories import CategoryTreeService
+        
+        if self.pk is None:
+            return None
+        tree = CategoryTreeService.get_tree()
+        node = tree.get(self.pk)
+        if node is None or node.parent_id != self.parent_id or node.name != self.name:
+            return None
+        return tree
+    
     @property
     def full_path(self):
+        tree = self._tree()
+        if tree is not None:
+            return tree.full_path(self.pk)
         if self.parent:
             return f"{self.parent.full_path} > {self.name}"
         return self.name
     
     @property
     def is_subcategory(self):
-        return self.parent is not None
+        return self.parent_id is not None
     
     @property 
     def main_category(self):
+        tree = self._tree()
+        if tree is not None:
+            root_id = tree.get(self.pk).root_id
+            return self if root_id == self.pk else tree.instance(root_id)
         if self.parent:
             return self.parent.main_category
         return self
@@ -62,6 +85,7 @@ class Product(TimeStampedModel):
     # Product attributes
     sku = models.CharField(max_length=50, unique=True, blank=True, null=True)
     brand = models.CharField(max_length=100, blank=True, null=True)
+    search_aliases = models.CharField(max_length=255, blank=True, default='', help_text="Comma-separated alternative names used by typeahead search")
     
     # Physical attributes
     weight_per_unit = models.DecimalField(max_digits=6, decimal_places=2, help_text="Weight in grams")
@@ -69,41 +93,13 @@ class Product(TimeStampedModel):
     
     # Images (1 main image is required, up to 4 additional images)
     image = models.ImageField(upload_to='products/', blank=True, null=True, help_text="Main product image (required)")
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False, help_text="Resized WebP/JPEG copies of image (see core.services_images)")
     
     def generate_sku(self):
-        """Generate a unique SKU for the product"""
-        import re
-        from django.utils.text import slugify
-        
-        # Get category abbreviation (first 3 letters, uppercase)
-        category_abbr = re.sub(r'[^a-zA-Z]', '', self.category.name)[:3].upper()
-        if len(category_abbr) < 2:
-            category_abbr = "PRD"  # Default fallback
-        
-        # Get product name abbreviation (first 3 letters, uppercase)
-        product_abbr = re.sub(r'[^a-zA-Z]', '', self.name)[:3].upper()
-        if len(product_abbr) < 2:
-            product_abbr = "ITM"  # Default fallback
-        
-        # Generate base SKU
-        base_sku = f"{category_abbr}{product_abbr}"
-        
-        # Find highest existing number for this base
-        import re
-        existing_skus = Product.objects.filter(
-            sku__startswith=base_sku
-        ).values_list('sku', flat=True)
-        
-        max_num = 0
-        for sku in existing_skus:
-            match = re.search(rf'{base_sku}(\d+)$', sku)
-            if match:
-                num = int(match.group(1))
-                max_num = max(max_num, num)
+        """Allocate the next unique SKU for the product's prefix"""
+        from catalog.services_sku import SkuAllocator
         
-        # Generate new SKU with next number
-        new_sku = f"{base_sku}{max_num + 1:03d}"
-        return new_sku
+        return SkuAllocator.allocate(SkuAllocator.prefix_for(self))[0]
     
     def save(self, *args, **kwargs):
         # Auto-generate SKU if not provided
@@ -116,16 +112,48 @@ class Product(TimeStampedModel):
         if not self.image:
             raise ValidationError("Main product image is required.")
     
+    @staticmethod
+    def images_prefetch(lookup='images'):
+        """
+        Prefetch plan for the active gallery, e.g. images_prefetch('store_product__product__images')
+        on listing rows; all_images / additional_images_count then read it without a query
+        """
+        return Prefetch(
+            lookup,
+            queryset=ProductImage.objects.filter(is_active=True).order_by('sort_order'),
+            to_attr='active_images'
+        )
+    
+    @staticmethod
+    def image_count_annotation():
+        """`.annotate(**Product.image_count_annotation())` for additional_images_count without the gallery"""
+        return {'active_image_count': Count('images', filter=Q(images__is_active=True))}
+    
+    def get_active_images(self):
+        """Active additional images in display order (prefetched, or loaded once and kept)"""
+        if 'active_images' not in self.__dict__:
+            self.active_images = list(self.images.filter(is_active=True).order_by('sort_order'))
+        return self.active_images
+    
+    def reset_image_cache(self):
+        """Forget prefetched/annotated gallery state after images are added or removed"""
+        self.__dict__.pop('active_images', None)
+        self.__dict__.pop('active_image_count', None)
+    
     @property
     def all_images(self):
         """Get all images including main image and additional images"""
         images = [self.image] if self.image else []
-        images.extend([img.image for img in self.images.filter(is_active=True).order_by('sort_order')])
+        images.extend([img.image for img in self.get_active_images()])
         return images
     
     @property
     def additional_images_count(self):
-        return self.images.filter(is_active=True).count()
+        if 'active_images' in self.__dict__:
+            return len(self.active_images)
+        if 'active_image_count' not in self.__dict__:
+            self.active_image_count = self.images.filter(is_active=True).count()
+        return self.active_image_count
     
     def can_add_image(self):
         """Check if more images can be added (max 5 total: 1 main + 4 additional)"""
@@ -150,22 +178,45 @@ class Product(TimeStampedModel):
             models.Index(fields=['slug']),
         ]
 
+class SkuSequence(models.Model):
+    """Last SKU number handed out per prefix (category + product abbreviation)"""
+    prefix = models.CharField(max_length=20, unique=True)
+    last_value = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.prefix} @ {self.last_value}"
+
 class ProductImage(TimeStampedModel):
     """Additional product images (max 4 per product)"""
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='products/')
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     alt_text = models.CharField(max_length=200, blank=True, null=True)
     sort_order = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
     
     def clean(self):
         # Check image limit (4 additional images max)
-        if self.product and self.product.additional_images_count >= 4 and not self.pk:
+        if self.product_id and not self.pk and self._product_with_image_count().additional_images_count >= 4:
             raise ValidationError("Maximum 4 additional images allowed per product (5 total including main image).")
     
+    def _product_with_image_count(self):
+        """The product, loaded together with its annotated image count unless already in memory"""
+        if not ProductImage.product.is_cached(self):
+            self.product = Product.objects.annotate(**Product.image_count_annotation()).get(pk=self.product_id)
+        return self.product
+    
     def save(self, *args, **kwargs):
         self.full_clean()
         super().save(*args, **kwargs)
+        if ProductImage.product.is_cached(self):
+            self.product.reset_image_cache()
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        if ProductImage.product.is_cached(self):
+            self.product.reset_image_cache()
+        return result
     
     class Meta:
         ordering = ['sort_order']
@@ -207,6 +258,11 @@ class StoreProduct(TimeStampedModel):
     def is_low_stock(self):
         return self.stock_quantity <= self.low_stock_threshold
     
+    @property
+    def available_to_sell(self):
+        """Stock minus other customers' checkout holds (needs a `held_quantity` annotation, see StockHoldService)"""
+        return max(self.stock_quantity - (getattr(self, 'held_quantity', 0) or 0), 0)
+    
     @property
     def discount_percentage(self):
         if self.compare_price and self.compare_price > self.price:
@@ -247,6 +303,15 @@ class ProductIngredient(TimeStampedModel):
     class Meta:
         unique_together = ['product', 'ingredient']
 
+class IngredientProduct(TimeStampedModel):
+    """Catalog product sold for an ingredient (used by "Complete the Dish")"""
+    ingredient = models.OneToOneField(Ingredient, on_delete=models.CASCADE, related_name='product_mapping')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='ingredient_mappings')
+    is_manual = models.BooleanField(default=False, help_text="Manual mappings are kept when mappings are regenerated")
+    
+    def __str__(self):
+        return f"{self.ingredient.name} -> {self.product.name}"
+
 class StoreIngredient(TimeStampedModel):
     """Store-specific ingredient pricing and availability"""
     store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='ingredients')
@@ -277,6 +342,11 @@ class ProductSuggestion(TimeStampedModel):
     weight = models.PositiveIntegerField(default=1)
     is_active = models.BooleanField(default=True)
     
+    # Rows written by the co-purchase builder (build_copurchase_matrix); manual rows are never replaced
+    is_generated = models.BooleanField(default=False)
+    confidence = models.FloatField(blank=True, null=True, help_text="P(suggested product | product) over delivered orders")
+    lift = models.FloatField(blank=True, null=True)
+    
     def __str__(self):
         return f"{self.product.name} -> {self.suggested_product.name} ({self.get_suggestion_type_display()})"
     
@@ -284,6 +354,42 @@ class ProductSuggestion(TimeStampedModel):
         unique_together = ['product', 'suggested_product', 'suggestion_type']
         ordering = ['-weight', 'suggested_product__name']
 
+class ProductCoPurchase(models.Model):
+    """
+    Sparse item-item co-occurrence counts over delivered orders, per store.
+    The diagonal (product == other_product) holds the product's basket count.
+    """
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='co_purchases')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='co_purchases')
+    other_product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    orders = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['store', 'product', 'other_product']
+
+class CoPurchaseRun(TimeStampedModel):
+    """Watermark and totals of a co-purchase matrix build"""
+    delivered_until = models.DateTimeField(help_text="Orders delivered up to this time are counted")
+    orders_processed = models.PositiveIntegerField(default=0)
+    total_orders = models.PositiveIntegerField(default=0, help_text="Orders counted in the matrix after this run")
+    products_updated = models.PositiveIntegerField(default=0)
+    is_full_rebuild = models.BooleanField(default=False)
+    backend = models.CharField(max_length=20, default='python')
+    
+    def __str__(self):
+        return f"Co-purchase run up to {self.delivered_until:%Y-%m-%d %H:%M}"
+    
+    class Meta:
+        ordering = ['-delivered_until']
+
+class CoPurchaseOrder(models.Model):
+    """A delivered order already counted in the co-purchase matrix (never counted twice)"""
+    order = models.OneToOneField('orders.Order', on_delete=models.CASCADE, primary_key=True, related_name='+')
+    run = models.ForeignKey(CoPurchaseRun, on_delete=models.CASCADE, related_name='counted_orders')
+    
+    def __str__(self):
+        return f"Order {self.order_id} counted in run {self.run_id}"
+
 class ProductReview(TimeStampedModel):
     """Product reviews by customers"""
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reviews')
@@ -304,3 +410,120 @@ class ProductReview(TimeStampedModel):
     class Meta:
         unique_together = ['product', 'store', 'user']
         ordering = ['-created_at']
+
+class ZipCatalogEntry(TimeStampedModel):
+    """
+    Materialized listing row: one store's offer of a product in a ZIP area
+    it serves, ranked against the other stores' offers (offer_rank 0 is the
+    cheapest). Maintained by catalog signals and rebuilt by the
+    `rebuild_zip_catalog` command (see services_listing).
+    """
+    zip_area = models.ForeignKey('locations.ZipArea', on_delete=models.CASCADE, related_name='catalog_entries')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='zip_catalog_entries')
+    store_product = models.ForeignKey(StoreProduct, on_delete=models.CASCADE, related_name='zip_catalog_entries')
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='zip_catalog_entries')
+    offer_rank = models.PositiveIntegerField(default=0, help_text="Position among the ZIP area's offers of the product, cheapest first")
+    
+    # Denormalized product / category data used for filtering and sorting
+    product_name = models.CharField(max_length=200)
+    unit_type = models.CharField(max_length=20, blank=True, default='')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='zip_catalog_entries')
+    category_path = models.CharField(max_length=255, help_text="Slash-separated category slugs from the root, e.g. fresh-meat/chicken")
+    
+    # Offer data from the selected StoreProduct
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+    compare_price = models.DecimalField(max_digits=8, decimal_places=2, blank=True, null=True)
+    in_stock = models.BooleanField(default=True)
+    is_featured = models.BooleanField(default=False)
+    listed_at = models.DateTimeField(help_text="When the selected StoreProduct was created")
+    popularity_score = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.zip_area.zip_code} - {self.product_name}"
+    
+    class Meta:
+        unique_together = ['zip_area', 'product', 'store']
+        ordering = ['product_name']
+        indexes = [
+            models.Index(fields=['zip_area', 'product', 'offer_rank']),
+            models.Index(fields=['zip_area', 'product_name', 'id']),
+            models.Index(fields=['zip_area', 'price', 'id']),
+            models.Index(fields=['zip_area', 'category_path']),
+            models.Index(fields=['zip_area', '-popularity_score', 'id']),
+            models.Index(fields=['zip_area', '-listed_at', '-id']),
+        ]
+
+class ImportJob(TimeStampedModel):
+    """A staged CSV price-list upload, imported in the background (see services_import)"""
+    STATUS_CHOICES = [
+        ('draft', 'Previewed'),
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='import_jobs')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='import_jobs')
+    file = models.FileField(upload_to='imports/%Y/%m/')
+    original_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    
+    # Progress, updated after every committed chunk
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    unchanged_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    error_details = models.JSONField(default=list, blank=True, help_text="First row errors (capped)")
+    preview_summary = models.JSONField(default=dict, blank=True, help_text="Dry-run diff counts, for previewed uploads")
+    message = models.TextField(blank=True, default='')
+    
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    def __str__(self):
+        return f"{self.store.name} - {self.original_name} ({self.status})"
+    
+    @property
+    def is_finished(self):
+        return self.status in ('completed', 'failed')
+    
+    @property
+    def progress_percent(self):
+        if self.status == 'completed':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, int(self.processed_rows * 100 / self.total_rows))
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['store', '-created_at']),
+            models.Index(fields=['status']),
+        ]
+
+class StockHold(models.Model):
+    """Quantity set aside for a customer while they are in checkout (see services_stock)"""
+    store_product = models.ForeignKey(StoreProduct, on_delete=models.CASCADE, related_name='stock_holds')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='stock_holds')
+    quantity = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"{self.user} holds {self.quantity} x {self.store_product_id} until {self.expires_at:%H:%M}"
+    
+    class Meta:
+        unique_together = ['store_product', 'user']
+        indexes = [
+            models.Index(fields=['store_product', 'expires_at']),
+        ]
+
+
+# The inventory sync models live in models_inventory; importing them here registers them with the app
+from .models_inventory import (  # noqa: E402,F401
+    InventorySyncEvent, InterStoreTransfer, StockAlert, InventorySnapshot, PredictiveRestockRule
+)
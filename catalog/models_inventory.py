@@ -16,6 +16,8 @@ class InventorySyncEvent(TimeStampedModel):
     """Track all inventory synchronization events"""
     EVENT_TYPES = [
         ('stock_update', 'Stock Update'),
+        ('reservation', 'Stock Reservation'),
+        ('release', 'Reservation Release'),
         ('transfer_request', 'Transfer Request'),
         ('transfer_complete', 'Transfer Complete'),
         ('restock_alert', 'Restock Alert'),
@@ -0,0 +1,165 @@
+"""
+Category Tree Services
+In-process category tree with materialized paths and descendant sets.
+
+The whole Category table is loaded with one query and kept per worker.
+Each node knows its depth, root, ancestor path and the IDs of its whole
+subtree, so "category including subcategories" becomes one
+`category_id__in` lookup and paths never walk `parent` FKs. The tree is
+tagged with the shared `category_tree` cache version, which Category
+signals bump, so every worker rebuilds lazily after a change. Writes that
+skip the signals are caught by a maximum tree age, and by a rebuild when
+a caller asks for a category the tree does not know yet.
+"""
+import copy
+import logging
+import threading
+import time
+
+from core.cache_utils import bump_cache_version, get_cache_version
+
+logger = logging.getLogger(__name__)
+
+TREE_NAMESPACE = 'category_tree'
+
+
+class CategoryNode:
+    """One category with its precomputed tree position"""
+    __slots__ = (
+        'id', 'name', 'slug', 'parent_id', 'sort_order', 'is_active', 'instance',
+        'depth', 'root_id', 'path_ids', 'children_ids', 'descendant_ids',
+    )
+
+    def __init__(self, instance):
+        self.instance = instance
+        self.id = instance.id
+        self.name = instance.name
+        self.slug = instance.slug
+        self.parent_id = instance.parent_id
+        self.sort_order = instance.sort_order
+        self.is_active = instance.is_active
+        self.depth = 0
+        self.root_id = instance.id
+        self.path_ids = (instance.id,)
+        self.children_ids = ()
+        self.descendant_ids = frozenset([instance.id])
+
+
+class CategoryTree:
+    """Immutable snapshot of the category hierarchy"""
+
+    def __init__(self, categories, generation=None):
+        self.generation = generation
+        self.built_at = time.monotonic()
+        self.nodes = {category.id: CategoryNode(category) for category in categories}
+        self.by_slug = {node.slug: node for node in self.nodes.values()}
+
+        children = {}
+        for node in self.nodes.values():
+            if node.parent_id in self.nodes:
+                children.setdefault(node.parent_id, []).append(node)
+        for parent_id, nodes in children.items():
+            nodes.sort(key=lambda node: (node.sort_order, node.name))
+            self.nodes[parent_id].children_ids = tuple(node.id for node in nodes)
+
+        roots = [node for node in self.nodes.values() if node.parent_id not in self.nodes]
+        roots.sort(key=lambda node: (node.sort_order, node.name))
+        self.root_ids = tuple(node.id for node in roots)
+
+        # Walk down from the roots; nodes caught in a parent cycle are never reached and stay roots of their own
+        stack = list(self.root_ids)
+        order = []
+        while stack:
+            node = self.nodes[stack.pop()]
+            order.append(node)
+            for child_id in node.children_ids:
+                child = self.nodes[child_id]
+                child.depth = node.depth + 1
+                child.root_id = node.root_id
+                child.path_ids = node.path_ids + (child_id,)
+                stack.append(child_id)
+
+        # Children come after their parents in `order`, so reversing it builds subtrees bottom-up
+        for node in reversed(order):
+            if node.children_ids:
+                node.descendant_ids = node.descendant_ids.union(
+                    *(self.nodes[child_id].descendant_ids for child_id in node.children_ids)
+                )
+
+    def is_current(self, generation, max_age):
+        return self.generation == generation and time.monotonic() - self.built_at < max_age
+
+    def covers(self, category_ids):
+        return all(category_id in self.nodes for category_id in category_ids)
+
+    # Lookups
+
+    def get(self, category):
+        """Node by ID or slug (None when unknown)"""
+        if isinstance(category, int):
+            return self.nodes.get(category)
+        return self.by_slug.get(category)
+
+    def descendant_ids(self, category, include_self=True):
+        """IDs of the category's whole subtree (empty when unknown)"""
+        node = self.get(category)
+        if node is None:
+            return frozenset()
+        return node.descendant_ids if include_self else node.descendant_ids - {node.id}
+
+    def full_path(self, category_id, separator=' > '):
+        return separator.join(self.nodes[node_id].name for node_id in self.nodes[category_id].path_ids)
+
+    def slug_path(self, category_id):
+        return '/'.join(self.nodes[node_id].slug for node_id in self.nodes[category_id].path_ids)
+
+    def instance(self, category_id):
+        """A private copy of the cached Category instance"""
+        return copy.copy(self.nodes[category_id].instance)
+
+    def roots(self, active_only=True):
+        return [
+            self.nodes[node_id] for node_id in self.root_ids
+            if not active_only or self.nodes[node_id].is_active
+        ]
+
+    def children(self, category_id, active_only=True):
+        return [
+            self.nodes[node_id] for node_id in self.nodes[category_id].children_ids
+            if not active_only or self.nodes[node_id].is_active
+        ]
+
+
+class CategoryTreeService:
+    """Per-process CategoryTree, rebuilt when the catalog version changes"""
+    # Safety net for bulk writes that bypass the signals
+    MAX_INDEX_AGE = 3600
+
+    _tree = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def invalidate():
+        bump_cache_version(TREE_NAMESPACE)
+
+    @classmethod
+    def get_tree(cls, category_ids=()):
+        """
+        The current tree. Any of `category_ids` missing from it (a category
+        created without signals, e.g. by bulk_create) forces one rebuild.
+        """
+        generation = get_cache_version(TREE_NAMESPACE)
+        tree = cls._tree
+        if tree is not None and tree.is_current(generation, cls.MAX_INDEX_AGE) and tree.covers(category_ids):
+            return tree
+
+        with cls._lock:
+            # Another thread may have rebuilt it while we waited
+            tree = cls._tree
+            if tree is None or not tree.is_current(generation, cls.MAX_INDEX_AGE) or not tree.covers(category_ids):
+                from catalog.models import Category
+
+                tree = CategoryTree(list(Category.objects.all()), generation)
+                cls._tree = tree
+                logger.debug(f"Category tree rebuilt with {len(tree.nodes)} categories")
+        return tree
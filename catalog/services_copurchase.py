@@ -0,0 +1,289 @@
+"""
+Co-purchase Matrix Services
+Offline "frequently bought together" builder.
+
+Delivered orders are streamed in chunks and turned into per-store sparse
+item-item co-occurrence counts (ProductCoPurchase; the diagonal holds each
+product's basket count). Runs are incremental: only orders delivered since
+the previous CoPurchaseRun are counted, and only the products they touch
+get their suggestions rescored. Counted orders are recorded as
+CoPurchaseOrder rows, so an order edited after delivery (which moves its
+fallback updated_at timestamp past the watermark) is never counted twice. From the store-summed counts each product
+gets its top-N neighbours by lift and confidence, written in bulk as
+generated ProductSuggestion(suggestion_type='frequently_bought') rows.
+
+Counting uses a SciPy sparse basket matrix (B.T @ B) when NumPy/SciPy are
+installed and a pure-Python pair counter otherwise.
+"""
+from collections import Counter
+from itertools import combinations
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+import logging
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = None
+    sparse = None
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 5000
+BATCH_SIZE = 1000
+
+
+def _chunks(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def count_pairs_python(baskets):
+    """Co-occurrence counts {(a, b): orders} for baskets of product IDs, diagonal included"""
+    counts = Counter()
+    for basket in baskets:
+        items = sorted(basket)
+        for product_id in items:
+            counts[(product_id, product_id)] += 1
+        for a, b in combinations(items, 2):
+            counts[(a, b)] += 1
+            counts[(b, a)] += 1
+    return counts
+
+
+def count_pairs_sparse(baskets):
+    """Same as count_pairs_python, via a binary basket x item CSR matrix"""
+    product_ids = sorted({product_id for basket in baskets for product_id in basket})
+    if not product_ids:
+        return Counter()
+    index = {product_id: position for position, product_id in enumerate(product_ids)}
+
+    rows, cols = [], []
+    for row, basket in enumerate(baskets):
+        for product_id in basket:
+            rows.append(row)
+            cols.append(index[product_id])
+
+    baskets_matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+        shape=(len(baskets), len(product_ids))
+    )
+    co_occurrence = (baskets_matrix.T @ baskets_matrix).tocoo()
+
+    counts = Counter()
+    for i, j, value in zip(co_occurrence.row, co_occurrence.col, co_occurrence.data):
+        counts[(product_ids[i], product_ids[j])] += int(value)
+    return counts
+
+
+class CoPurchaseMatrixBuilder:
+    """Incremental co-purchase matrix and frequently-bought-together scoring"""
+    TOP_N = 10
+    # A pair must appear in at least this many orders (the old live query required 2)
+    MIN_SUPPORT = 2
+
+    def __init__(self, full=False, top_n=None, min_support=None, use_sparse=None):
+        self.full = full
+        self.top_n = top_n or self.TOP_N
+        self.min_support = min_support or self.MIN_SUPPORT
+        if use_sparse is None:
+            use_sparse = sparse is not None
+        elif use_sparse and sparse is None:
+            raise ImportError("NumPy and SciPy are required for the sparse backend")
+        self.backend = 'scipy' if use_sparse else 'python'
+        self._count_pairs = count_pairs_sparse if use_sparse else count_pairs_python
+
+    def run(self):
+        """Count new orders and rescore affected products; returns the CoPurchaseRun"""
+        from catalog.models import CoPurchaseOrder, CoPurchaseRun, ProductCoPurchase, ProductSuggestion
+        from catalog.services_suggestions import ProductSuggestionService
+
+        delivered_until = timezone.now()
+        previous = None if self.full else CoPurchaseRun.objects.first()
+        since = previous.delivered_until if previous else None
+
+        with transaction.atomic():
+            if self.full:
+                ProductCoPurchase.objects.all().delete()
+                ProductSuggestion.objects.filter(
+                    suggestion_type='frequently_bought', is_generated=True
+                ).delete()
+                CoPurchaseOrder.objects.all().delete()
+
+            order_ids, touched = self._count_orders(since, delivered_until)
+            orders_processed = len(order_ids)
+
+            total_orders = orders_processed + (previous.total_orders if previous else 0)
+            products_updated = self._write_suggestions(touched, total_orders)
+
+            run = CoPurchaseRun.objects.create(
+                delivered_until=delivered_until,
+                orders_processed=orders_processed,
+                total_orders=total_orders,
+                products_updated=products_updated,
+                is_full_rebuild=self.full,
+                backend=self.backend
+            )
+            CoPurchaseOrder.objects.bulk_create(
+                [CoPurchaseOrder(order_id=order_id, run=run) for order_id in order_ids],
+                batch_size=BATCH_SIZE
+            )
+
+        # Suggestions were written in bulk, which skips the cache invalidation signals
+        ProductSuggestionService.invalidate_catalog()
+
+        logger.info(
+            f"Co-purchase run ({self.backend}): {orders_processed} orders, "
+            f"{products_updated} products rescored"
+        )
+        return run
+
+    # Counting
+
+    def _delivered_items(self, since, until):
+        from catalog.models import CoPurchaseOrder
+        from orders.models import OrderItem
+
+        items = OrderItem.objects.filter(order__status='delivered').annotate(
+            delivered_at=Coalesce('order__actual_delivery_time', 'order__updated_at')
+        ).filter(delivered_at__lte=until)
+        if since is not None:
+            # The watermark narrows the scan; the recorded orders rule out recounts
+            items = items.filter(delivered_at__gt=since).exclude(
+                Exists(CoPurchaseOrder.objects.filter(order_id=OuterRef('order_id')))
+            )
+
+        return items.order_by('order__store_id', 'order_id').values_list(
+            'order__store_id', 'order_id', 'store_product__product_id'
+        ).iterator(chunk_size=CHUNK_SIZE)
+
+    def _count_orders(self, since, until):
+        """Stream delivered items grouped by store and order; returns (order IDs, touched product IDs)"""
+        touched = set()
+        order_ids = []
+        current_store = current_order = None
+        basket = set()
+        baskets = []
+
+        def flush_basket():
+            nonlocal basket
+            if basket:
+                baskets.append(basket)
+                order_ids.append(current_order)
+            basket = set()
+
+        for store_id, order_id, product_id in self._delivered_items(since, until):
+            if order_id != current_order:
+                flush_basket()
+                current_order = order_id
+            if store_id != current_store or len(baskets) >= CHUNK_SIZE:
+                if baskets:
+                    touched.update(self._apply_counts(current_store, baskets))
+                    baskets = []
+                current_store = store_id
+            basket.add(product_id)
+
+        flush_basket()
+        if baskets:
+            touched.update(self._apply_counts(current_store, baskets))
+        return order_ids, touched
+
+    def _apply_counts(self, store_id, baskets):
+        """Add one chunk of a store's baskets to the stored matrix"""
+        from catalog.models import ProductCoPurchase
+
+        delta = self._count_pairs(baskets)
+        product_ids = {a for a, _b in delta}
+
+        existing = {}
+        for ids in _chunks(product_ids, BATCH_SIZE):
+            for row in ProductCoPurchase.objects.filter(store_id=store_id, product_id__in=ids):
+                existing[(row.product_id, row.other_product_id)] = row
+
+        updated, created = [], []
+        for (a, b), orders in delta.items():
+            row = existing.get((a, b))
+            if row is None:
+                created.append(ProductCoPurchase(store_id=store_id, product_id=a, other_product_id=b, orders=orders))
+            else:
+                row.orders += orders
+                updated.append(row)
+
+        ProductCoPurchase.objects.bulk_update(updated, ['orders'], batch_size=BATCH_SIZE)
+        ProductCoPurchase.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        return product_ids
+
+    # Scoring
+
+    def _write_suggestions(self, product_ids, total_orders):
+        from catalog.models import ProductCoPurchase, ProductSuggestion
+
+        if not product_ids or not total_orders:
+            return 0
+
+        written = 0
+        for ids in _chunks(product_ids, BATCH_SIZE):
+            # Store-summed pair counts for this chunk
+            pairs = {}
+            for product_id, other_id, orders in ProductCoPurchase.objects.filter(
+                product_id__in=ids
+            ).values('product_id', 'other_product_id').annotate(
+                total=Sum('orders')
+            ).values_list('product_id', 'other_product_id', 'total'):
+                pairs.setdefault(product_id, {})[other_id] = orders
+
+            neighbour_ids = {other_id for row in pairs.values() for other_id in row}
+            basket_counts = {}
+            for chunk in _chunks(neighbour_ids, BATCH_SIZE):
+                basket_counts.update(
+                    ProductCoPurchase.objects.filter(
+                        product_id__in=chunk, other_product_id=F('product_id')
+                    ).values('product_id').annotate(
+                        total=Sum('orders')
+                    ).values_list('product_id', 'total')
+                )
+
+            manual = set(
+                ProductSuggestion.objects.filter(
+                    product_id__in=ids, suggestion_type='frequently_bought', is_generated=False
+                ).values_list('product_id', 'suggested_product_id')
+            )
+
+            suggestions = []
+            for product_id, row in pairs.items():
+                product_orders = basket_counts.get(product_id) or row.get(product_id)
+                if not product_orders:
+                    continue
+                scored = []
+                for other_id, orders in row.items():
+                    if other_id == product_id or orders < self.min_support:
+                        continue
+                    if (product_id, other_id) in manual or not basket_counts.get(other_id):
+                        continue
+                    confidence = orders / product_orders
+                    lift = confidence / (basket_counts[other_id] / total_orders)
+                    scored.append((lift, confidence, other_id))
+
+                scored.sort(reverse=True)
+                for lift, confidence, other_id in scored[:self.top_n]:
+                    suggestions.append(ProductSuggestion(
+                        product_id=product_id,
+                        suggested_product_id=other_id,
+                        suggestion_type='frequently_bought',
+                        weight=max(1, round(lift * 100)),
+                        is_generated=True,
+                        confidence=confidence,
+                        lift=lift
+                    ))
+
+            ProductSuggestion.objects.filter(
+                product_id__in=ids, suggestion_type='frequently_bought', is_generated=True
+            ).delete()
+            ProductSuggestion.objects.bulk_create(suggestions, batch_size=BATCH_SIZE)
+            written += len(pairs)
+
+        return written
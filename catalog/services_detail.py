@@ -0,0 +1,107 @@
+"""
+Product Detail Services
+Loads everything the product detail page needs in one pass and caches the
+per-(product, ZIP) store options / related products block briefly. Stock
+is never served from the cache: every read reloads the stock fields of the
+cached StoreProducts with one primary-key query.
+"""
+from django.conf import settings
+from django.core.cache import cache
+import logging
+import random
+
+from core.cache_utils import bump_cache_version, versioned_key
+
+logger = logging.getLogger(__name__)
+
+DETAIL_NAMESPACE = 'product_detail'
+
+
+class ProductDetailService:
+    """Store options and related products for a product slug in a ZIP"""
+    CACHE_TIMEOUT = 60
+    RELATED_LIMIT = 4
+
+    @staticmethod
+    def invalidate():
+        bump_cache_version(DETAIL_NAMESPACE)
+
+    # StoreProduct fields that change with every order, read fresh on each request
+    STOCK_FIELDS = ('stock_quantity', 'availability_status', 'is_available')
+
+    @classmethod
+    def get_detail(cls, product_slug, zip_code):
+        """{'options': [StoreProduct, cheapest first], 'related_products': [StoreProduct]}"""
+        cache_key = versioned_key(DETAIL_NAMESPACE, product_slug, zip_code)
+        detail = cache.get(cache_key)
+        if detail is None:
+            detail = cls._build(product_slug, zip_code)
+            cache.set(cache_key, detail, timeout=cls.CACHE_TIMEOUT)
+        return cls._with_current_stock(detail)
+
+    @classmethod
+    def _with_current_stock(cls, detail):
+        """Overwrite cached stock with current values, dropping offers no longer available"""
+        from catalog.models import StoreProduct
+        from catalog.services_stock import StockHoldService
+
+        store_products = detail['options'] + detail['related_products']
+        if not store_products:
+            return detail
+
+        fields = list(cls.STOCK_FIELDS)
+        queryset = StoreProduct.objects.filter(pk__in=[sp.pk for sp in store_products])
+        if StockHoldService.enabled():
+            queryset = StockHoldService.with_held_quantity(queryset)
+            fields.append('held_quantity')
+        current = {row['pk']: row for row in queryset.values('pk', *fields)}
+
+        for sp in store_products:
+            for field in fields:
+                setattr(sp, field, current.get(sp.pk, {}).get(field))
+        return {
+            'options': [sp for sp in detail['options'] if sp.is_available],
+            'related_products': [sp for sp in detail['related_products'] if sp.is_available],
+        }
+
+    @classmethod
+    def _build(cls, product_slug, zip_code):
+        from catalog.models import StoreProduct
+        from catalog.services_listing import ZipCatalogService
+        from stores.services import ZipServiceResolver
+
+        store_ids = ZipServiceResolver.get_store_ids(zip_code)
+        options = list(
+            StoreProduct.objects.filter(
+                store_id__in=store_ids,
+                product__slug=product_slug,
+                is_available=True
+            ).select_related('product__category', 'store').order_by('price', 'id')
+        )
+
+        related_products = []
+        if options:
+            product = options[0].product
+            entries = ZipCatalogService.entries_for_zip(
+                ZipServiceResolver.get_zip_area(zip_code), store_ids
+            ).filter(
+                category_id=product.category_id
+            ).exclude(
+                product_id=product.id
+            ).order_by('-popularity_score', 'product_name')
+            related_products = ZipCatalogService.store_products(
+                ZipCatalogService.with_store_products(entries)[:cls.RELATED_LIMIT]
+            )
+
+        return {
+            'options': options,
+            'related_products': related_products,
+        }
+
+    @staticmethod
+    def log_sample(message, **fields):
+        """Structured debug record for a sample of detail requests"""
+        rate = getattr(settings, 'PRODUCT_DETAIL_LOG_SAMPLE_RATE', 0.01)
+        if rate and random.random() < rate:
+            details = ' '.join(f'{key}={value}' for key, value in fields.items())
+            logger.info(f"{message} {details}", extra={'detail': fields})
@@ -0,0 +1,67 @@
+"""
+Product Export Services
+Streams a store's catalog as CSV or NDJSON in the bulk import format.
+
+Rows come from one `values_list` query read with `.iterator()`, so memory
+stays flat however large the price list is. The columns are the import
+columns, so an export can be edited offline and uploaded again.
+"""
+import csv
+import json
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Import column -> StoreProduct lookup
+EXPORT_COLUMNS = [
+    ('name', 'product__name'),
+    ('category', 'product__category__name'),
+    ('price', 'price'),
+    ('weight', 'product__weight_per_unit'),
+    ('unit_type', 'product__unit_type'),
+    ('description', 'product__description'),
+    ('sku', 'product__sku'),
+    ('brand', 'product__brand'),
+    ('stock_quantity', 'stock_quantity'),
+    ('is_featured', 'is_featured'),
+    ('is_available', 'is_available'),
+]
+EXPORT_HEADERS = [column for column, _lookup in EXPORT_COLUMNS]
+
+
+class _Echo:
+    """csv.writer target that hands each formatted line straight back"""
+
+    def write(self, value):
+        return value
+
+
+class ProductExportService:
+    """Constant-memory catalog export for one store"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def rows(self):
+        """One dict per StoreProduct, keyed by import column"""
+        from catalog.models import StoreProduct
+
+        values = StoreProduct.objects.filter(store=self.store).order_by(
+            'product__category__name', 'product__name', 'id'
+        ).values_list(*[lookup for _column, lookup in EXPORT_COLUMNS])
+
+        for row in values.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield dict(zip(EXPORT_HEADERS, row))
+
+    def iter_csv(self):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(EXPORT_HEADERS)
+        for row in self.rows():
+            row['is_featured'] = 'true' if row['is_featured'] else 'false'
+            row['is_available'] = 'true' if row['is_available'] else 'false'
+            yield writer.writerow(['' if row[column] is None else row[column] for column in EXPORT_HEADERS])
+
+    def iter_ndjson(self):
+        for row in self.rows():
+            row['price'] = str(row['price'])
+            row['weight'] = str(row['weight'])
+            yield json.dumps(row) + '\n'
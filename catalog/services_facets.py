@@ -0,0 +1,232 @@
+"""
+Catalog Facet Services
+Computes filter facets for a ZIP's listing in one grouped query, cached per
+catalog version and per ZIP area version. Catalog-wide edits (categories,
+products) start a new catalog version; a ZIP listing refresh, which is how
+stock and offer changes reach the facets, only starts a new version for the
+ZIP areas it rewrote.
+"""
+from django.core.cache import cache
+from django.db.models import Case, When, Value, IntegerField, Count, Min, Max, Q
+from decimal import Decimal, InvalidOperation
+import hashlib
+import json
+import logging
+
+from core.cache_utils import bump_cache_version, get_cache_version, versioned_key
+
+logger = logging.getLogger(__name__)
+
+CATALOG_NAMESPACE = 'catalog_facets'
+
+# Lower bounds of the price histogram buckets; the last bucket is open-ended
+PRICE_BUCKETS = [0, 100, 250, 500, 1000, 2000]
+
+FILTER_KEYS = ['q', 'category', 'subcategory', 'min_price', 'max_price', 'unit_type', 'available']
+
+
+def _parse_price(value):
+    try:
+        return Decimal(value) if value not in (None, '') else None
+    except (InvalidOperation, TypeError):
+        return None
+
+
+class CatalogFacetService:
+    """Facets (categories, subcategories, price histogram, unit types, stock) per ZIP + filters"""
+    CACHE_TIMEOUT = 300
+
+    @staticmethod
+    def invalidate():
+        """Called from catalog signals whenever catalog-wide listed data changes"""
+        bump_cache_version(CATALOG_NAMESPACE)
+
+    @classmethod
+    def invalidate_zip_areas(cls, zip_area_ids):
+        """New facet version for the given ZIP areas (every ZIP area when None)"""
+        if zip_area_ids is None:
+            cls.invalidate()
+            return
+        for zip_area_id in zip_area_ids:
+            bump_cache_version(cls._zip_namespace(zip_area_id))
+
+    @staticmethod
+    def _zip_namespace(zip_area_id):
+        return f'{CATALOG_NAMESPACE}:zip:{zip_area_id}'
+
+    @staticmethod
+    def filters_from_request(query_dict):
+        """Normalize the listing's GET parameters into a filter dict"""
+        return {key: (query_dict.get(key) or '').strip() for key in FILTER_KEYS}
+
+    @classmethod
+    def get_facets(cls, zip_code, filters):
+        from stores.services import ZipServiceResolver
+
+        store_ids = ZipServiceResolver.get_store_ids(zip_code)
+        if not store_ids:
+            return cls._empty(zip_code)
+
+        # Store IDs are part of the key so coverage changes never serve stale facets
+        digest = hashlib.md5(
+            json.dumps([store_ids, filters], sort_keys=True).encode()
+        ).hexdigest()
+        zip_version = get_cache_version(cls._zip_namespace(ZipServiceResolver.get_zip_area(zip_code).pk))
+        cache_key = versioned_key(CATALOG_NAMESPACE, zip_code, zip_version, digest)
+
+        facets = cache.get(cache_key)
+        if facets is None:
+            facets = cls._compute(zip_code, store_ids, filters)
+            cache.set(cache_key, facets, timeout=cls.CACHE_TIMEOUT)
+        return facets
+
+    @staticmethod
+    def _empty(zip_code):
+        return {
+            'zip_code': zip_code,
+            'total': 0,
+            'in_stock': 0,
+            'price': {'min': None, 'max': None, 'histogram': []},
+            'categories': [],
+            'subcategories': [],
+            'unit_types': [],
+        }
+
+    @classmethod
+    def _bucket_expression(cls):
+        whens = [
+            When(price__gte=lower, then=Value(index))
+            for index, lower in reversed(list(enumerate(PRICE_BUCKETS)))
+        ]
+        return Case(*whens, default=Value(0), output_field=IntegerField())
+
+    @classmethod
+    def _compute(cls, zip_code, store_ids, filters):
+        from catalog.services_listing import ZipCatalogService
+        from catalog.services_search import get_search_backend
+        from stores.services import ZipServiceResolver
+
+        # Same materialized rows as ProductListView
+        queryset = ZipCatalogService.entries_for_zip(ZipServiceResolver.get_zip_area(zip_code), store_ids)
+
+        # Search and availability narrow every facet, so they go to WHERE.
+        # Price, category and unit type are applied per facet (price through
+        # conditional aggregates, the others while rolling up) so each facet
+        # still offers the options its own filter would exclude.
+        if filters.get('q'):
+            queryset = get_search_backend().filter_queryset(queryset, filters['q'], prefix=True, rank=False)
+        if filters.get('available') == '1':
+            queryset = queryset.filter(in_stock=True)
+
+        in_range = Q()
+        min_price = _parse_price(filters.get('min_price'))
+        max_price = _parse_price(filters.get('max_price'))
+        if min_price is not None:
+            in_range &= Q(price__gte=min_price)
+        if max_price is not None:
+            in_range &= Q(price__lte=max_price)
+
+        rows = list(
+            queryset.annotate(price_bucket=cls._bucket_expression()).values(
+                'category_id',
+                'unit_type',
+                'price_bucket',
+            ).annotate(
+                all_items=Count('id'),
+                items=Count('id', filter=in_range),
+                in_stock=Count('id', filter=in_range & Q(in_stock=True)),
+                min_price=Min('price'),
+                max_price=Max('price'),
+            ).order_by()
+        )
+
+        return cls._roll_up(zip_code, rows, filters)
+
+    @classmethod
+    def _roll_up(cls, zip_code, rows, filters):
+        from catalog.services_categories import CategoryTreeService
+
+        tree = CategoryTreeService.get_tree()
+        category_slug = filters.get('category')
+        unit_type = filters.get('unit_type')
+
+        # Category names and hierarchy come from the cached tree, not the query
+        selected = tree.get(filters.get('subcategory') or category_slug)
+        selected_ids = selected.descendant_ids if selected else None
+        parent = tree.get(category_slug)
+
+        def in_unit(row):
+            return not unit_type or row['unit_type'] == unit_type
+
+        categories, subcategories, unit_types, buckets = {}, {}, {}, {}
+        total = in_stock = 0
+        min_price = max_price = None
+
+        for row in rows:
+            node = tree.get(row['category_id'])
+            if node is None:
+                continue
+
+            # Category facets respect every filter except the category itself
+            if row['items'] and in_unit(row):
+                categories[node.root_id] = categories.get(node.root_id, 0) + row['items']
+                # Subcategory counts roll up to the selected category's direct children
+                if parent is not None and parent.id in node.path_ids and node.id != parent.id:
+                    child_id = node.path_ids[node.path_ids.index(parent.id) + 1]
+                    subcategories[child_id] = subcategories.get(child_id, 0) + row['items']
+
+            if (filters.get('subcategory') or category_slug) and (
+                    selected_ids is None or node.id not in selected_ids):
+                continue
+
+            # Unit type facet respects every filter except the unit type itself
+            unit = row['unit_type']
+            if unit and row['items']:
+                unit_types[unit] = unit_types.get(unit, 0) + row['items']
+
+            if not in_unit(row):
+                continue
+
+            # Price range and histogram ignore the price filter
+            buckets[row['price_bucket']] = buckets.get(row['price_bucket'], 0) + row['all_items']
+            if min_price is None or row['min_price'] < min_price:
+                min_price = row['min_price']
+            if max_price is None or row['max_price'] > max_price:
+                max_price = row['max_price']
+
+            total += row['items']
+            in_stock += row['in_stock']
+
+        def is_listed(node):
+            # Only categories the storefront navigation shows: active, under active parents
+            return all(tree.get(node_id).is_active for node_id in node.path_ids)
+
+        def category_list(counts):
+            nodes = sorted((node for node in map(tree.get, counts) if is_listed(node)),
+                           key=lambda node: (node.sort_order, node.name))
+            return [
+                {'id': node.id, 'name': node.name, 'slug': node.slug, 'count': counts[node.id]}
+                for node in nodes
+            ]
+
+        histogram = []
+        for index, lower in enumerate(PRICE_BUCKETS):
+            upper = PRICE_BUCKETS[index + 1] if index + 1 < len(PRICE_BUCKETS) else None
+            histogram.append({'min': lower, 'max': upper, 'count': buckets.get(index, 0)})
+
+        return {
+            'zip_code': zip_code,
+            'total': total,
+            'in_stock': in_stock,
+            'price': {
+                'min': str(min_price) if min_price is not None else None,
+                'max': str(max_price) if max_price is not None else None,
+                'histogram': histogram,
+            },
+            'categories': category_list(categories),
+            'subcategories': category_list(subcategories),
+            'unit_types': [
+                {'value': value, 'count': count}
+                for value, count in sorted(unit_types.items())
+            ],
+        }
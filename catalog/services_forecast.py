@@ -0,0 +1,200 @@
+"""
+Demand Forecasting Services
+Daily demand statistics for predictive restocking and transfer planning.
+
+Delivered OrderItem quantities for one store (or every store) are read in a
+single grouped query and pivoted into a products x days matrix, zero-filled
+for days without sales. The window covers complete days only, so today's
+partial sales never drag the forecast down. Every statistic is computed for
+all products at once:
+
+- mean, population variance and peak daily demand
+- trend: least-squares slope of daily demand across the window
+- weekday seasonality: each weekday's mean demand relative to the overall
+  mean, clamped to WEEKDAY_FACTOR_BOUNDS so a weekday that happened to see
+  no sales in a short window never forecasts zero demand
+- simple exponential smoothing, whose final level is the demand forecast
+
+The matrix is a NumPy array when NumPy is installed and a list of rows
+otherwise; both backends return the same figures.
+"""
+from datetime import timedelta
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+import logging
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Relative change across the window that counts as a rising or falling trend
+TREND_THRESHOLD = 0.1
+
+# Weekday factors are kept within (floor, ceiling) of the average day
+WEEKDAY_FACTOR_BOUNDS = (0.5, 2.0)
+
+
+def clamp_factor(factor):
+    floor, ceiling = WEEKDAY_FACTOR_BOUNDS
+    return min(max(factor, floor), ceiling)
+
+
+def _trend(slope, mean, days):
+    change = slope * (days - 1) / mean if mean else 0.0
+    if change > TREND_THRESHOLD:
+        return 'increasing'
+    if change < -TREND_THRESHOLD:
+        return 'decreasing'
+    return 'stable'
+
+
+def _summary(mean, variance, peak, slope, weekday_factors, level, sales_days, days):
+    return {
+        'avg_daily_demand': mean,
+        'max_daily_demand': peak,
+        'demand_variance': variance,
+        'trend_slope': slope,
+        'trend': _trend(slope, mean, days),
+        'weekday_factors': [clamp_factor(factor) for factor in weekday_factors],
+        'smoothed_demand': level,
+        'total_days': sales_days,
+    }
+
+
+def forecast_python(matrix, weekdays, alpha):
+    """Per-row demand statistics of a products x days matrix (lists of daily quantities)"""
+    days = len(weekdays)
+    offsets = [day - (days - 1) / 2 for day in range(days)]
+    offsets_norm = sum(offset * offset for offset in offsets)
+    columns_by_weekday = [
+        [day for day, weekday in enumerate(weekdays) if weekday == target] for target in range(7)
+    ]
+
+    results = []
+    for row in matrix:
+        mean = sum(row) / days
+        variance = sum((value - mean) ** 2 for value in row) / days
+        slope = sum(value * offset for value, offset in zip(row, offsets)) / offsets_norm if offsets_norm else 0.0
+
+        weekday_factors = []
+        for columns in columns_by_weekday:
+            if columns and mean:
+                weekday_factors.append(sum(row[day] for day in columns) / len(columns) / mean)
+            else:
+                weekday_factors.append(1.0)
+
+        level = float(row[0])
+        for value in row[1:]:
+            level = alpha * value + (1 - alpha) * level
+
+        sales_days = sum(1 for value in row if value)
+        results.append(_summary(
+            mean, variance, float(max(row)), slope, weekday_factors, level, sales_days, days
+        ))
+    return results
+
+
+def forecast_numpy(matrix, weekdays, alpha):
+    """Same as forecast_python, on a NumPy array"""
+    demand = np.asarray(matrix, dtype=float)
+    days = demand.shape[1]
+
+    mean = demand.mean(axis=1)
+    variance = demand.var(axis=1)
+    peak = demand.max(axis=1)
+
+    offsets = np.arange(days) - (days - 1) / 2
+    offsets_norm = offsets @ offsets
+    slope = demand @ offsets / offsets_norm if offsets_norm else np.zeros(len(demand))
+
+    # Weekdays missing from a short window keep a neutral factor of 1
+    weekday_means = np.repeat(mean[:, None], 7, axis=1)
+    weekday_index = np.asarray(weekdays)
+    for weekday in range(7):
+        columns = weekday_index == weekday
+        if columns.any():
+            weekday_means[:, weekday] = demand[:, columns].mean(axis=1)
+    weekday_factors = np.divide(
+        weekday_means, mean[:, None], out=np.ones_like(weekday_means), where=mean[:, None] > 0
+    )
+
+    level = demand[:, 0].copy()
+    for column in demand.T[1:]:
+        level = alpha * column + (1 - alpha) * level
+
+    sales_days = np.count_nonzero(demand, axis=1)
+    return [
+        _summary(
+            float(mean[i]), float(variance[i]), float(peak[i]), float(slope[i]),
+            weekday_factors[i].tolist(), float(level[i]), int(sales_days[i]), days
+        )
+        for i in range(len(demand))
+    ]
+
+
+class DemandForecaster:
+    """Vectorized daily demand statistics for every product of a store or the network"""
+    WINDOW_DAYS = 30
+    # Exponential smoothing factor: weight of the most recent day
+    ALPHA = 0.3
+
+    def __init__(self, days=None, alpha=None, use_numpy=None):
+        self.days = days or self.WINDOW_DAYS
+        self.alpha = alpha or self.ALPHA
+        if use_numpy is None:
+            use_numpy = np is not None
+        elif use_numpy and np is None:
+            raise ImportError("NumPy is required for the numpy backend")
+        self.backend = 'numpy' if use_numpy else 'python'
+        self._forecast = forecast_numpy if use_numpy else forecast_python
+
+    def window(self):
+        """(first, last) dates of the window: the complete days up to yesterday"""
+        end_date = timezone.localdate() - timedelta(days=1)
+        return end_date - timedelta(days=self.days - 1), end_date
+
+    def demand_matrix(self, store=None, product_ids=None):
+        """
+        (keys, dates, rows): one zero-filled row of daily quantities per
+        product, keyed by product ID for one store or by (store ID, product
+        ID) across every store when store is None
+        """
+        from orders.models import OrderItem
+
+        start_date, end_date = self.window()
+        items = OrderItem.objects.filter(
+            order__status='delivered',
+            order__created_at__date__range=[start_date, end_date]
+        )
+        if store is not None:
+            items = items.filter(order__store=store)
+        if product_ids is not None:
+            items = items.filter(store_product__product_id__in=product_ids)
+
+        sales = items.annotate(
+            day=TruncDate('order__created_at')
+        ).values('order__store_id', 'store_product__product_id', 'day').annotate(
+            quantity=Sum('quantity')
+        ).values_list('order__store_id', 'store_product__product_id', 'day', 'quantity')
+
+        dates = [start_date + timedelta(days=offset) for offset in range(self.days)]
+        column = {date: position for position, date in enumerate(dates)}
+        rows = {}
+        for store_id, product_id, day, quantity in sales:
+            key = product_id if store is not None else (store_id, product_id)
+            rows.setdefault(key, [0] * self.days)[column[day]] += quantity
+
+        ordered_keys = sorted(rows)
+        return ordered_keys, dates, [rows[key] for key in ordered_keys]
+
+    def forecast(self, store=None, product_ids=None):
+        """Demand statistics for products with sales in the window, keyed like demand_matrix"""
+        ordered_keys, dates, matrix = self.demand_matrix(store, product_ids)
+        if not matrix:
+            return {}
+        stats = self._forecast(matrix, [date.weekday() for date in dates], self.alpha)
+        return dict(zip(ordered_keys, stats))
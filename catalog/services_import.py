@@ -0,0 +1,677 @@
+"""
+Product Import Services
+Streaming CSV price-list import for a store.
+
+The upload is decoded and parsed row by row and handled in chunks of
+CHUNK_SIZE rows. Each chunk resolves its categories, existing products,
+slugs and SKUs with set-based queries, writes through bulk_create /
+bulk_update and commits on its own, so a large file never holds one long
+transaction and a bad row only fails itself.
+
+Bulk writes skip model signals, so after every committed chunk the search
+index, ZIP catalog entries and the typeahead / facet / detail / suggestion
+caches are refreshed explicitly for the products it touched.
+
+Uploads from the store dashboard run as ImportJobs outside the request:
+the file is staged to MEDIA_ROOT and processed by a Celery task or, by
+default, a local thread pool. Progress is saved on the job after every
+chunk and pushed to the job's Channels group. A job can first be staged as
+a dry run, whose row-by-row diff against the store's offers is computed in
+memory and served in pages; applying it only writes the rows that change.
+"""
+import codecs
+import csv
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+import logging
+
+from core.background import run_in_background
+from core.cache_utils import versioned_key
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_HEADERS = ['name', 'category', 'price', 'weight', 'unit_type']
+CHUNK_SIZE = 1000
+BATCH_SIZE = 500
+
+STORE_PRODUCT_FIELDS = ['price', 'stock_quantity', 'is_available', 'availability_status', 'is_featured']
+
+
+def read_csv(upload, encoding='utf-8-sig'):
+    """DictReader over an uploaded file, decoded line by line instead of read() whole"""
+    return csv.DictReader(codecs.iterdecode(upload, encoding))
+
+
+def missing_headers(reader):
+    """Required columns absent from the CSV header row"""
+    fieldnames = reader.fieldnames or []
+    return [header for header in REQUIRED_HEADERS if header not in fieldnames]
+
+
+def parse_row(row):
+    """Validate and convert one CSV row; raises ValueError with a readable message"""
+    def value(key, default=''):
+        return (row.get(key) or default).strip()
+
+    name = value('name')
+    category_name = value('category')
+    price_str = value('price')
+    weight_str = value('weight')
+
+    if not all([name, category_name, price_str, weight_str]):
+        raise ValueError("Missing required fields: name, category, price, or weight")
+    if len(name) > 200:
+        raise ValueError("Product name is longer than 200 characters")
+
+    try:
+        price = Decimal(price_str)
+        weight = Decimal(weight_str)
+        stock_quantity_str = value('stock_quantity', '0')
+        stock_quantity = int(stock_quantity_str) if stock_quantity_str else 0
+    except (InvalidOperation, ValueError) as e:
+        raise ValueError(f"Invalid numeric value: {e}")
+
+    return {
+        'name': name,
+        'category': category_name,
+        'price': price,
+        'weight': weight,
+        'unit_type': value('unit_type') or 'grams',
+        'description': value('description'),
+        'sku': value('sku') or None,
+        'brand': value('brand'),
+        'stock_quantity': stock_quantity,
+        'is_featured': value('is_featured').lower() in ['true', 'yes', '1'],
+        # Optional (exports include it); offers are listed unless it says otherwise
+        'is_available': value('is_available').lower() not in ['false', 'no', '0'],
+    }
+
+
+def offer_values(data):
+    """StoreProduct field values a parsed row sets"""
+    return {
+        'price': data['price'],
+        'stock_quantity': data['stock_quantity'],
+        'is_available': data['is_available'],
+        'availability_status': 'in_stock' if data['stock_quantity'] > 0 else 'out_of_stock',
+        'is_featured': data['is_featured'],
+    }
+
+
+def offer_state(store_product):
+    return {field: getattr(store_product, field) for field in STORE_PRODUCT_FIELDS}
+
+
+def offer_changes(current, values):
+    """{field: (old, new)} for the imported values that differ from the current offer"""
+    return {
+        field: (current[field], value)
+        for field, value in values.items()
+        if current[field] != value
+    }
+
+
+class ProductImportService:
+    """Chunked, set-based import of CSV rows into Product / StoreProduct for one store"""
+
+    def __init__(self, store, chunk_size=CHUNK_SIZE, progress=None):
+        self.store = store
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.categories = {}
+        self.category_errors = {}
+        self.results = {
+            'total_rows': 0,
+            'created': 0,
+            'updated': 0,
+            'unchanged': 0,
+            'errors': 0,
+            'error_details': []
+        }
+
+    def run(self, reader):
+        """Import every row of a DictReader; returns the results summary"""
+        for chunk in self._read_chunks(reader):
+            self._process_chunk(chunk)
+
+        logger.info(
+            f"Import for store {self.store.pk}: {self.results['created']} created, "
+            f"{self.results['updated']} updated, {self.results['unchanged']} unchanged, "
+            f"{self.results['errors']} errors"
+        )
+        return self.results
+
+    def preview(self, reader):
+        """
+        Dry run: diff every row against the store's current offers without
+        writing anything. Returns {'summary': counts, 'rows': per-row diff}.
+        """
+        from catalog.models import Category, StoreProduct
+
+        # The store's whole price list in one query; per-row lookups are dict hits
+        offers = {
+            store_product.product_id: offer_state(store_product)
+            for store_product in StoreProduct.objects.filter(store=self.store).only('product_id', *STORE_PRODUCT_FIELDS)
+        }
+
+        summary = {
+            'total_rows': 0,
+            'new_products': 0,
+            'new_offers': 0,
+            'updates': 0,
+            'price_changes': 0,
+            'stock_changes': 0,
+            'unchanged': 0,
+            'errors': 0,
+            'new_categories': [],
+        }
+        diff = []
+        planned = {}
+        new_skus = set()
+        known_categories = set()
+        new_categories = set()
+
+        for chunk in self._read_chunks(reader):
+            parsed = self._parse_chunk(chunk)
+            match = self._match_products(parsed)
+            names = {data['category'] for _row_num, _row, data in parsed} - known_categories - new_categories
+            known_categories.update(Category.objects.filter(name__in=names).values_list('name', flat=True))
+
+            for row_num, _row, data in parsed:
+                entry = {'row': row_num, 'name': data['name'], 'sku': data['sku'], 'changes': {}}
+                product = match(data)
+                key = product.id if product is not None else ('new', data['name'])
+                values = offer_values(data)
+
+                # An earlier row for the same product is applied first
+                current = planned.get(key)
+                if current is None and product is not None:
+                    current = offers.get(product.id)
+
+                if current is not None:
+                    changes = offer_changes(current, values)
+                    entry['action'] = 'update' if changes else 'unchanged'
+                    entry['changes'] = {
+                        field: {'old': str(old), 'new': str(new)} for field, (old, new) in changes.items()
+                    }
+                    summary['updates' if changes else 'unchanged'] += 1
+                    summary['price_changes'] += 'price' in changes
+                    summary['stock_changes'] += 'stock_quantity' in changes
+                elif product is not None:
+                    entry['action'] = 'new_offer'
+                    summary['new_offers'] += 1
+                elif data['sku'] and data['sku'] in new_skus:
+                    entry['action'] = 'error'
+                    entry['error'] = f"SKU {data['sku']} appears twice in the file"
+                    summary['errors'] += 1
+                    diff.append(entry)
+                    continue
+                else:
+                    entry['action'] = 'new_product'
+                    summary['new_products'] += 1
+                    if data['sku']:
+                        new_skus.add(data['sku'])
+                    if data['category'] not in known_categories:
+                        new_categories.add(data['category'])
+
+                planned[key] = values
+                diff.append(entry)
+
+        for error in self.results['error_details']:
+            diff.append({'row': error['row'], 'action': 'error', 'error': error['error'], 'changes': {}})
+        diff.sort(key=lambda entry: entry['row'])
+
+        summary['total_rows'] = self.results['total_rows']
+        summary['errors'] += self.results['errors']
+        summary['new_categories'] = sorted(new_categories)
+        return {'summary': summary, 'rows': diff}
+
+    def _read_chunks(self, reader):
+        """(row_num, row) lists of up to chunk_size rows"""
+        chunk = []
+        row_num = 1
+        try:
+            for row_num, row in enumerate(reader, start=2):  # Row 1 is the header
+                chunk.append((row_num, row))
+                if len(chunk) >= self.chunk_size:
+                    yield chunk
+                    chunk = []
+        except (UnicodeDecodeError, csv.Error) as e:
+            # Rows read so far are still used; the rest of the file is not
+            self._error(row_num + 1, f"Could not read the file past this row: {e}")
+        if chunk:
+            yield chunk
+
+    def _parse_chunk(self, chunk):
+        self.results['total_rows'] += len(chunk)
+
+        parsed = []
+        for row_num, row in chunk:
+            try:
+                parsed.append((row_num, row, parse_row(row)))
+            except ValueError as e:
+                self._error(row_num, e, row)
+        return parsed
+
+    @staticmethod
+    def _match_products(rows):
+        """
+        Existing product for each row's data: by SKU when the row has a known
+        one, else by name (the oldest wins if a name is duplicated)
+        """
+        from catalog.models import Product
+
+        skus = {data['sku'] for _row_num, _row, data in rows if data['sku']}
+        by_sku = {product.sku: product for product in Product.objects.filter(sku__in=skus)} if skus else {}
+
+        by_name = {}
+        for product in Product.objects.filter(
+            name__in={data['name'] for _row_num, _row, data in rows}
+        ).order_by('-id'):
+            by_name[product.name] = product
+
+        def match(data):
+            if data['sku'] and data['sku'] in by_sku:
+                return by_sku[data['sku']]
+            return by_name.get(data['name'])
+        return match
+
+    def _error(self, row_num, error, data=None):
+        self.results['errors'] += 1
+        self.results['error_details'].append({
+            'row': row_num,
+            'error': str(error),
+            'data': data
+        })
+
+    # Chunk processing
+
+    def _process_chunk(self, chunk):
+        self._import_chunk(chunk)
+        if self.progress is not None:
+            self.progress(self.results)
+
+    def _import_chunk(self, chunk):
+        parsed = self._parse_chunk(chunk)
+
+        self._resolve_categories({data['category'] for _row_num, _row, data in parsed})
+
+        rows = []
+        for row_num, row, data in parsed:
+            if data['category'] in self.category_errors:
+                self._error(row_num, self.category_errors[data['category']], row)
+            else:
+                rows.append((row_num, row, data))
+        if not rows:
+            return
+
+        try:
+            with transaction.atomic():
+                outcome = self._write(rows)
+        except DatabaseError as e:
+            logger.error(f"Import chunk for store {self.store.pk} failed: {str(e)}")
+            for row_num, row, _data in rows:
+                self._error(row_num, f"Chunk could not be saved: {e}", row)
+            return
+
+        self.results['created'] += outcome['created']
+        self.results['updated'] += outcome['updated']
+        self.results['unchanged'] += outcome['unchanged']
+        for row_num, error, row in outcome['errors']:
+            self._error(row_num, error, row)
+
+        self._sync_catalog(outcome['new_product_ids'], outcome['product_ids'])
+
+    def _resolve_categories(self, names):
+        """Load (or create) categories by name, remembered for the whole import"""
+        from catalog.models import Category
+
+        missing = [name for name in names if name not in self.categories and name not in self.category_errors]
+        if not missing:
+            return
+
+        for category in Category.objects.filter(name__in=missing):
+            self.categories[category.name] = category
+
+        # New categories are rare and go through save() so the tree / index signals fire
+        for name in missing:
+            if name in self.categories:
+                continue
+            try:
+                with transaction.atomic():
+                    self.categories[name], _created = Category.objects.get_or_create(
+                        name=name,
+                        defaults={
+                            'slug': slugify(name),
+                            'is_active': True
+                        }
+                    )
+            except IntegrityError as e:
+                self.category_errors[name] = f"Could not create category '{name}': {e}"
+
+    def _write(self, rows):
+        """Create missing products and upsert the store's offers for one chunk"""
+        from catalog.models import Product, StoreProduct
+        from catalog.services_sku import SkuAllocator
+
+        errors = []
+        match = self._match_products(rows)
+
+        # First row for an unknown product defines it
+        new_products = {}
+        skus = set()
+        for row_num, row, data in rows:
+            if match(data) is not None or data['name'] in new_products:
+                continue
+            if data['sku'] and data['sku'] in skus:
+                errors.append((row_num, f"SKU {data['sku']} appears twice in the file", row))
+                continue
+            new_products[data['name']] = Product(
+                name=data['name'],
+                slug=slugify(data['name']),
+                description=data['description'] or f"Fresh {data['name'].lower()} delivered to your doorstep",
+                category=self.categories[data['category']],
+                sku=data['sku'],
+                brand=data['brand'],
+                weight_per_unit=data['weight'],
+                unit_type=data['unit_type'],
+                is_active=True
+            )
+            if data['sku']:
+                skus.add(data['sku'])
+
+        created_products = list(new_products.values())
+        self._assign_slugs(created_products)
+        SkuAllocator.assign(
+            created_products,
+            category_names={category.id: category.name for category in self.categories.values()}
+        )
+        Product.objects.bulk_create(created_products, batch_size=BATCH_SIZE)
+
+        products = {}
+        for row_num, row, data in rows:
+            product = match(data) or new_products.get(data['name'])
+            if product is not None:
+                products[row_num] = product
+
+        # Upsert offers; rows that would not change an offer are left alone
+        store_products = {
+            store_product.product_id: store_product
+            for store_product in StoreProduct.objects.filter(
+                store=self.store,
+                product_id__in={product.id for product in products.values()}
+            )
+        }
+        to_create, to_update = {}, {}
+        created = updated = unchanged = 0
+        now = timezone.now()
+
+        for row_num, row, data in rows:
+            product = products.get(row_num)
+            if product is None:
+                continue
+            values = offer_values(data)
+
+            store_product = store_products.get(product.id)
+            if store_product is None:
+                store_product = StoreProduct(store=self.store, product=product, **values)
+                store_products[product.id] = to_create[product.id] = store_product
+                created += 1
+                continue
+
+            if not offer_changes(offer_state(store_product), values):
+                unchanged += 1
+                continue
+            for field, value in values.items():
+                setattr(store_product, field, value)
+            if store_product.pk:
+                store_product.updated_at = now
+                to_update[product.id] = store_product
+            updated += 1
+
+        StoreProduct.objects.bulk_create(to_create.values(), batch_size=BATCH_SIZE)
+        StoreProduct.objects.bulk_update(
+            to_update.values(), STORE_PRODUCT_FIELDS + ['updated_at'], batch_size=BATCH_SIZE
+        )
+
+        return {
+            'created': created,
+            'updated': updated,
+            'unchanged': unchanged,
+            'errors': errors,
+            'new_product_ids': [product.id for product in created_products],
+            'product_ids': list(to_create) + list(to_update),
+        }
+
+    @staticmethod
+    def _assign_slugs(products):
+        """Unique slugs for new products, checked against the catalog in two queries"""
+        from catalog.models import Product
+
+        bases = [product.slug for product in products]
+        taken = set(Product.objects.filter(slug__in=set(bases)).values_list('slug', flat=True))
+
+        # Only bases already in use (or repeated in this chunk) need their "-n" variants loaded
+        seen, clashing = set(), set()
+        for base in bases:
+            if base in taken or base in seen:
+                clashing.add(base)
+            seen.add(base)
+        if clashing:
+            suffixed = Q()
+            for base in clashing:
+                suffixed |= Q(slug__startswith=f"{base}-")
+            taken.update(Product.objects.filter(suffixed).values_list('slug', flat=True))
+
+        for product in products:
+            base = slug = product.slug
+            counter = 1
+            while slug in taken:
+                slug = f"{base}-{counter}"
+                counter += 1
+            taken.add(slug)
+            product.slug = slug
+
+    def _sync_catalog(self, new_product_ids, product_ids):
+        """What the Product / StoreProduct signals would have done for the chunk"""
+        from catalog.services_detail import ProductDetailService
+        from catalog.services_listing import ZipCatalogService
+        from catalog.models import StoreProduct
+        from catalog.services_search import get_search_backend
+        from catalog.services_stock import StockBroadcaster
+        from catalog.services_suggestions import ProductSuggestionService
+        from catalog.services_typeahead import TypeaheadService
+
+        if new_product_ids:
+            try:
+                get_search_backend().index_products(new_product_ids)
+            except DatabaseError as e:
+                logger.error(f"Search index update failed for imported products: {str(e)}")
+            TypeaheadService.invalidate_catalog()
+            ProductSuggestionService.invalidate_catalog()
+
+        if product_ids:
+            ZipCatalogService.refresh_store(self.store.pk, product_ids=product_ids)
+            TypeaheadService.invalidate_store(self.store.pk)
+            ProductSuggestionService.invalidate_store(self.store.pk)
+            ProductDetailService.invalidate()
+            StockBroadcaster.publish(StoreProduct.objects.filter(
+                store=self.store, product_id__in=product_ids
+            ).values_list('store_id', 'product_id', 'stock_quantity', 'is_available'))
+
+
+class ImportJobService:
+    """Queues ImportJobs and runs them with progress reporting"""
+    ERROR_DETAIL_LIMIT = 200
+    PREVIEW_TIMEOUT = 3600
+
+    @classmethod
+    def create_job(cls, store, upload, user=None):
+        """Stage an uploaded CSV and queue it once the job row is committed"""
+        from catalog.models import ImportJob
+
+        job = ImportJob.objects.create(
+            store=store,
+            created_by=user,
+            file=upload,
+            original_name=upload.name
+        )
+        transaction.on_commit(lambda: cls.enqueue(job.pk))
+        return job
+
+    @classmethod
+    def create_preview(cls, store, upload, user=None):
+        """Stage an upload as a draft job and diff it; returns (job, diff rows)"""
+        from catalog.models import ImportJob
+
+        job = ImportJob.objects.create(
+            store=store,
+            created_by=user,
+            file=upload,
+            original_name=upload.name,
+            status='draft'
+        )
+        preview = cls._build_preview(job)
+        job.preview_summary = preview['summary']
+        job.total_rows = preview['summary']['total_rows']
+        job.save(update_fields=['preview_summary', 'total_rows', 'updated_at'])
+        return job, preview['rows']
+
+    @classmethod
+    def get_preview_rows(cls, job):
+        """Diff rows of a draft job, recomputed from the staged file if the cache lost them"""
+        rows = cache.get(versioned_key('import_preview', job.pk))
+        if rows is None:
+            rows = cls._build_preview(job)['rows']
+        return rows
+
+    @classmethod
+    def _build_preview(cls, job):
+        with job.file.open('rb') as upload:
+            preview = ProductImportService(job.store).preview(read_csv(upload))
+        cache.set(versioned_key('import_preview', job.pk), preview['rows'], timeout=cls.PREVIEW_TIMEOUT)
+        return preview
+
+    @classmethod
+    def apply(cls, job):
+        """Queue a previewed job; False if it was already applied"""
+        from catalog.models import ImportJob
+
+        if not ImportJob.objects.filter(pk=job.pk, status='draft').update(status='pending'):
+            return False
+        job.status = 'pending'
+        transaction.on_commit(lambda: cls.enqueue(job.pk))
+        return True
+
+    @classmethod
+    def enqueue(cls, job_id):
+        if getattr(settings, 'CATALOG_IMPORT_BACKEND', 'thread') == 'celery':
+            from catalog.tasks import process_import_job
+            process_import_job.delay(job_id)
+            return
+
+        run_in_background(
+            'catalog-import', cls.run, job_id,
+            max_workers=getattr(settings, 'CATALOG_IMPORT_WORKERS', 2)
+        )
+
+    @classmethod
+    def run(cls, job_id):
+        """Process a pending job; returns it, or None if another worker claimed it"""
+        from catalog.models import ImportJob
+
+        claimed = ImportJob.objects.filter(pk=job_id, status='pending').update(
+            status='running',
+            started_at=timezone.now()
+        )
+        if not claimed:
+            return None
+
+        job = ImportJob.objects.select_related('store').get(pk=job_id)
+        try:
+            job.total_rows = cls._count_rows(job)
+            cls._save(job)
+
+            with job.file.open('rb') as upload:
+                reader = read_csv(upload)
+                if missing_headers(reader):
+                    raise ValueError(f"CSV must contain these headers: {', '.join(REQUIRED_HEADERS)}")
+                importer = ProductImportService(job.store, progress=lambda results: cls._update(job, results))
+                results = importer.run(reader)
+
+            job.status = 'completed'
+            job.message = (
+                f"Import completed: {results['created']} created, {results['updated']} updated, "
+                f"{results['unchanged']} unchanged, {results['errors']} errors"
+            )
+        except Exception as e:
+            logger.exception(f"Import job {job_id} failed")
+            job.status = 'failed'
+            job.message = f"Error processing CSV: {str(e)}"
+
+        job.finished_at = timezone.now()
+        cls._save(job)
+        return job
+
+    @staticmethod
+    def _count_rows(job):
+        """Data rows in the staged file, for the progress bar (0 if unreadable)"""
+        try:
+            with job.file.open('rb') as upload:
+                return sum(1 for _row in read_csv(upload))
+        except (UnicodeDecodeError, csv.Error):
+            return 0
+
+    @classmethod
+    def _update(cls, job, results):
+        job.processed_rows = results['total_rows']
+        job.created_count = results['created']
+        job.updated_count = results['updated']
+        job.unchanged_count = results['unchanged']
+        job.error_count = results['errors']
+        job.error_details = results['error_details'][:cls.ERROR_DETAIL_LIMIT]
+        cls._save(job)
+
+    @classmethod
+    def _save(cls, job):
+        job.save(update_fields=[
+            'status', 'total_rows', 'processed_rows', 'created_count', 'updated_count',
+            'unchanged_count', 'error_count', 'error_details', 'message', 'finished_at', 'updated_at'
+        ])
+        cls._broadcast(job)
+
+    @classmethod
+    def _broadcast(cls, job):
+        from asgiref.sync import async_to_sync
+        from core.consumers import send_import_job_update
+
+        try:
+            async_to_sync(send_import_job_update)(job.pk, cls.serialize(job))
+        except Exception as e:
+            logger.warning(f"Could not push progress for import job {job.pk}: {str(e)}")
+
+    @staticmethod
+    def serialize(job):
+        return {
+            'id': job.pk,
+            'status': job.status,
+            'file_name': job.original_name,
+            'total_rows': job.total_rows,
+            'processed_rows': job.processed_rows,
+            'progress': job.progress_percent,
+            'created': job.created_count,
+            'updated': job.updated_count,
+            'unchanged': job.unchanged_count,
+            'errors': job.error_count,
+            'error_details': job.error_details,
+            'message': job.message,
+            'preview_summary': job.preview_summary,
+            'is_finished': job.is_finished,
+            'started_at': job.started_at.isoformat() if job.started_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        }
@@ -6,10 +6,15 @@ from django.db import transaction
 from django.utils import timezone
 from django.core.cache import cache
 from django.db.models import Sum, F, Q, Avg
+from datetime import timedelta
 from decimal import Decimal
 import logging
+import math
+import threading
 from typing import Dict, List, Optional
 
+from core.background import run_in_background
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,56 +22,48 @@ class InventorySyncService:
     """Core service for real-time inventory synchronization"""
     
     @staticmethod
-    def update_stock(store, product, new_quantity, reason="Manual update", user=None):
-        """Update stock with real-time sync across all systems"""
+    def update_stock(store, product, new_quantity, reason="Manual update", user=None, transfer=None):
+        """
+        Update stock with real-time sync across all systems. Only the row
+        lock and the UPDATE run in the transaction; the sync event, alert
+        checks and cache follow after commit (InventoryEventLog), as do the
+        listing refresh and the WebSocket broadcast (sync_catalog_stock).
+        """
         from catalog.models import StoreProduct
-        from catalog.models_inventory import InventorySyncEvent, StockAlert
+        from catalog.services_stock import sync_catalog_stock
         
-        with transaction.atomic():
-            try:
-                store_product = StoreProduct.objects.select_for_update().get(
-                    store=store, product=product
-                )
+        try:
+            with transaction.atomic():
+                store_product = StoreProduct.objects.select_for_update().only(
+                    'id', 'store_id', 'product_id', 'stock_quantity'
+                ).get(store=store, product=product)
                 previous_quantity = store_product.stock_quantity
                 
-                # Update stock
-                store_product.stock_quantity = new_quantity
-                store_product.last_stock_update = timezone.now()
-                store_product.save()
-                
-                # Create sync event
-                InventorySyncEvent.objects.create(
-                    product=product,
-                    store=store,
-                    event_type='stock_update',
-                    previous_quantity=previous_quantity,
-                    new_quantity=new_quantity,
-                    reason=reason,
-                    triggered_by=user
-                )
-                
-                # Check for alerts
-                InventorySyncService._check_stock_alerts(store_product)
-                
-                # Update cache
-                cache_key = f"stock_{store.id}_{product.id}"
-                cache.set(cache_key, new_quantity, timeout=300)
+                rows = StoreProduct.objects.filter(pk=store_product.pk)
+                rows.update(stock_quantity=new_quantity, updated_at=timezone.now())
                 
-                # Broadcast update (for real-time UI updates)
-                InventorySyncService._broadcast_stock_update(store, product, new_quantity)
+                # Relative updates (F('stock_quantity') +/- n) are resolved by the database;
+                # read back the number so events, alerts and the cache get a real quantity
+                if hasattr(new_quantity, 'resolve_expression'):
+                    new_quantity = rows.values_list('stock_quantity', flat=True).get()
                 
-                logger.info(f"Stock updated: {product.name} at {store.name}: {previous_quantity} → {new_quantity}")
-                return True
-                
-            except Exception as e:
-                logger.error(f"Stock update failed: {str(e)}")
-                return False
+                InventoryEventLog.record(
+                    store.id, product.id, 'stock_update', new_quantity, reason,
+                    previous_quantity=previous_quantity, user=user, transfer=transfer, check_alerts=True
+                )
+                transaction.on_commit(lambda: sync_catalog_stock([store_product.pk]))
+        except Exception as e:
+            logger.error(f"Stock update failed: {str(e)}")
+            return False
+        
+        logger.info(f"Stock updated: {product.name} at {store.name}: {previous_quantity} → {new_quantity}")
+        return True
     
     @staticmethod
     def get_cross_store_inventory(product, zip_area=None):
         """Get inventory levels across all stores for a product"""
         from catalog.models import StoreProduct
-        from stores.models import Store
+        from stores.services import StoreCoverageService
         
         query = StoreProduct.objects.filter(
             product=product,
@@ -74,16 +71,16 @@ class InventorySyncService:
         ).select_related('store')
         
         if zip_area:
-            query = query.filter(store__zip_coverages__zip_area=zip_area)
+            query = query.filter(store_id__in=StoreCoverageService.stores_covering(zip_area))
         
         inventory_data = []
         for sp in query:
             inventory_data.append({
                 'store': sp.store,
                 'stock_quantity': sp.stock_quantity,
-                'selling_price': sp.selling_price,
+                'selling_price': sp.price,
                 'is_available': sp.is_available,
-                'last_updated': sp.last_stock_update,
+                'last_updated': sp.updated_at,
                 'distance': 0  # TODO: Calculate based on customer location
             })
         
@@ -127,7 +124,6 @@ class InventorySyncService:
     def process_transfer_completion(transfer, user):
         """Process completed inventory transfer"""
         from catalog.models import StoreProduct
-        from catalog.models_inventory import InventorySyncEvent
         
         with transaction.atomic():
             # Update source store inventory
@@ -136,7 +132,8 @@ class InventorySyncService:
                 product=transfer.product,
                 new_quantity=F('stock_quantity') - transfer.transferred_quantity,
                 reason=f"Transfer out to {transfer.to_store.name}",
-                user=user
+                user=user,
+                transfer=transfer
             )
             
             # Update destination store inventory
@@ -154,154 +151,245 @@ class InventorySyncService:
                 product=transfer.product,
                 new_quantity=F('stock_quantity') + transfer.transferred_quantity,
                 reason=f"Transfer in from {transfer.from_store.name}",
-                user=user
+                user=user,
+                transfer=transfer
             )
             
             # Create completion events
-            InventorySyncEvent.objects.create(
-                product=transfer.product,
-                store=transfer.to_store,
-                event_type='transfer_complete',
-                new_quantity=transfer.transferred_quantity,
-                reason=f"Transfer completed from {transfer.from_store.name}",
-                triggered_by=user,
-                transfer=transfer
+            InventoryEventLog.record(
+                transfer.to_store_id, transfer.product_id, 'transfer_complete',
+                transfer.transferred_quantity, f"Transfer completed from {transfer.from_store.name}",
+                user=user, transfer=transfer
             )
     
     @staticmethod
-    def _check_stock_alerts(store_product):
-        """Check and create stock alerts"""
+    def check_stock_alerts(levels):
+        """
+        Raise missing stock alerts for {(store_id, product_id): quantity} with
+        one rule query and one bulk insert; alerts already open are kept as is
+        """
         from catalog.models_inventory import StockAlert, PredictiveRestockRule
         
-        # Get restock rules
-        try:
-            restock_rule = PredictiveRestockRule.objects.get(
-                store=store_product.store,
-                product=store_product.product,
+        rules = {
+            (rule.store_id, rule.product_id): rule
+            for rule in PredictiveRestockRule.objects.filter(
+                store_id__in={store_id for store_id, _product_id in levels},
+                product_id__in={product_id for _store_id, product_id in levels},
                 is_active=True
             )
-            
-            current_stock = store_product.stock_quantity
-            
-            # Check for low stock
-            if current_stock <= restock_rule.minimum_stock_level:
-                alert_type = 'out_of_stock' if current_stock == 0 else 'low_stock'
-                priority = 'critical' if current_stock == 0 else 'high'
-                
-                StockAlert.objects.get_or_create(
-                    product=store_product.product,
-                    store=store_product.store,
-                    alert_type=alert_type,
-                    defaults={
-                        'priority': priority,
-                        'current_stock': current_stock,
-                        'threshold_level': restock_rule.minimum_stock_level,
-                        'recommended_restock': restock_rule.calculate_reorder_quantity()
-                    }
-                )
-            
-            # Check for restock needed
-            elif current_stock <= restock_rule.reorder_level:
-                StockAlert.objects.get_or_create(
-                    product=store_product.product,
-                    store=store_product.store,
-                    alert_type='restock_needed',
-                    defaults={
-                        'priority': 'medium',
-                        'current_stock': current_stock,
-                        'threshold_level': restock_rule.reorder_level,
-                        'recommended_restock': restock_rule.calculate_reorder_quantity()
-                    }
-                )
+        }
         
-        except PredictiveRestockRule.DoesNotExist:
-            # Create basic low stock alert
-            if store_product.stock_quantity <= 5:
-                StockAlert.objects.get_or_create(
-                    product=store_product.product,
-                    store=store_product.store,
-                    alert_type='low_stock',
-                    defaults={
-                        'priority': 'medium',
-                        'current_stock': store_product.stock_quantity,
-                        'threshold_level': 5,
-                        'recommended_restock': 50
-                    }
-                )
-    
-    @staticmethod
-    def _broadcast_stock_update(store, product, new_quantity):
-        """Broadcast stock update for real-time UI updates"""
-        # TODO: Implement WebSocket/Server-Sent Events for real-time updates
-        # For now, we'll use cache-based updates
-        cache_key = f"stock_update_{store.id}_{product.id}"
-        cache.set(cache_key, {
-            'store_id': store.id,
-            'product_id': product.id,
-            'quantity': new_quantity,
-            'timestamp': timezone.now().isoformat()
-        }, timeout=60)
+        alerts = []
+        for (store_id, product_id), current_stock in levels.items():
+            restock_rule = rules.get((store_id, product_id))
+            if restock_rule is not None:
+                # Check for low stock
+                if current_stock <= restock_rule.minimum_stock_level:
+                    alert_type = 'out_of_stock' if current_stock == 0 else 'low_stock'
+                    priority = 'critical' if current_stock == 0 else 'high'
+                    threshold = restock_rule.minimum_stock_level
+                # Check for restock needed
+                elif current_stock <= restock_rule.reorder_level:
+                    alert_type, priority, threshold = 'restock_needed', 'medium', restock_rule.reorder_level
+                else:
+                    continue
+                recommended = restock_rule.calculate_reorder_quantity()
+            elif current_stock <= 5:
+                # Basic low stock alert
+                alert_type, priority, threshold, recommended = 'low_stock', 'medium', 5, 50
+            else:
+                continue
+            
+            alerts.append(StockAlert(
+                store_id=store_id,
+                product_id=product_id,
+                alert_type=alert_type,
+                priority=priority,
+                current_stock=current_stock,
+                threshold_level=threshold,
+                recommended_restock=recommended
+            ))
+        
+        # (product, store, alert_type) is unique: existing alerts win, like get_or_create
+        StockAlert.objects.bulk_create(alerts, ignore_conflicts=True)
+        return len(alerts)
     
     @staticmethod
     def auto_suggest_transfers():
         """Automatically suggest inventory transfers based on demand and availability"""
-        from catalog.models import StoreProduct
-        from catalog.models_inventory import InterStoreTransfer
-        from django.db.models import Avg
-        
-        suggestions = []
-        
-        # Find products with imbalanced inventory
-        products_needing_transfer = StoreProduct.objects.filter(
-            stock_quantity__lte=5,
-            is_available=True
-        ).select_related('product', 'store')
-        
-        for low_stock_product in products_needing_transfer:
-            # Find stores with excess inventory of same product
-            excess_stores = StoreProduct.objects.filter(
-                product=low_stock_product.product,
-                stock_quantity__gte=20,
-                store__is_active=True
-            ).exclude(
-                store=low_stock_product.store
-            ).select_related('store')
+        return TransferOptimizer().suggest()
+
+
+class TransferOptimizer:
+    """
+    Network-wide stock rebalancing between stores with overlapping coverage.
+    
+    Stock levels and forecast demand (services_forecast) are each loaded
+    with one query; coverage overlap comes from the in-memory
+    StoreCoverageService index. A store product is short when its stock
+    is at or below its reorder point and needs enough to reach a week of
+    forecast demand; a store has surplus above the larger of its own week of
+    demand and a fixed reserve. Shortages are then matched greedily, most
+    urgent first (out of stock, then fewest days of cover), to the donor
+    sharing the most ZIP areas, and a donor's surplus is drawn down across
+    all the receivers it serves.
+    """
+    # Floors that apply on their own to products without sales history
+    LOW_STOCK_LEVEL = 5
+    RESERVE_LEVEL = 15
+    REORDER_DAYS = 3
+    COVER_DAYS = 7
+    MIN_COVER_LEVEL = 10
+    
+    def __init__(self, forecast_days=30):
+        self.forecast_days = forecast_days
+    
+    def suggest(self):
+        """Ranked transfer proposals for the whole network"""
+        from catalog.models import Product, StoreProduct
+        from catalog.services_forecast import DemandForecaster
+        from stores.models import Store
+        from stores.services import StoreCoverageService
+        
+        demand = {
+            key: stats['smoothed_demand']
+            for key, stats in DemandForecaster(days=self.forecast_days).forecast().items()
+        }
+        neighbors = StoreCoverageService.get_index().neighbors
+        
+        receivers, donors = {}, {}
+        for store_id, product_id, stock, is_available in StoreProduct.objects.filter(
+            store__is_active=True
+        ).values_list('store_id', 'product_id', 'stock_quantity', 'is_available').iterator(chunk_size=5000):
+            daily = demand.get((store_id, product_id), 0.0)
+            cover = max(math.ceil(daily * self.COVER_DAYS), self.MIN_COVER_LEVEL)
+            reorder_point = max(math.ceil(daily * self.REORDER_DAYS), self.LOW_STOCK_LEVEL)
             
-            for excess_store_product in excess_stores[:3]:  # Top 3 candidates
-                # Check if they serve overlapping areas
-                common_areas = InventorySyncService._get_common_service_areas(
-                    excess_store_product.store,
-                    low_stock_product.store
+            if is_available and stock <= reorder_point and neighbors.get(store_id):
+                days_of_cover = stock / daily if daily else float(stock)
+                receivers.setdefault(product_id, []).append(
+                    (stock > 0, days_of_cover, store_id, stock, cover - stock)
                 )
-                
-                if common_areas:
-                    suggestions.append({
-                        'from_store': excess_store_product.store,
-                        'to_store': low_stock_product.store,
-                        'product': low_stock_product.product,
-                        'suggested_quantity': min(10, excess_store_product.stock_quantity - 15),
-                        'priority': 'high' if low_stock_product.stock_quantity == 0 else 'medium',
-                        'reason': f"Auto-suggested: Low stock ({low_stock_product.stock_quantity}) in {low_stock_product.store.name}"
+            else:
+                surplus = stock - max(cover, self.RESERVE_LEVEL)
+                if surplus > 0:
+                    donors.setdefault(product_id, {})[store_id] = surplus
+        
+        proposals = []
+        for product_id, product_receivers in receivers.items():
+            surplus = donors.get(product_id)
+            if not surplus:
+                continue
+            for in_stock, days_of_cover, store_id, stock, need in sorted(product_receivers):
+                shared = neighbors[store_id]
+                candidates = sorted(
+                    (donor_id for donor_id in surplus if donor_id in shared and surplus[donor_id] > 0),
+                    key=lambda donor_id: (-shared[donor_id], -surplus[donor_id])
+                )
+                for donor_id in candidates:
+                    if need <= 0:
+                        break
+                    quantity = min(need, surplus[donor_id])
+                    surplus[donor_id] -= quantity
+                    need -= quantity
+                    proposals.append({
+                        'from_store_id': donor_id,
+                        'to_store_id': store_id,
+                        'product_id': product_id,
+                        'suggested_quantity': quantity,
+                        'priority': 'medium' if in_stock else 'high',
+                        'days_of_cover': days_of_cover,
+                        'current_stock': stock,
+                        'common_areas': shared[donor_id],
                     })
         
-        return suggestions
-    
-    @staticmethod
-    def _get_common_service_areas(store1, store2):
-        """Get common service areas between two stores"""
-        from stores.models import StoreZipCoverage
+        proposals.sort(key=lambda p: (p['priority'] != 'high', p['days_of_cover'], -p['suggested_quantity']))
         
-        store1_zips = set(
-            StoreZipCoverage.objects.filter(store=store1, is_active=True)
-            .values_list('zip_area__zip_code', flat=True)
-        )
+        stores = Store.objects.in_bulk({p['from_store_id'] for p in proposals} | {p['to_store_id'] for p in proposals})
+        products = Product.objects.in_bulk({p['product_id'] for p in proposals})
+        for proposal in proposals:
+            proposal['from_store'] = stores[proposal['from_store_id']]
+            proposal['to_store'] = stores[proposal['to_store_id']]
+            proposal['product'] = products[proposal['product_id']]
+            proposal['reason'] = (
+                f"Auto-suggested: Low stock ({proposal['current_stock']}) in {proposal['to_store'].name}"
+            )
         
-        store2_zips = set(
-            StoreZipCoverage.objects.filter(store=store2, is_active=True)
-            .values_list('zip_area__zip_code', flat=True)
-        )
+        logger.info(f"Suggested {len(proposals)} transfers across {len(receivers)} short products")
+        return proposals
+
+
+class InventoryEventLog:
+    """
+    Write-behind buffer for InventorySyncEvent rows and stock alert checks.
+    
+    Entries join the buffer when their transaction commits, so rolled-back
+    stock changes are never logged and nothing here runs under the stock
+    row lock. A background flush writes everything buffered with one
+    bulk_create and checks alerts once per (store, product) touched since
+    the previous flush, however many updates it saw.
+    """
+    POOL = 'inventory-events'
+    BATCH_SIZE = 500
+    
+    _lock = threading.Lock()
+    _events = []
+    _levels = {}
+    _flush_scheduled = False
+    
+    @classmethod
+    def record(cls, store_id, product_id, event_type, new_quantity, reason,
+               previous_quantity=0, user=None, transfer=None, check_alerts=False):
+        """
+        Log an inventory event (and, for stock levels, check alerts) once the
+        transaction commits; `user` is a User or its ID
+        """
+        from catalog.models_inventory import InventorySyncEvent
         
-        return store1_zips.intersection(store2_zips)
+        event = InventorySyncEvent(
+            store_id=store_id,
+            product_id=product_id,
+            event_type=event_type,
+            previous_quantity=previous_quantity,
+            new_quantity=new_quantity,
+            reason=reason[:200],
+            triggered_by_id=getattr(user, 'pk', user),
+            transfer=transfer
+        )
+        level = (store_id, product_id, new_quantity) if check_alerts else None
+        transaction.on_commit(lambda: cls._enqueue(event, level))
+    
+    @classmethod
+    def flush(cls):
+        """Write everything buffered so far; returns the number of events written"""
+        with cls._lock:
+            events, levels = cls._events, cls._levels
+            cls._events, cls._levels = [], {}
+            cls._flush_scheduled = False
+        
+        if events:
+            from catalog.models_inventory import InventorySyncEvent
+            InventorySyncEvent.objects.bulk_create(events, batch_size=cls.BATCH_SIZE)
+        if levels:
+            InventorySyncService.check_stock_alerts(levels)
+        return len(events)
+    
+    @classmethod
+    def _enqueue(cls, event, level):
+        if level is not None:
+            store_id, product_id, quantity = level
+            cache.set(f"stock_{store_id}_{product_id}", quantity, timeout=300)
+        
+        with cls._lock:
+            cls._events.append(event)
+            if level is not None:
+                # Only the latest level per (store, product) matters for alerts
+                cls._levels[level[:2]] = level[2]
+            start_flush = not cls._flush_scheduled
+            cls._flush_scheduled = True
+        
+        if start_flush:
+            run_in_background(cls.POOL, cls.flush)
 
 
 class PredictiveRestockService:
@@ -310,144 +398,257 @@ class PredictiveRestockService:
     @staticmethod
     def calculate_demand_patterns(product, store, days=30):
         """Calculate demand patterns for predictive restocking"""
-        from orders.models import OrderItem
-        from catalog.models_inventory import InventorySnapshot
-        from django.utils import timezone
-        from datetime import timedelta
+        from catalog.services_forecast import DemandForecaster
         
-        end_date = timezone.now().date()
-        start_date = end_date - timedelta(days=days)
-        
-        # Get order data
-        order_data = OrderItem.objects.filter(
-            order__store=store,
-            product=product,
-            order__status='delivered',
-            order__created_at__date__range=[start_date, end_date]
-        ).values('order__created_at__date').annotate(
-            daily_demand=Sum('quantity')
-        )
-        
-        daily_demands = [item['daily_demand'] for item in order_data]
-        
-        if not daily_demands:
+        product_id = getattr(product, 'pk', product)
+        demand_data = DemandForecaster(days=days).forecast(store, product_ids=[product_id]).get(product_id)
+        if demand_data is None:
             return {
                 'avg_daily_demand': 0,
                 'max_daily_demand': 0,
                 'demand_variance': 0,
                 'trend': 'stable'
             }
+        return demand_data
+    
+    @staticmethod
+    def seasonal_multiplier(weekday_factors, horizon_days):
+        """Mean weekday factor over the next horizon_days, starting today (within WEEKDAY_FACTOR_BOUNDS)"""
+        from catalog.services_forecast import clamp_factor
         
-        avg_demand = sum(daily_demands) / len(daily_demands)
-        max_demand = max(daily_demands)
-        variance = sum((x - avg_demand) ** 2 for x in daily_demands) / len(daily_demands)
-        
-        # Simple trend calculation
-        if len(daily_demands) >= 7:
-            recent_avg = sum(daily_demands[-7:]) / 7
-            older_avg = sum(daily_demands[:-7]) / (len(daily_demands) - 7)
-            
-            if recent_avg > older_avg * 1.1:
-                trend = 'increasing'
-            elif recent_avg < older_avg * 0.9:
-                trend = 'decreasing'
-            else:
-                trend = 'stable'
-        else:
-            trend = 'stable'
-        
-        return {
-            'avg_daily_demand': avg_demand,
-            'max_daily_demand': max_demand,
-            'demand_variance': variance,
-            'trend': trend,
-            'total_days': len(daily_demands)
-        }
+        today = timezone.localdate()
+        weekdays = [(today + timedelta(days=offset)).weekday() for offset in range(max(horizon_days, 1))]
+        return clamp_factor(sum(weekday_factors[weekday] for weekday in weekdays) / len(weekdays))
     
     @staticmethod
-    def update_restock_rules(store, product=None):
-        """Update predictive restock rules based on historical data"""
+    def update_restock_rules(store, product=None, days=30):
+        """
+        Update predictive restock rules from one store-wide forecast (see
+        services_forecast); returns the number of rules written
+        """
         from catalog.models_inventory import PredictiveRestockRule
         from catalog.models import StoreProduct
+        from catalog.services_forecast import DemandForecaster
         
         if product:
-            products = [product]
+            product_ids = [getattr(product, 'pk', product)]
         else:
-            products = StoreProduct.objects.filter(
+            product_ids = list(StoreProduct.objects.filter(
                 store=store, is_available=True
-            ).values_list('product', flat=True)
+            ).values_list('product_id', flat=True))
+        
+        forecaster = DemandForecaster(days=days)
+        forecasts = forecaster.forecast(store, product_ids=product_ids)
+        existing = {
+            rule.product_id: rule
+            for rule in PredictiveRestockRule.objects.filter(store=store, product_id__in=list(forecasts))
+        }
         
-        for prod in products:
-            demand_data = PredictiveRestockService.calculate_demand_patterns(prod, store)
+        updated, created = [], []
+        for product_id, demand_data in forecasts.items():
+            if demand_data['avg_daily_demand'] <= 0:
+                continue
             
-            if demand_data['avg_daily_demand'] > 0:
-                # Calculate optimal levels
-                avg_demand = demand_data['avg_daily_demand']
-                safety_multiplier = 1.5 if demand_data['trend'] == 'increasing' else 1.2
-                
-                minimum_level = int(avg_demand * 2)  # 2 days buffer
-                reorder_level = int(avg_demand * 3 * safety_multiplier)  # 3 days + safety
-                maximum_level = int(avg_demand * 7 * safety_multiplier)  # 1 week + safety
-                
-                PredictiveRestockRule.objects.update_or_create(
-                    product=prod,
-                    store=store,
-                    defaults={
-                        'minimum_stock_level': minimum_level,
-                        'reorder_level': reorder_level,
-                        'maximum_stock_level': maximum_level,
-                        'avg_daily_demand': Decimal(str(avg_demand)),
-                        'demand_variance': Decimal(str(demand_data['demand_variance'])),
-                        'is_active': True
-                    }
-                )
-                
-                logger.info(f"Updated restock rules for {prod.name} at {store.name}")
+            rule = existing.get(product_id)
+            if rule is None:
+                rule = PredictiveRestockRule(product_id=product_id, store=store)
+            
+            # Levels follow the smoothed forecast rather than the flat window mean
+            demand = demand_data['smoothed_demand']
+            safety_multiplier = 1.5 if demand_data['trend'] == 'increasing' else 1.2
+            seasonal = PredictiveRestockService.seasonal_multiplier(
+                demand_data['weekday_factors'], rule.lead_time_days + rule.safety_stock_days
+            )
+            
+            rule.minimum_stock_level = int(demand * 2)  # 2 days buffer
+            rule.reorder_level = int(demand * 3 * safety_multiplier)  # 3 days + safety
+            rule.maximum_stock_level = int(demand * 7 * safety_multiplier)  # 1 week + safety
+            rule.avg_daily_demand = Decimal(str(round(demand_data['avg_daily_demand'], 2)))
+            # Clamped to the columns' max_digits
+            rule.demand_variance = Decimal(str(round(min(demand_data['demand_variance'], 999.99), 2)))
+            rule.seasonal_multiplier = Decimal(str(round(seasonal, 2)))
+            rule.is_active = True
+            (updated if rule.pk else created).append(rule)
+        
+        now = timezone.now()
+        for rule in updated:
+            rule.updated_at = rule.last_updated = now
+        PredictiveRestockRule.objects.bulk_update(updated, [
+            'minimum_stock_level', 'reorder_level', 'maximum_stock_level', 'avg_daily_demand',
+            'demand_variance', 'seasonal_multiplier', 'is_active', 'updated_at', 'last_updated'
+        ], batch_size=500)
+        PredictiveRestockRule.objects.bulk_create(created, batch_size=500)
+        
+        logger.info(
+            f"Updated {len(updated)} and created {len(created)} restock rules at {store.name} "
+            f"({forecaster.backend} forecast)"
+        )
+        return len(updated) + len(created)
 
 
 class InventoryAnalyticsService:
     """Service for inventory analytics and insights"""
     
+    SNAPSHOT_BATCH_SIZE = 1000
+    # Events whose quantities describe a change of on-hand stock
+    STOCK_EVENT_TYPES = ('stock_update', 'reservation', 'release')
+    
+    @staticmethod
+    def create_daily_snapshot(snapshot_date=None):
+        """Create daily inventory snapshots for all stores (today by default)"""
+        day = snapshot_date or timezone.localdate()
+        return InventoryAnalyticsService.create_snapshots(day, day)
+    
     @staticmethod
-    def create_daily_snapshot():
-        """Create daily inventory snapshots for all stores"""
+    def create_snapshots(start_date, end_date=None):
+        """
+        Snapshot every store product for each day from end_date (today by
+        default) back to start_date; returns the number of rows written.
+        
+        Closing stock is walked back from the live stock_quantity: a day's
+        closing is the next day's opening, and its opening is the first stock
+        event's previous quantity, or the closing less the day's net movement
+        when nothing was logged. Stock events are manual updates and transfers
+        plus checkout reservations and their releases, so stock out counts
+        units when they were reserved; delivered sales only feed revenue and
+        turnover. Each day is upserted in its own transaction, so an
+        interrupted backfill can be resumed by rerunning its range.
+        """
         from catalog.models import StoreProduct
         from catalog.models_inventory import InventorySnapshot
-        from orders.models import OrderItem
-        from django.utils import timezone
         
-        today = timezone.now().date()
-        
-        for store_product in StoreProduct.objects.all():
-            # Get today's sales
-            daily_sales = OrderItem.objects.filter(
-                order__store=store_product.store,
-                product=store_product.product,
-                order__status='delivered',
-                order__created_at__date=today
-            ).aggregate(
-                total_sold=Sum('quantity'),
-                total_revenue=Sum(F('quantity') * F('unit_price'))
-            )
+        today = timezone.localdate()
+        end_date = min(end_date or today, today)
+        if start_date > end_date:
+            return 0
+        
+        closing, prices = {}, {}
+        for store_id, product_id, stock_quantity, price in StoreProduct.objects.values_list(
+            'store_id', 'product_id', 'stock_quantity', 'price'
+        ).iterator(chunk_size=InventoryAnalyticsService.SNAPSHOT_BATCH_SIZE):
+            closing[(store_id, product_id)] = stock_quantity
+            prices[(store_id, product_id)] = price
+        
+        if end_date < today:
+            # Undo everything after the range in one pass
+            net = InventoryAnalyticsService._event_net(created_at__date__gt=end_date)
+            for key, change in net.items():
+                if key in closing:
+                    closing[key] = max(closing[key] - change, 0)
+        
+        written = 0
+        day = end_date
+        while day >= start_date:
+            sales = InventoryAnalyticsService._sales(order__created_at__date=day)
+            movements = InventoryAnalyticsService._day_movements(day)
             
-            # Calculate turnover rate
-            turnover_rate = Decimal('0.00')
-            if store_product.stock_quantity > 0:
-                sold_qty = daily_sales['total_sold'] or 0
-                turnover_rate = Decimal(sold_qty) / Decimal(store_product.stock_quantity) * 100
+            snapshots = []
+            for key, closing_stock in closing.items():
+                sold, revenue = sales.get(key, (0, Decimal('0.00')))
+                first_previous, stock_in, stock_out, adjustments = movements.get(key, (None, 0, 0, 0))
+                
+                if first_previous is not None:
+                    opening_stock = first_previous
+                else:
+                    opening_stock = max(closing_stock - stock_in + stock_out - adjustments, 0)
+                
+                # Calculate turnover rate
+                turnover_rate = Decimal('0.00')
+                if closing_stock > 0:
+                    turnover_rate = min(Decimal(sold) / Decimal(closing_stock) * 100, Decimal('999.99'))
+                
+                snapshots.append(InventorySnapshot(
+                    store_id=key[0],
+                    product_id=key[1],
+                    snapshot_date=day,
+                    opening_stock=opening_stock,
+                    closing_stock=closing_stock,
+                    stock_in=stock_in,
+                    stock_out=stock_out,
+                    adjustments=adjustments,
+                    total_revenue=revenue,
+                    average_selling_price=(revenue / sold).quantize(Decimal('0.01')) if sold else prices[key],
+                    turnover_rate=turnover_rate.quantize(Decimal('0.01'))
+                ))
+                closing[key] = opening_stock
             
-            InventorySnapshot.objects.update_or_create(
-                store=store_product.store,
-                product=store_product.product,
-                snapshot_date=today,
-                defaults={
-                    'closing_stock': store_product.stock_quantity,
-                    'stock_out': daily_sales['total_sold'] or 0,
-                    'total_revenue': daily_sales['total_revenue'] or Decimal('0.00'),
-                    'average_selling_price': store_product.selling_price,
-                    'turnover_rate': turnover_rate
-                }
+            with transaction.atomic():
+                InventorySnapshot.objects.bulk_create(
+                    snapshots,
+                    batch_size=InventoryAnalyticsService.SNAPSHOT_BATCH_SIZE,
+                    update_conflicts=True,
+                    unique_fields=['store', 'product', 'snapshot_date'],
+                    update_fields=[
+                        'opening_stock', 'closing_stock', 'stock_in', 'stock_out', 'adjustments',
+                        'total_revenue', 'average_selling_price', 'turnover_rate'
+                    ]
+                )
+            written += len(snapshots)
+            logger.info(f"Wrote {len(snapshots)} inventory snapshots for {day}")
+            day -= timedelta(days=1)
+        
+        return written
+    
+    @staticmethod
+    def _sales(**date_filter):
+        """{(store_id, product_id): (units, revenue)} of delivered orders, one grouped query"""
+        from orders.models import OrderItem
+        
+        return {
+            (store_id, product_id): (sold, revenue)
+            for store_id, product_id, sold, revenue in OrderItem.objects.filter(
+                order__status='delivered', **date_filter
+            ).values('order__store_id', 'store_product__product_id').annotate(
+                sold=Sum('quantity'),
+                revenue=Sum(F('quantity') * F('unit_price'))
+            ).values_list('order__store_id', 'store_product__product_id', 'sold', 'revenue')
+        }
+    
+    @staticmethod
+    def _event_net(**date_filter):
+        """{(store_id, product_id): net stock change} logged by stock events"""
+        from catalog.models_inventory import InventorySyncEvent
+        
+        return {
+            (store_id, product_id): change
+            for store_id, product_id, change in InventorySyncEvent.objects.filter(
+                event_type__in=InventoryAnalyticsService.STOCK_EVENT_TYPES, **date_filter
+            ).values('store_id', 'product_id').annotate(
+                change=Sum(F('new_quantity') - F('previous_quantity'))
+            ).values_list('store_id', 'product_id', 'change')
+        }
+    
+    @staticmethod
+    def _day_movements(day):
+        """
+        {(store_id, product_id): (first previous quantity, stock in, stock
+        out, adjustments)} from one day's stock events. Increases (restocks,
+        transfers in, released reservations) count as stock in; reservations
+        and transfers out count as stock out, other decreases as manual
+        adjustments.
+        """
+        from catalog.models_inventory import InventorySyncEvent
+        
+        movements = {}
+        for store_id, product_id, event_type, transfer_id, previous_quantity, new_quantity in (
+            InventorySyncEvent.objects.filter(
+                event_type__in=InventoryAnalyticsService.STOCK_EVENT_TYPES, created_at__date=day
+            ).order_by('created_at', 'id').values_list(
+                'store_id', 'product_id', 'event_type', 'transfer_id', 'previous_quantity', 'new_quantity'
+            ).iterator(chunk_size=InventoryAnalyticsService.SNAPSHOT_BATCH_SIZE)
+        ):
+            first_previous, stock_in, stock_out, adjustments = movements.get(
+                (store_id, product_id), (previous_quantity, 0, 0, 0)
             )
+            change = new_quantity - previous_quantity
+            if change > 0:
+                stock_in += change
+            elif event_type == 'reservation' or transfer_id is not None:
+                stock_out -= change
+            else:
+                adjustments += change
+            movements[(store_id, product_id)] = (first_previous, stock_in, stock_out, adjustments)
+        return movements
     
     @staticmethod
     def get_inventory_insights(store, days=30):
@@ -0,0 +1,315 @@
+"""
+ZIP Catalog Listing Services
+Maintains ZipCatalogEntry, the denormalized per-ZIP listing read model.
+
+Every offer of a product by a store serving a ZIP area gets one row, ranked
+within its (zip_area, product) group: offer_rank 0 is the cheapest offer
+(in-stock offers win over empty ones). Listing pages filter and sort on that
+single indexed table instead of joining StoreProduct -> Product -> Category
+-> Store -> StoreZipCoverage, reading one row per product: the best ranked
+offer among the stores open right now. Store closures are applied at read
+time, so a closure starting only hands the product to the next open offer.
+
+Rows are refreshed in small scopes from catalog signals (a product, a
+store's ZIP areas, one coverage) and rebuilt in full by the
+`rebuild_zip_catalog` management command, which also refreshes popularity
+scores. Offer changes (StoreProduct saves, stock reservations, store edits)
+are buffered per store and refreshed on a background thread after commit,
+so a checkout or a bulk edit never waits on the listing table.
+"""
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+import logging
+import threading
+
+from core.background import run_after_commit, run_in_background
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+class ZipCatalogService:
+    """Incremental maintenance and reads for ZipCatalogEntry"""
+    POOL = 'zip-catalog'
+
+    # store_id -> product IDs to refresh (None: every product of the store)
+    _lock = threading.Lock()
+    _pending = {}
+    _flush_scheduled = False
+
+    @staticmethod
+    def entries_for_zip(zip_area, store_ids=None):
+        """
+        One listing row per product for a ZIP area: its cheapest offer, or
+        the cheapest among `store_ids` (the currently open stores) if given
+        """
+        from catalog.models import ZipCatalogEntry
+        from stores.services import ZipServiceResolver
+
+        entries = ZipCatalogEntry.objects.filter(zip_area=zip_area)
+        if store_ids is None:
+            return entries.filter(offer_rank=0)
+
+        store_ids = list(store_ids)
+        entries = entries.filter(store_id__in=store_ids)
+        if set(ZipServiceResolver.get_all_store_ids(zip_area.zip_code)) <= set(store_ids):
+            # Every serving store is open, so the overall cheapest offer is available
+            return entries.filter(offer_rank=0)
+
+        return entries.exclude(
+            Exists(ZipCatalogEntry.objects.filter(
+                zip_area=zip_area,
+                product_id=OuterRef('product_id'),
+                store_id__in=store_ids,
+                offer_rank__lt=OuterRef('offer_rank')
+            ))
+        )
+
+    @staticmethod
+    def with_store_products(entries, user=None):
+        """
+        Join what the product card templates need onto a slice of entries,
+        including the units other customers hold in checkout (not `user`)
+        """
+        from catalog.models import Product
+        from catalog.services_stock import StockHoldService
+
+        entries = entries.select_related(
+            'store_product__product__category', 'store_product__store'
+        ).prefetch_related(
+            Product.images_prefetch('store_product__product__images')
+        )
+        return StockHoldService.with_held_quantity(entries, 'store_product_id', exclude_user=user)
+
+    @staticmethod
+    def store_products(entries):
+        """StoreProduct instances for already-loaded entries, in entry order"""
+        store_products = []
+        for entry in entries:
+            if hasattr(entry, 'held_quantity'):
+                entry.store_product.held_quantity = entry.held_quantity
+            store_products.append(entry.store_product)
+        return store_products
+
+    # Maintenance
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute every entry; returns the number of rows written"""
+        return cls.refresh()
+
+    @classmethod
+    def refresh_store(cls, store_id, product_ids=None):
+        """Refresh the ZIP areas a store covers (or used to cover)"""
+        from catalog.models import ZipCatalogEntry
+        from stores.models import StoreZipCoverage
+
+        zip_area_ids = set(
+            StoreZipCoverage.objects.filter(store_id=store_id).values_list('zip_area_id', flat=True)
+        )
+        zip_area_ids.update(
+            ZipCatalogEntry.objects.filter(store_id=store_id).values_list('zip_area_id', flat=True)
+        )
+        if not zip_area_ids:
+            return 0
+
+        if product_ids is None:
+            product_ids = cls._store_product_ids(store_id)
+        return cls.refresh(zip_area_ids=zip_area_ids, product_ids=product_ids)
+
+    @classmethod
+    def schedule_store(cls, store_id, product_ids=None):
+        """refresh_store() in the background once the current transaction commits"""
+        if product_ids is not None:
+            product_ids = set(product_ids)
+            if not product_ids:
+                return
+        transaction.on_commit(lambda: cls._enqueue(store_id, product_ids))
+
+    @classmethod
+    def schedule_store_removal(cls, store_id):
+        """
+        Before a store is deleted: re-rank the ZIP areas it served once the
+        delete commits (its own entries go with it through the cascade)
+        """
+        from catalog.models import ZipCatalogEntry
+
+        scope = ZipCatalogEntry.objects.filter(store_id=store_id)
+        zip_area_ids = set(scope.values_list('zip_area_id', flat=True))
+        if zip_area_ids:
+            run_after_commit(
+                cls.POOL, cls.refresh,
+                zip_area_ids=zip_area_ids,
+                product_ids=set(scope.values_list('product_id', flat=True))
+            )
+
+    @classmethod
+    def flush(cls):
+        """Refresh every store buffered so far; returns the number of rows written"""
+        with cls._lock:
+            pending, cls._pending = cls._pending, {}
+            cls._flush_scheduled = False
+
+        return sum(
+            cls.refresh_store(store_id, product_ids=product_ids)
+            for store_id, product_ids in pending.items()
+        )
+
+    @classmethod
+    def _enqueue(cls, store_id, product_ids):
+        with cls._lock:
+            if store_id in cls._pending:
+                queued = cls._pending[store_id]
+                if queued is not None and product_ids is not None:
+                    queued.update(product_ids)
+                else:
+                    cls._pending[store_id] = None
+            else:
+                cls._pending[store_id] = product_ids
+            start_flush = not cls._flush_scheduled
+            cls._flush_scheduled = True
+
+        if start_flush:
+            run_in_background(cls.POOL, cls.flush)
+
+    @classmethod
+    def refresh_coverage(cls, store_id, zip_area_id):
+        """A store started or stopped serving one ZIP area"""
+        return cls.refresh(zip_area_ids=[zip_area_id], product_ids=cls._store_product_ids(store_id))
+
+    @staticmethod
+    def _store_product_ids(store_id):
+        from catalog.models import StoreProduct, ZipCatalogEntry
+
+        product_ids = set(StoreProduct.objects.filter(store_id=store_id).values_list('product_id', flat=True))
+        product_ids.update(ZipCatalogEntry.objects.filter(store_id=store_id).values_list('product_id', flat=True))
+        return product_ids
+
+    @classmethod
+    def refresh(cls, zip_area_ids=None, product_ids=None):
+        """
+        Recompute entries for the given ZIP areas and/or products (None means
+        all) and start new facet versions for those ZIP areas. Returns the
+        number of rows written.
+        """
+        from catalog.models import ZipCatalogEntry
+        from catalog.services_facets import CatalogFacetService
+
+        if zip_area_ids is not None:
+            zip_area_ids = list(zip_area_ids)
+        if product_ids is not None:
+            product_ids = list(product_ids)
+        if zip_area_ids == [] or product_ids == []:
+            return 0
+
+        entries = cls._build_entries(zip_area_ids, product_ids)
+
+        stale = ZipCatalogEntry.objects.all()
+        if zip_area_ids is not None:
+            stale = stale.filter(zip_area_id__in=zip_area_ids)
+        if product_ids is not None:
+            stale = stale.filter(product_id__in=product_ids)
+
+        with transaction.atomic():
+            stale.delete()
+            ZipCatalogEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+        transaction.on_commit(lambda: CatalogFacetService.invalidate_zip_areas(zip_area_ids))
+
+        logger.debug(f"Refreshed {len(entries)} ZIP catalog entries")
+        return len(entries)
+
+    @classmethod
+    def _serving_zip_areas(cls, zip_area_ids):
+        """store_id -> ZIP area IDs it serves (closures are applied by entries_for_zip)"""
+        from stores.models import StoreZipCoverage
+
+        coverages = StoreZipCoverage.objects.filter(
+            is_active=True,
+            zip_area__is_active=True,
+            store__is_active=True,
+            store__status='open'
+        )
+        if zip_area_ids is not None:
+            coverages = coverages.filter(zip_area_id__in=zip_area_ids)
+
+        zip_areas_by_store = {}
+        for store_id, zip_area_id in coverages.values_list('store_id', 'zip_area_id'):
+            zip_areas_by_store.setdefault(store_id, []).append(zip_area_id)
+        return zip_areas_by_store
+
+    @staticmethod
+    def _popularity(product_ids):
+        from orders.models import OrderItem
+
+        order_items = OrderItem.objects.exclude(order__status__in=['cancelled', 'refunded'])
+        if product_ids is not None:
+            order_items = order_items.filter(store_product__product_id__in=product_ids)
+        return dict(
+            order_items.values('store_product__product_id').annotate(
+                orders=Count('order_id', distinct=True)
+            ).values_list('store_product__product_id', 'orders')
+        )
+
+    @classmethod
+    def _build_entries(cls, zip_area_ids, product_ids):
+        from catalog.models import StoreProduct, ZipCatalogEntry
+        from catalog.services_categories import CategoryTreeService
+
+        zip_areas_by_store = cls._serving_zip_areas(zip_area_ids)
+        if not zip_areas_by_store:
+            return []
+
+        offers = StoreProduct.objects.filter(
+            store_id__in=list(zip_areas_by_store),
+            is_available=True,
+            availability_status='in_stock',
+            product__is_active=True
+        )
+        if product_ids is not None:
+            offers = offers.filter(product_id__in=product_ids)
+
+        offers_by_key = {}
+        for offer in offers.values_list(
+            'id', 'store_id', 'product_id', 'price', 'compare_price', 'stock_quantity',
+            'is_featured', 'created_at', 'product__name', 'product__unit_type', 'product__category_id'
+        ).iterator(chunk_size=2000):
+            for zip_area_id in zip_areas_by_store[offer[1]]:
+                offers_by_key.setdefault((zip_area_id, offer[2]), []).append(offer)
+
+        if not offers_by_key:
+            return []
+
+        tree = CategoryTreeService.get_tree(
+            {offer[10] for key_offers in offers_by_key.values() for offer in key_offers}
+        )
+        popularity = cls._popularity(product_ids)
+
+        # Rank offers per (zip_area, product); in-stock beats out-of-stock, ID breaks ties
+        for key_offers in offers_by_key.values():
+            key_offers.sort(key=lambda offer: (offer[5] <= 0, offer[3], offer[0]))
+
+        return [
+            ZipCatalogEntry(
+                zip_area_id=zip_area_id,
+                product_id=product_id,
+                store_product_id=sp_id,
+                store_id=store_id,
+                offer_rank=offer_rank,
+                product_name=name,
+                unit_type=unit_type or '',
+                category_id=category_id,
+                category_path=tree.slug_path(category_id),
+                price=price,
+                compare_price=compare_price,
+                in_stock=stock_quantity > 0,
+                is_featured=is_featured,
+                listed_at=created_at,
+                popularity_score=popularity.get(product_id, 0),
+            )
+            for (zip_area_id, product_id), key_offers in offers_by_key.items()
+            for offer_rank, (
+                sp_id, store_id, _product_id, price, compare_price, stock_quantity,
+                is_featured, created_at, name, unit_type, category_id
+            ) in enumerate(key_offers)
+        ]
@@ -0,0 +1,363 @@
+"""
+Product Full-Text Search Services
+Pluggable search backends: SQLite FTS5, Postgres tsvector/GIN, and an icontains fallback
+"""
+from django.conf import settings
+from django.db import connection, DatabaseError
+from django.db.models import Case, When, Value, FloatField, IntegerField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = 'catalog_product_search'
+
+# Relative field weights: name > category > description
+FIELD_WEIGHTS = {
+    'name': 10.0,
+    'category': 4.0,
+    'description': 1.0,
+}
+
+DEFAULT_RESULT_LIMIT = 500
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize_query(query):
+    """Split free text into safe search terms (drops operators and quotes)"""
+    return [token.lower() for token in _TOKEN_RE.findall(query or '')]
+
+
+class BaseSearchBackend:
+    """Common interface for product search backends"""
+
+    def search(self, query, prefix=False, limit=DEFAULT_RESULT_LIMIT):
+        """Return matching product IDs, best match first"""
+        raise NotImplementedError
+
+    def index_products(self, product_ids):
+        """Add or refresh index documents for the given products"""
+
+    def remove_products(self, product_ids):
+        """Remove index documents for the given products"""
+
+    def rebuild(self):
+        """Rebuild the whole index from the catalog tables; returns document count"""
+        return 0
+
+    def match_sql(self, query, prefix=False):
+        """(sql, params) of a subquery selecting matching product IDs, or None for no terms"""
+        raise NotImplementedError
+
+    def rank_sql(self, query, product_column, prefix=False):
+        """(sql, params) scoring the product in `product_column`; lower is a better match"""
+        raise NotImplementedError
+
+    def filter_queryset(self, queryset, query, product_field='product', prefix=False, rank=True):
+        """
+        Restrict a queryset to search matches inside the same SQL statement,
+        so the caller's ZIP, store and category filters apply to every match.
+        With `rank`, annotate `search_rank` (lower is better) so callers can
+        order by relevance.
+        """
+        match = self.match_sql(query, prefix=prefix)
+        if match is None:
+            return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+        lookup = f'{product_field}_id' if product_field != 'id' else 'id'
+        queryset = queryset.filter(**{f'{lookup}__in': RawSQL(*match)})
+        if not rank:
+            return queryset
+
+        meta = queryset.model._meta
+        column = meta.get_field(lookup if lookup == 'id' else product_field).column
+        quote = connection.ops.quote_name
+        rank_sql, params = self.rank_sql(query, f'{quote(meta.db_table)}.{quote(column)}', prefix=prefix)
+        return queryset.annotate(search_rank=RawSQL(rank_sql, params, output_field=FloatField()))
+
+    @staticmethod
+    def _documents(product_ids=None):
+        """Yield (product_id, name, category name, description) for active products"""
+        from catalog.models import Product
+
+        products = Product.objects.filter(is_active=True)
+        if product_ids is not None:
+            products = products.filter(id__in=product_ids)
+        return products.values_list(
+            'id', 'name', 'category__name', 'description'
+        ).iterator(chunk_size=2000)
+
+
+class IcontainsSearchBackend(BaseSearchBackend):
+    """Fallback for databases without a full-text index (no index maintenance)"""
+
+    def search(self, query, prefix=False, limit=DEFAULT_RESULT_LIMIT):
+        from catalog.models import Product
+
+        query = (query or '').strip()
+        if not query:
+            return []
+
+        # Approximate the field weighting with a match-location score
+        return list(
+            Product.objects.filter(
+                Q(name__icontains=query) |
+                Q(description__icontains=query) |
+                Q(category__name__icontains=query),
+                is_active=True
+            ).annotate(
+                match_score=Case(
+                    When(name__istartswith=query, then=Value(0)),
+                    When(name__icontains=query, then=Value(1)),
+                    When(category__name__icontains=query, then=Value(2)),
+                    default=Value(3),
+                    output_field=IntegerField()
+                )
+            ).order_by('match_score', 'name').values_list('id', flat=True)[:limit]
+        )
+
+    def filter_queryset(self, queryset, query, product_field='product', prefix=False, rank=True):
+        query = (query or '').strip()
+        if not query:
+            return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+        path = '' if product_field == 'id' else f'{product_field}__'
+        queryset = queryset.filter(
+            Q(**{f'{path}name__icontains': query}) |
+            Q(**{f'{path}description__icontains': query}) |
+            Q(**{f'{path}category__name__icontains': query}),
+            **{f'{path}is_active': True}
+        )
+        if not rank:
+            return queryset
+        return queryset.annotate(
+            search_rank=Case(
+                When(**{f'{path}name__istartswith': query}, then=Value(0.0)),
+                When(**{f'{path}name__icontains': query}, then=Value(1.0)),
+                When(**{f'{path}category__name__icontains': query}, then=Value(2.0)),
+                default=Value(3.0),
+                output_field=FloatField()
+            )
+        )
+
+
+class SQLiteFTS5SearchBackend(BaseSearchBackend):
+    """
+    FTS5 virtual table ranked with column-weighted bm25(). Documents are
+    stored with rowid = product ID, so per-product rank lookups are direct.
+    """
+
+    BM25_SQL = f"bm25({SEARCH_TABLE}, 0, %s, %s, %s)"
+    BM25_PARAMS = [FIELD_WEIGHTS['name'], FIELD_WEIGHTS['category'], FIELD_WEIGHTS['description']]
+
+    @staticmethod
+    def _match_expression(query, prefix):
+        terms = tokenize_query(query)
+        if not terms:
+            return None
+
+        # Quoted terms are literal; trailing * on the last term gives typeahead matching
+        match = ' '.join(f'"{term}"' for term in terms)
+        if prefix:
+            match += '*'
+        return match
+
+    def search(self, query, prefix=False, limit=DEFAULT_RESULT_LIMIT):
+        match = self._match_expression(query, prefix)
+        if match is None:
+            return []
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s "
+                f"ORDER BY {self.BM25_SQL} LIMIT %s",
+                [match, *self.BM25_PARAMS, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def match_sql(self, query, prefix=False):
+        match = self._match_expression(query, prefix)
+        if match is None:
+            return None
+        return f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", [match]
+
+    def rank_sql(self, query, product_column, prefix=False):
+        return (
+            f"SELECT {self.BM25_SQL} FROM {SEARCH_TABLE} "
+            f"WHERE {SEARCH_TABLE} MATCH %s AND rowid = {product_column}",
+            [*self.BM25_PARAMS, self._match_expression(query, prefix)]
+        )
+
+    def index_products(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+
+        with connection.cursor() as cursor:
+            self._delete(cursor, product_ids)
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, product_id, name, category, description) "
+                f"VALUES (%s, %s, %s, %s, %s)",
+                [(pid, pid, name, category or '', description or '')
+                 for pid, name, category, description in self._documents(product_ids)]
+            )
+
+    def remove_products(self, product_ids):
+        product_ids = list(product_ids)
+        if product_ids:
+            with connection.cursor() as cursor:
+                self._delete(cursor, product_ids)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, product_id, name, category, description) "
+                f"SELECT p.id, p.id, p.name, COALESCE(c.name, ''), COALESCE(p.description, '') "
+                f"FROM catalog_product p LEFT JOIN catalog_category c ON c.id = p.category_id "
+                f"WHERE p.is_active"
+            )
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')")
+            cursor.execute(f"SELECT COUNT(*) FROM {SEARCH_TABLE}")
+            return cursor.fetchone()[0]
+
+    @staticmethod
+    def _delete(cursor, product_ids):
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})",
+            product_ids
+        )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Weighted tsvector column with a GIN index, ranked by ts_rank"""
+
+    # ts_rank weights are ordered {D, C, B, A}; A = name, B = category, C = description
+    RANK_WEIGHTS = '{0.0, %s, %s, %s}' % (
+        FIELD_WEIGHTS['description'] / FIELD_WEIGHTS['name'],
+        FIELD_WEIGHTS['category'] / FIELD_WEIGHTS['name'],
+        1.0,
+    )
+
+    DOCUMENT_SQL = (
+        "setweight(to_tsvector('simple', COALESCE(p.name, '')), 'A') || "
+        "setweight(to_tsvector('simple', COALESCE(c.name, '')), 'B') || "
+        "setweight(to_tsvector('simple', COALESCE(p.description, '')), 'C')"
+    )
+
+    @staticmethod
+    def _tsquery(query, prefix):
+        terms = tokenize_query(query)
+        if not terms:
+            return None
+
+        if prefix:
+            terms[-1] = f'{terms[-1]}:*'
+        return ' & '.join(terms)
+
+    def search(self, query, prefix=False, limit=DEFAULT_RESULT_LIMIT):
+        tsquery = self._tsquery(query, prefix)
+        if tsquery is None:
+            return []
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT product_id FROM {SEARCH_TABLE}, to_tsquery('simple', %s) query "
+                f"WHERE document @@ query "
+                f"ORDER BY ts_rank(%s::float4[], document, query) DESC, product_id LIMIT %s",
+                [tsquery, self.RANK_WEIGHTS, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def match_sql(self, query, prefix=False):
+        tsquery = self._tsquery(query, prefix)
+        if tsquery is None:
+            return None
+        return (
+            f"SELECT product_id FROM {SEARCH_TABLE} WHERE document @@ to_tsquery('simple', %s)",
+            [tsquery]
+        )
+
+    def rank_sql(self, query, product_column, prefix=False):
+        return (
+            f"SELECT -ts_rank(%s::float4[], document, to_tsquery('simple', %s)) "
+            f"FROM {SEARCH_TABLE} WHERE product_id = {product_column}",
+            [self.RANK_WEIGHTS, self._tsquery(query, prefix)]
+        )
+
+    def index_products(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {SEARCH_TABLE} WHERE product_id = ANY(%s)", [product_ids]
+            )
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (product_id, document) "
+                f"SELECT p.id, {self.DOCUMENT_SQL} "
+                f"FROM catalog_product p LEFT JOIN catalog_category c ON c.id = p.category_id "
+                f"WHERE p.is_active AND p.id = ANY(%s)",
+                [product_ids]
+            )
+
+    def remove_products(self, product_ids):
+        product_ids = list(product_ids)
+        if product_ids:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {SEARCH_TABLE} WHERE product_id = ANY(%s)", [product_ids]
+                )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {SEARCH_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (product_id, document) "
+                f"SELECT p.id, {self.DOCUMENT_SQL} "
+                f"FROM catalog_product p LEFT JOIN catalog_category c ON c.id = p.category_id "
+                f"WHERE p.is_active"
+            )
+            cursor.execute(f"SELECT COUNT(*) FROM {SEARCH_TABLE}")
+            return cursor.fetchone()[0]
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTS5SearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+_backend = None
+
+
+def _search_table_exists():
+    try:
+        return SEARCH_TABLE in connection.introspection.table_names(include_views=True)
+    except DatabaseError:
+        return False
+
+
+def get_search_backend():
+    """
+    Return the configured search backend.
+
+    settings.CATALOG_SEARCH_BACKEND (dotted path) overrides the default,
+    which is picked from the database vendor. If the index table is missing
+    (e.g. SQLite built without FTS5) the icontains fallback is used.
+    """
+    global _backend
+    if _backend is None:
+        backend_path = getattr(settings, 'CATALOG_SEARCH_BACKEND', None)
+        if backend_path:
+            _backend = import_string(backend_path)()
+        elif connection.vendor in VENDOR_BACKENDS and _search_table_exists():
+            _backend = VENDOR_BACKENDS[connection.vendor]()
+        else:
+            logger.warning("Full-text search index unavailable; using icontains search")
+            _backend = IcontainsSearchBackend()
+    return _backend
@@ -0,0 +1,128 @@
+"""
+SKU Allocation Services
+Hands out product SKUs from SkuSequence, one counter row per prefix.
+
+A SKU is `<CAT><PRD><nnn>`: three letters of the category name, three of
+the product name and a zero-padded sequence number. Allocation increments
+the prefix's counter with a single `F()` update inside a transaction, so
+concurrent saves never receive the same number, and a whole range of N
+SKUs costs the same round trip as one. A prefix's counter is seeded once
+from the SKUs already in the catalog the first time it is used.
+"""
+import re
+from django.db import IntegrityError, transaction
+from django.db.models import F
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _abbreviation(text, fallback):
+    letters = re.sub(r'[^a-zA-Z]', '', text or '')[:3].upper()
+    return letters if len(letters) >= 2 else fallback
+
+
+class SkuAllocator:
+    """Atomic, range-based SKU allocation"""
+
+    @staticmethod
+    def prefix_for(product, category_name=None):
+        """SKU prefix from the category and product names"""
+        if category_name is None:
+            category_name = product.category.name
+        return f"{_abbreviation(category_name, 'PRD')}{_abbreviation(product.name, 'ITM')}"
+
+    @staticmethod
+    def format_sku(prefix, number):
+        return f"{prefix}{number:03d}"
+
+    @classmethod
+    def allocate(cls, prefix, count=1):
+        """Reserve `count` consecutive SKUs for a prefix; returns them in order"""
+        from catalog.models import Product
+
+        if count < 1:
+            return []
+
+        with transaction.atomic():
+            last_value = cls._increment(prefix, count)
+            skus = [cls.format_sku(prefix, number) for number in range(last_value - count + 1, last_value + 1)]
+
+            # SKUs typed in by hand can sit ahead of the counter; skip past them
+            taken = list(Product.objects.filter(sku__in=skus).values_list('sku', flat=True))
+            if taken:
+                logger.warning(f"SKU sequence {prefix} ran into {len(taken)} existing SKUs, skipping ahead")
+                SkuSequence = cls._model()
+                SkuSequence.objects.filter(prefix=prefix).update(
+                    last_value=max(last_value, cls._existing_max(prefix))
+                )
+                return cls.allocate(prefix, count)
+        return skus
+
+    @classmethod
+    def peek(cls, prefix, count=1):
+        """The SKUs the next allocation would return, without reserving them"""
+        SkuSequence = cls._model()
+
+        last_value = SkuSequence.objects.filter(prefix=prefix).values_list('last_value', flat=True).first()
+        if last_value is None:
+            last_value = cls._existing_max(prefix)
+        return [cls.format_sku(prefix, last_value + offset) for offset in range(1, count + 1)]
+
+    @classmethod
+    def assign(cls, products, category_names=None):
+        """
+        Give every product without a SKU a fresh one (not saved), reserving
+        one range per prefix. `category_names` maps category_id -> name for
+        callers that have not loaded `product.category`. Returns the
+        products that received a SKU.
+        """
+        by_prefix = {}
+        for product in products:
+            if product.sku:
+                continue
+            category_name = category_names.get(product.category_id) if category_names else None
+            by_prefix.setdefault(cls.prefix_for(product, category_name), []).append(product)
+
+        assigned = []
+        for prefix, group in by_prefix.items():
+            for product, sku in zip(group, cls.allocate(prefix, len(group))):
+                product.sku = sku
+                assigned.append(product)
+        return assigned
+
+    # Internals
+
+    @staticmethod
+    def _model():
+        from catalog.models import SkuSequence
+        return SkuSequence
+
+    @classmethod
+    def _increment(cls, prefix, count):
+        """Advance the prefix's counter by `count`; returns the new last value"""
+        SkuSequence = cls._model()
+
+        # The UPDATE holds the row lock until the surrounding transaction commits
+        if not SkuSequence.objects.filter(prefix=prefix).update(last_value=F('last_value') + count):
+            try:
+                with transaction.atomic():
+                    SkuSequence.objects.create(prefix=prefix, last_value=cls._existing_max(prefix) + count)
+                return SkuSequence.objects.get(prefix=prefix).last_value
+            except IntegrityError:
+                # Another worker seeded the prefix first
+                SkuSequence.objects.filter(prefix=prefix).update(last_value=F('last_value') + count)
+        return SkuSequence.objects.get(prefix=prefix).last_value
+
+    @staticmethod
+    def _existing_max(prefix):
+        """Highest number among SKUs already using the prefix (one-off scan when seeding)"""
+        from catalog.models import Product
+
+        pattern = re.compile(rf'{re.escape(prefix)}(\d+)$')
+        max_num = 0
+        for sku in Product.objects.filter(sku__startswith=prefix).values_list('sku', flat=True).iterator():
+            match = pattern.match(sku)
+            if match:
+                max_num = max(max_num, int(match.group(1)))
+        return max_num
@@ -0,0 +1,392 @@
+"""
+Stock Reservation Services
+Takes checkout quantities out of StoreProduct.stock_quantity atomically.
+
+All lines of an order (one store) are decremented by a single conditional
+UPDATE, so no row is read before it is written and concurrent checkouts
+cannot oversell:
+
+    UPDATE catalog_storeproduct
+       SET stock_quantity = stock_quantity - CASE id WHEN 11 THEN 2 WHEN 17 THEN 1 END
+     WHERE id IN (11, 17)
+       AND stock_quantity >= CASE id WHEN 11 THEN 2 WHEN 17 THEN 1 END
+
+If fewer rows match than there are lines, the statement's savepoint is
+rolled back and InsufficientStock is raised, which rolls back the caller's
+checkout transaction too. Orders record whether they hold stock
+(Order.stock_reserved); cancellation and payment failure flip that flag
+with a conditional update first, so stock is returned exactly once.
+
+Before that, entering checkout puts soft StockHold rows on the cart lines
+for CATALOG_STOCK_HOLD_MINUTES. Unexpired holds of other customers count
+against available-to-sell (`stock_quantity - held`, one correlated SUM
+subquery annotated onto the listing / add-to-cart query) and against the
+reservation UPDATE. Expired holds stop counting immediately; the sweeper
+(`release_expired_stock_holds` command / celery beat task) just deletes
+them in bulk.
+"""
+from collections import defaultdict
+from datetime import timedelta
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Case, F, OuterRef, PositiveIntegerField, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+import logging
+
+from core.background import run_in_background
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStock(Exception):
+    """Raised when at least one line cannot be covered by current stock"""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        names = ', '.join(
+            f"{shortage['product_name']} ({shortage['available']} left)" for shortage in shortages
+        )
+        super().__init__(f"Not enough stock for: {names}")
+
+
+def _per_line(quantities):
+    """CASE id WHEN <id> THEN <quantity> ... END"""
+    return Case(
+        *[When(pk=store_product_id, then=Value(quantity)) for store_product_id, quantity in quantities.items()],
+        output_field=PositiveIntegerField()
+    )
+
+
+def sync_catalog_stock(store_product_ids):
+    """What the StoreProduct signals would have done after a stock-only UPDATE"""
+    from catalog.models import StoreProduct
+    from catalog.services_listing import ZipCatalogService
+    from catalog.services_suggestions import ProductSuggestionService
+
+    rows = list(StoreProduct.objects.filter(pk__in=store_product_ids).values_list(
+        'store_id', 'product_id', 'stock_quantity', 'is_available'
+    ))
+    by_store = defaultdict(list)
+    for store_id, product_id, _stock_quantity, _is_available in rows:
+        by_store[store_id].append(product_id)
+
+    for store_id, product_ids in by_store.items():
+        ZipCatalogService.schedule_store(store_id, product_ids=product_ids)
+        ProductSuggestionService.invalidate_store(store_id)
+    StockBroadcaster.publish(rows)
+
+
+class StockReservationService:
+    """Conditional stock decrements for checkout and their release"""
+
+    @classmethod
+    def reserve(cls, quantities, user=None, reason='Checkout reservation'):
+        """
+        Take {store_product_id: quantity} out of stock in one statement, all
+        or nothing, leaving other customers' checkout holds untouched.
+        Raises InsufficientStock listing the short lines.
+        """
+        from catalog.models import StoreProduct
+
+        quantities = {pk: quantity for pk, quantity in quantities.items() if quantity > 0}
+        if not quantities:
+            return
+
+        per_line = _per_line(quantities)
+        required = per_line
+        if StockHoldService.enabled():
+            required = per_line + StockHoldService.held_quantity(exclude_user=user)
+        with transaction.atomic():
+            updated = StoreProduct.objects.filter(
+                pk__in=quantities, stock_quantity__gte=required
+            ).update(
+                stock_quantity=F('stock_quantity') - per_line,
+                updated_at=timezone.now()
+            )
+            if updated < len(quantities):
+                transaction.set_rollback(True)
+            else:
+                cls._log_events(quantities, 'reservation', -1, reason, user)
+
+        if updated < len(quantities):
+            raise InsufficientStock(cls.shortages(quantities, user))
+        transaction.on_commit(lambda: sync_catalog_stock(list(quantities)))
+
+    @classmethod
+    def restock(cls, quantities, reason='Reservation released'):
+        """Put {store_product_id: quantity} back into stock in one statement"""
+        from catalog.models import StoreProduct
+
+        quantities = {pk: quantity for pk, quantity in quantities.items() if quantity > 0}
+        if not quantities:
+            return
+
+        with transaction.atomic():
+            StoreProduct.objects.filter(pk__in=quantities).update(
+                stock_quantity=F('stock_quantity') + _per_line(quantities),
+                updated_at=timezone.now()
+            )
+            cls._log_events(quantities, 'release', 1, reason)
+        transaction.on_commit(lambda: sync_catalog_stock(list(quantities)))
+
+    @staticmethod
+    def _log_events(quantities, event_type, sign, reason, user=None):
+        """Inventory events for lines just moved by `sign` * quantity (read back in one query)"""
+        from catalog.models import StoreProduct
+        from catalog.services_inventory import InventoryEventLog
+
+        for pk, store_id, product_id, stock_quantity in StoreProduct.objects.filter(
+            pk__in=quantities
+        ).values_list('pk', 'store_id', 'product_id', 'stock_quantity'):
+            InventoryEventLog.record(
+                store_id, product_id, event_type, stock_quantity, reason,
+                previous_quantity=stock_quantity - sign * quantities[pk], user=user, check_alerts=True
+            )
+
+    @staticmethod
+    def shortages(quantities, user=None):
+        """Lines whose available-to-sell stock is below the requested quantity"""
+        from catalog.models import StoreProduct
+
+        store_products = StockHoldService.with_held_quantity(
+            StoreProduct.objects.filter(pk__in=quantities).select_related('product'), exclude_user=user
+        )
+        found = {sp.pk: (sp.product.name, sp.available_to_sell) for sp in store_products}
+        shortages = []
+        for pk, quantity in quantities.items():
+            name, stock = found.get(pk, (None, 0))
+            if stock < quantity:
+                shortages.append({
+                    'store_product_id': pk,
+                    'product_name': name or f'Item {pk}',
+                    'requested': quantity,
+                    'available': stock,
+                })
+        return shortages
+
+    # Orders
+
+    @staticmethod
+    def order_quantities(order):
+        quantities = defaultdict(int)
+        for store_product_id, quantity in order.items.values_list('store_product_id', 'quantity'):
+            quantities[store_product_id] += quantity
+        return dict(quantities)
+
+    @classmethod
+    def reserve_order(cls, order):
+        """Reserve every line of an order; raises InsufficientStock (nothing reserved)"""
+        from orders.models import Order
+
+        with transaction.atomic():
+            if not Order.objects.filter(pk=order.pk, stock_reserved=False).update(stock_reserved=True):
+                return False
+            quantities = cls.order_quantities(order)
+            cls.reserve(quantities, user=order.user_id, reason=f"Order {order.order_number}")
+            # The hold has become a reservation
+            StockHoldService.release(order.user_id, list(quantities))
+        order.stock_reserved = True
+        return True
+
+    @classmethod
+    def release_order(cls, order):
+        """Return an order's reserved stock; False if it held none (already released)"""
+        from orders.models import Order
+
+        try:
+            with transaction.atomic():
+                if not Order.objects.filter(pk=order.pk, stock_reserved=True).update(stock_reserved=False):
+                    return False
+                cls.restock(cls.order_quantities(order), reason=f"Order {order.order_number} released")
+        except DatabaseError as e:
+            logger.error(f"Stock release failed for order {order.order_number}: {str(e)}")
+            return False
+
+        order.stock_reserved = False
+        logger.info(f"Released reserved stock for order {order.order_number}")
+        return True
+
+
+class StockHoldService:
+    """Time-boxed checkout holds that count against everyone else's available stock"""
+
+    @staticmethod
+    def hold_minutes():
+        return getattr(settings, 'CATALOG_STOCK_HOLD_MINUTES', 10)
+
+    @classmethod
+    def enabled(cls):
+        return cls.hold_minutes() > 0
+
+    @staticmethod
+    def held_quantity(store_product_ref='pk', exclude_user=None):
+        """Expression: units of the referenced StoreProduct under unexpired holds (0 if none)"""
+        from catalog.models import StockHold
+
+        holds = StockHold.objects.filter(
+            store_product_id=OuterRef(store_product_ref), expires_at__gt=timezone.now()
+        )
+        if exclude_user is not None:
+            holds = holds.exclude(user=exclude_user)
+        total = holds.order_by().values('store_product_id').annotate(total=Sum('quantity')).values('total')
+        return Coalesce(Subquery(total, output_field=PositiveIntegerField()), 0)
+
+    @classmethod
+    def with_held_quantity(cls, queryset, store_product_ref='pk', exclude_user=None):
+        """
+        Annotate `held_quantity` (read by StoreProduct.available_to_sell);
+        `store_product_ref` points at the StoreProduct id for other models
+        """
+        if not cls.enabled():
+            return queryset
+        return queryset.annotate(held_quantity=cls.held_quantity(store_product_ref, exclude_user))
+
+    @classmethod
+    def hold_carts(cls, user, carts):
+        """
+        Replace the user's holds with their cart lines, each capped at what
+        other holds leave available; returns the number of lines held
+        """
+        from catalog.models import StockHold, StoreProduct
+
+        if not cls.enabled():
+            return 0
+
+        quantities = defaultdict(int)
+        for cart in carts:
+            for item in cart.items.all():
+                quantities[item.store_product_id] += item.quantity
+
+        available = dict(
+            cls.with_held_quantity(
+                StoreProduct.objects.filter(pk__in=quantities), exclude_user=user
+            ).values_list('pk', F('stock_quantity') - F('held_quantity'))
+        )
+        expires_at = timezone.now() + timedelta(minutes=cls.hold_minutes())
+        holds = [
+            StockHold(store_product_id=pk, user=user, quantity=min(quantity, available[pk]), expires_at=expires_at)
+            for pk, quantity in quantities.items()
+            if available.get(pk, 0) > 0
+        ]
+
+        with transaction.atomic():
+            StockHold.objects.filter(user=user).delete()
+            StockHold.objects.bulk_create(holds)
+        return len(holds)
+
+    @staticmethod
+    def release(user, store_product_ids=None):
+        """Drop a user's holds (all, or just some lines); returns the number deleted"""
+        from catalog.models import StockHold
+
+        holds = StockHold.objects.filter(user=user)
+        if store_product_ids is not None:
+            holds = holds.filter(store_product_id__in=store_product_ids)
+        deleted, _ = holds.delete()
+        return deleted
+
+    @staticmethod
+    def sweep():
+        """Delete every expired hold in one statement; returns the number deleted"""
+        from catalog.models import StockHold
+
+        deleted, _ = StockHold.objects.filter(expires_at__lte=timezone.now()).delete()
+        if deleted:
+            logger.info(f"Released {deleted} expired stock holds")
+        return deleted
+
+
+class StockBroadcaster:
+    """
+    Coalesced real-time stock updates for core.consumers.StockUpdateConsumer.
+
+    Changes join the buffer when their transaction commits. The first one
+    opens a WINDOW-second window; when it closes, the latest state of every
+    (store, product) changed in it goes out as `stock_batch` frames to the
+    `stock_store_<id>` and `stock_global` groups, at most FRAME_SIZE rows per
+    frame. Rows identical to what was last sent are dropped.
+
+    Windows of up to PRODUCT_FANOUT_LIMIT changes also get one frame per
+    `stock_product_<id>` group. Larger ones (imports, bulk edits) are sent
+    once to the `stock_bulk` group instead, where each product subscriber
+    keeps only the rows it follows. A 5,000-row import therefore costs a few
+    dozen channel-layer messages rather than one per product.
+    """
+    POOL = 'stock-broadcast'
+    WINDOW = 0.25
+    FRAME_SIZE = 500
+    PRODUCT_FANOUT_LIMIT = 100
+    # Forget what was sent once this many (store, product) pairs are tracked
+    MAX_TRACKED = 100000
+
+    _lock = threading.Lock()
+    _pending = {}
+    _last_sent = {}
+    _flush_scheduled = False
+
+    @classmethod
+    def publish(cls, rows):
+        """Queue [(store_id, product_id, stock_quantity, is_available)] for the next frame"""
+        rows = [
+            (store_id, product_id, stock_quantity, bool(is_available))
+            for store_id, product_id, stock_quantity, is_available in rows
+        ]
+        if rows:
+            transaction.on_commit(lambda: cls._buffer(rows))
+
+    @classmethod
+    def flush(cls):
+        """Send everything buffered now; returns the number of rows sent"""
+        from asgiref.sync import async_to_sync
+        from core.consumers import STOCK_BULK_GROUP, send_stock_batch
+
+        with cls._lock:
+            pending, cls._pending = cls._pending, {}
+            cls._flush_scheduled = False
+            if len(cls._last_sent) > cls.MAX_TRACKED:
+                cls._last_sent.clear()
+            changes = [
+                [product_id, store_id, stock_quantity, is_available]
+                for (store_id, product_id), (stock_quantity, is_available) in pending.items()
+                if cls._last_sent.get((store_id, product_id)) != (stock_quantity, is_available)
+            ]
+            cls._last_sent.update(pending)
+
+        if not changes:
+            return 0
+
+        groups = defaultdict(list)
+        fan_out = len(changes) <= cls.PRODUCT_FANOUT_LIMIT
+        for change in changes:
+            if fan_out:
+                groups[f'stock_product_{change[0]}'].append(change)
+            groups[f'stock_store_{change[1]}'].append(change)
+            groups['stock_global'].append(change)
+        if not fan_out:
+            groups[STOCK_BULK_GROUP] = changes
+
+        try:
+            async_to_sync(send_stock_batch)(groups, cls.FRAME_SIZE)
+        except Exception as e:
+            logger.warning(f"Could not push {len(changes)} stock changes: {str(e)}")
+        return len(changes)
+
+    @classmethod
+    def _buffer(cls, rows):
+        with cls._lock:
+            for store_id, product_id, stock_quantity, is_available in rows:
+                cls._pending[(store_id, product_id)] = (stock_quantity, is_available)
+            start_window = not cls._flush_scheduled
+            cls._flush_scheduled = True
+
+        if start_window:
+            run_in_background(cls.POOL, cls._flush_after_window)
+
+    @classmethod
+    def _flush_after_window(cls):
+        time.sleep(cls.WINDOW)
+        cls.flush()
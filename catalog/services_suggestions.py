@@ -0,0 +1,185 @@
+"""
+Product Suggestion Services
+Builds the suggestion / "Complete the Dish" payload for a store product
+with a fixed number of queries, cached per (store, product)
+"""
+from django.core.cache import cache
+from django.db.models.functions import Length
+import logging
+
+from core.cache_utils import bump_cache_version, get_cache_version, versioned_key
+
+logger = logging.getLogger(__name__)
+
+CATALOG_NAMESPACE = 'suggestions:catalog'
+
+
+class ProductSuggestionService:
+    """Batch-resolved product suggestions"""
+    CACHE_TIMEOUT = 900
+
+    @staticmethod
+    def _store_namespace(store_id):
+        return f'suggestions:store:{store_id}'
+
+    @classmethod
+    def invalidate_catalog(cls):
+        """Suggestion, ingredient or mapping change: drop every cached payload"""
+        bump_cache_version(CATALOG_NAMESPACE)
+
+    @classmethod
+    def invalidate_store(cls, store_id):
+        """Price / stock change in a store: drop that store's payloads"""
+        bump_cache_version(cls._store_namespace(store_id))
+
+    @classmethod
+    def _cache_key(cls, store_id, product_id):
+        store_version = get_cache_version(cls._store_namespace(store_id))
+        return versioned_key(CATALOG_NAMESPACE, store_id, store_version, product_id)
+
+    @classmethod
+    def get_suggestions(cls, store_product):
+        """Suggestions and dish ingredients for a store product, served from cache"""
+        cache_key = cls._cache_key(store_product.store_id, store_product.product_id)
+        payload = cache.get(cache_key)
+        if payload is None:
+            payload = cls._build_payload(store_product.product_id, store_product.store_id)
+            cache.set(cache_key, payload, timeout=cls.CACHE_TIMEOUT)
+        return payload
+
+    @classmethod
+    def get_dish_ingredients(cls, product_id, store_id):
+        """Ingredient rows for one product in one store (two queries)"""
+        ingredients = cls._ingredient_rows(product_id)
+        store_products = cls._store_products(store_id, [row['product_id'] for row in ingredients])
+        return cls._format_ingredients(ingredients, store_products)
+
+    @classmethod
+    def _build_payload(cls, product_id, store_id):
+        from catalog.models import ProductSuggestion
+
+        # Curated suggestions first, then rows generated by the co-purchase builder
+        suggestion_rows = list(
+            ProductSuggestion.objects.filter(
+                product_id=product_id,
+                is_active=True
+            ).order_by('is_generated', '-weight').values_list('suggested_product_id', 'suggestion_type', 'weight')
+        )
+        ingredients = cls._ingredient_rows(product_id)
+
+        # One lookup resolves every referenced product to its offer in this store
+        product_ids = {row[0] for row in suggestion_rows}
+        product_ids.update(row['product_id'] for row in ingredients)
+        store_products = cls._store_products(store_id, product_ids)
+
+        type_labels = dict(ProductSuggestion.SUGGESTION_TYPES)
+        suggestions = []
+        seen = set()
+        for suggested_id, suggestion_type, weight in suggestion_rows:
+            store_product = store_products.get(suggested_id)
+            if store_product and suggested_id not in seen:
+                seen.add(suggested_id)
+                suggestions.append(dict(
+                    cls._serialize(store_product),
+                    type=type_labels.get(suggestion_type, suggestion_type),
+                    weight=weight
+                ))
+
+        return {
+            'suggestions': suggestions,
+            'dish_ingredients': cls._format_ingredients(ingredients, store_products),
+        }
+
+    @staticmethod
+    def _ingredient_rows(product_id):
+        from catalog.models import ProductIngredient
+
+        return [
+            {'product_id': mapped_product_id, 'quantity': quantity, 'is_optional': is_optional}
+            for mapped_product_id, quantity, is_optional in ProductIngredient.objects.filter(
+                product_id=product_id,
+                ingredient__product_mapping__isnull=False
+            ).values_list('ingredient__product_mapping__product_id', 'quantity', 'is_optional')
+        ]
+
+    @staticmethod
+    def _store_products(store_id, product_ids):
+        from catalog.models import StoreProduct
+
+        if not product_ids:
+            return {}
+        return {
+            store_product.product_id: store_product
+            for store_product in StoreProduct.objects.filter(
+                store_id=store_id,
+                product_id__in=product_ids,
+                is_available=True
+            ).select_related('product')
+        }
+
+    @classmethod
+    def _format_ingredients(cls, ingredients, store_products):
+        rows = []
+        for ingredient in ingredients:
+            store_product = store_products.get(ingredient['product_id'])
+            if store_product:
+                rows.append(dict(
+                    cls._serialize(store_product),
+                    quantity=ingredient['quantity'] or 'As needed',
+                    is_optional=ingredient['is_optional']
+                ))
+        return rows
+
+    @staticmethod
+    def _serialize(store_product):
+        product = store_product.product
+        return {
+            'id': store_product.id,
+            'name': product.name,
+            'price': float(store_product.price),
+            'image_url': product.image.url if product.image else None,
+        }
+
+
+def match_ingredient_product(ingredient_name):
+    """Best catalog product for an ingredient name: exact name, else the shortest containing it"""
+    from catalog.models import Product
+
+    products = Product.objects.filter(is_active=True)
+    return (
+        products.filter(name__iexact=ingredient_name).first() or
+        products.filter(name__icontains=ingredient_name).order_by(Length('name'), 'id').first()
+    )
+
+
+def map_ingredient_products(overwrite=False):
+    """
+    (Re)generate IngredientProduct rows by name matching. Manual mappings are
+    never touched; existing automatic ones are only replaced with overwrite.
+    Returns (mapped, unmatched) counts.
+    """
+    from catalog.models import Ingredient, IngredientProduct
+
+    existing = {
+        mapping.ingredient_id: mapping
+        for mapping in IngredientProduct.objects.all()
+    }
+
+    mapped = unmatched = 0
+    for ingredient in Ingredient.objects.filter(is_active=True):
+        mapping = existing.get(ingredient.id)
+        if mapping and (mapping.is_manual or not overwrite):
+            continue
+
+        product = match_ingredient_product(ingredient.name)
+        if product is None:
+            unmatched += 1
+            continue
+
+        IngredientProduct.objects.update_or_create(
+            ingredient=ingredient,
+            defaults={'product': product, 'is_manual': False}
+        )
+        mapped += 1
+
+    return mapped, unmatched
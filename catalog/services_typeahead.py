@@ -0,0 +1,217 @@
+"""
+Typeahead Services
+In-process, per-store prefix indexes for product name completion.
+
+Each worker keeps a sorted array of normalized search keys per store and
+answers completions with bisect, so the hot path never touches the
+database. Indexes carry the generation counters they were built from;
+the counters live in the shared cache and are bumped by catalog signals,
+which makes every worker rebuild lazily on its next lookup.
+"""
+from bisect import bisect_left
+from django.apps import apps
+from django.db import DatabaseError
+from django.db.models import Count
+import heapq
+import logging
+import threading
+import time
+import unicodedata
+
+from core.cache_utils import bump_cache_version, get_cache_version
+
+logger = logging.getLogger(__name__)
+
+CATALOG_NAMESPACE = 'typeahead:catalog'
+
+# Highest code point; appended to a prefix to find the end of its key range
+_RANGE_END = '\U0010ffff'
+
+
+def normalize(text):
+    """Lowercase, strip accents and collapse whitespace"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.lower().split())
+
+
+class StoreTypeaheadIndex:
+    """Sorted (key -> entry) arrays for one store, searched with bisect"""
+    __slots__ = ('keys', 'entries', 'generation', 'built_at')
+
+    def __init__(self, rows, generation):
+        rows.sort(key=lambda row: row[0])
+        self.keys = [row[0] for row in rows]
+        self.entries = [row[1] for row in rows]
+        self.generation = generation
+        self.built_at = time.monotonic()
+
+    def is_current(self, generation, max_age):
+        return self.generation == generation and time.monotonic() - self.built_at < max_age
+
+    def complete(self, prefix, limit):
+        """Top `limit` entries whose key starts with `prefix`, most popular first"""
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + _RANGE_END, lo)
+        if lo == hi:
+            return []
+
+        # One product can match through several keys (name words, aliases)
+        best = {}
+        for entry in self.entries[lo:hi]:
+            current = best.get(entry['product_id'])
+            if current is None or entry['exact'] > current['exact']:
+                best[entry['product_id']] = entry
+        return heapq.nlargest(
+            limit, best.values(),
+            key=lambda entry: (entry['popularity'], entry['exact'], -len(entry['name']))
+        )
+
+
+class TypeaheadService:
+    """Process-local typeahead indexes keyed by store"""
+    MIN_QUERY_LENGTH = 2
+    MAX_RESULTS = 20
+    # Popularity comes from order history, which does not bump generations
+    MAX_INDEX_AGE = 3600
+
+    _indexes = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _store_namespace(store_id):
+        return f'typeahead:store:{store_id}'
+
+    @classmethod
+    def invalidate_catalog(cls):
+        """Product-level change (name, aliases, active flag): rebuild every store"""
+        bump_cache_version(CATALOG_NAMESPACE)
+
+    @classmethod
+    def invalidate_store(cls, store_id):
+        """Store-level change (availability, price): rebuild one store"""
+        bump_cache_version(cls._store_namespace(store_id))
+
+    @classmethod
+    def _current_generation(cls, store_id):
+        return (get_cache_version(CATALOG_NAMESPACE), get_cache_version(cls._store_namespace(store_id)))
+
+    @classmethod
+    def get_index(cls, store_id):
+        generation = cls._current_generation(store_id)
+        index = cls._indexes.get(store_id)
+        if index is not None and index.is_current(generation, cls.MAX_INDEX_AGE):
+            return index
+
+        with cls._lock:
+            # Another thread may have rebuilt it while we waited
+            index = cls._indexes.get(store_id)
+            if index is None or not index.is_current(generation, cls.MAX_INDEX_AGE):
+                index = StoreTypeaheadIndex(cls._build_rows(store_id), generation)
+                cls._indexes[store_id] = index
+        return index
+
+    @classmethod
+    def complete(cls, query, store_ids, limit=5):
+        """
+        Complete `query` across one or more stores. When several stores sell
+        the same product the cheapest offer is returned.
+        """
+        prefix = normalize(query)
+        if len(prefix) < cls.MIN_QUERY_LENGTH or not store_ids:
+            return []
+        limit = max(1, min(limit, cls.MAX_RESULTS))
+
+        results = {}
+        for store_id in store_ids:
+            for entry in cls.get_index(store_id).complete(prefix, limit):
+                current = results.get(entry['product_id'])
+                if current is None or entry['price'] < current['price']:
+                    results[entry['product_id']] = entry
+
+        return heapq.nlargest(
+            limit, results.values(),
+            key=lambda entry: (entry['popularity'], entry['exact'], -len(entry['name']))
+        )
+
+    @classmethod
+    def _build_rows(cls, store_id):
+        """Load one store's catalog and expand it into (key, entry) rows"""
+        from catalog.models import StoreProduct
+        from orders.models import OrderItem
+
+        store_products = list(
+            StoreProduct.objects.filter(
+                store_id=store_id,
+                is_available=True,
+                product__is_active=True
+            ).values_list(
+                'id', 'product_id', 'product__name', 'product__slug',
+                'product__search_aliases', 'price', 'store__state'
+            )
+        )
+        if not store_products:
+            return []
+
+        popularity = dict(
+            OrderItem.objects.filter(
+                store_product__store_id=store_id
+            ).exclude(
+                order__status__in=['cancelled', 'refunded']
+            ).values('store_product__product_id').annotate(
+                orders=Count('id')
+            ).values_list('store_product__product_id', 'orders')
+        )
+
+        product_ids = [row[1] for row in store_products]
+        local_names = cls._regional_names(product_ids, store_products[0][6])
+
+        rows = []
+        for sp_id, product_id, name, slug, aliases, price, _state in store_products:
+            entry = {
+                'id': sp_id,
+                'product_id': product_id,
+                'name': name,
+                'slug': slug,
+                'price': price,
+                'popularity': popularity.get(product_id, 0),
+                'exact': 1,
+            }
+            terms = [name] + [alias.strip() for alias in (aliases or '').split(',') if alias.strip()]
+            terms += local_names.get(product_id, [])
+            for term in terms:
+                key = normalize(term)
+                words = key.split(' ')
+                # Index every word start so "breast" completes "Chicken Breast"
+                for position in range(len(words)):
+                    suffix = ' '.join(words[position:])
+                    if not suffix:
+                        continue
+                    if term == name:
+                        rows.append((suffix, entry if position == 0 else dict(entry, exact=0)))
+                    else:
+                        rows.append((suffix, dict(entry, exact=0, matched=term)))
+        return rows
+
+    @staticmethod
+    def _regional_names(product_ids, state):
+        """RegionalProduct.local_name values for the store's region, if that model is installed"""
+        try:
+            RegionalProduct = apps.get_model('core', 'RegionalProduct')
+        except LookupError:
+            return {}
+
+        names = {}
+        try:
+            rows = RegionalProduct.objects.filter(
+                product_id__in=product_ids,
+                region__state__iexact=state,
+                is_available=True
+            ).values_list('product_id', 'local_name', 'local_name_translation')
+            for product_id, local_name, translation in rows:
+                names.setdefault(product_id, []).extend(
+                    name for name in (local_name, translation) if name
+                )
+        except DatabaseError as e:
+            logger.error(f"Regional product names unavailable for typeahead: {str(e)}")
+        return names
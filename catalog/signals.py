@@ -0,0 +1,214 @@
+from django.db import DatabaseError, transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+import logging
+from stores.models import Store, StoreZipCoverage
+from locations.models import ZipArea
+from core.services_images import ImageDerivativeService
+from .models import (
+    Category, Product, ProductImage, StoreProduct, Ingredient, ProductIngredient, IngredientProduct,
+    ProductSuggestion
+)
+from .services_categories import CategoryTreeService
+from .services_search import get_search_backend
+from .services_typeahead import TypeaheadService
+from .services_facets import CatalogFacetService
+from .services_listing import ZipCatalogService
+from .services_stock import StockBroadcaster
+from .services_detail import ProductDetailService
+from .services_suggestions import ProductSuggestionService, match_ingredient_product
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_tree(sender, instance, **kwargs):
+    """Connected first so later Category receivers already see the new hierarchy"""
+    CategoryTreeService.invalidate()
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_index(sender, instance, **kwargs):
+    """Keep the product's search document in sync with its name/description/category"""
+    try:
+        # Savepoint: a failed index write must not abort the caller's transaction
+        with transaction.atomic():
+            if instance.is_active:
+                get_search_backend().index_products([instance.pk])
+            else:
+                get_search_backend().remove_products([instance.pk])
+    except DatabaseError as e:
+        logger.error(f"Search index update failed for product {instance.pk}: {str(e)}")
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_search_index(sender, instance, **kwargs):
+    try:
+        with transaction.atomic():
+            get_search_backend().remove_products([instance.pk])
+    except DatabaseError as e:
+        logger.error(f"Search index removal failed for product {instance.pk}: {str(e)}")
+
+
+@receiver(post_save, sender=Category)
+def update_category_search_index(sender, instance, created, **kwargs):
+    """Category names are indexed on every product, so refresh its products"""
+    if created:
+        return
+    try:
+        product_ids = list(instance.products.values_list('id', flat=True))
+        with transaction.atomic():
+            get_search_backend().index_products(product_ids)
+    except DatabaseError as e:
+        logger.error(f"Search index update failed for category {instance.pk}: {str(e)}")
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_typeahead_catalog(sender, instance, **kwargs):
+    TypeaheadService.invalidate_catalog()
+
+
+# Saves limited to these fields cannot change what typeahead shows
+TYPEAHEAD_IGNORED_FIELDS = {'stock_quantity', 'updated_at'}
+
+
+@receiver(post_save, sender=StoreProduct)
+@receiver(post_delete, sender=StoreProduct)
+def invalidate_typeahead_store(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= TYPEAHEAD_IGNORED_FIELDS:
+        return
+    TypeaheadService.invalidate_store(instance.store_id)
+
+
+def _deleted_directly(sender, origin):
+    """
+    False for rows removed by the cascade of another model's delete (a Store
+    or Product), whose own receivers cover the listing
+    """
+    return origin is None or getattr(origin, 'model', type(origin)) is sender
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog_facets(sender, instance, **kwargs):
+    """Names and hierarchy appear in every ZIP's facets and detail pages"""
+    CatalogFacetService.invalidate()
+    ProductDetailService.invalidate()
+
+
+@receiver(post_save, sender=StoreProduct)
+@receiver(post_delete, sender=StoreProduct)
+def invalidate_product_detail(sender, instance, origin=None, **kwargs):
+    """
+    Offer edits change detail options and prices; facets follow the ZIP
+    listing refresh, and cascaded deletes drop out at read time
+    """
+    if _deleted_directly(sender, origin):
+        ProductDetailService.invalidate()
+
+
+# ZIP catalog listing maintenance (see services_listing)
+
+
+@receiver(post_save, sender=StoreProduct)
+@receiver(post_delete, sender=StoreProduct)
+def refresh_zip_catalog_store_product(sender, instance, origin=None, **kwargs):
+    if _deleted_directly(sender, origin):
+        ZipCatalogService.schedule_store(instance.store_id, product_ids=[instance.product_id])
+
+
+@receiver(post_save, sender=Product)
+def refresh_zip_catalog_product(sender, instance, **kwargs):
+    ZipCatalogService.refresh(product_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def refresh_zip_catalog_category(sender, instance, created, **kwargs):
+    """Category paths are denormalized onto entries of the category and its subcategories"""
+    if created:
+        return
+    category_ids = CategoryTreeService.get_tree().descendant_ids(instance.pk)
+    product_ids = list(
+        Product.objects.filter(category_id__in=category_ids).values_list('id', flat=True)
+    )
+    ZipCatalogService.refresh(product_ids=product_ids)
+
+
+@receiver(post_save, sender=Store)
+def refresh_zip_catalog_store(sender, instance, created, **kwargs):
+    if not created:
+        ZipCatalogService.schedule_store(instance.pk)
+
+
+@receiver(pre_delete, sender=Store)
+def refresh_zip_catalog_store_removal(sender, instance, **kwargs):
+    ZipCatalogService.schedule_store_removal(instance.pk)
+
+
+@receiver(post_save, sender=StoreZipCoverage)
+@receiver(post_delete, sender=StoreZipCoverage)
+def refresh_zip_catalog_coverage(sender, instance, origin=None, **kwargs):
+    if _deleted_directly(sender, origin):
+        ZipCatalogService.refresh_coverage(instance.store_id, instance.zip_area_id)
+
+
+@receiver(post_save, sender=ZipArea)
+def refresh_zip_catalog_zip_area(sender, instance, created, **kwargs):
+    if not created:
+        ZipCatalogService.refresh(zip_area_ids=[instance.pk])
+
+
+@receiver(post_save, sender=StoreProduct)
+def broadcast_stock_change(sender, instance, **kwargs):
+    """Coalesced WebSocket push (see services_stock.StockBroadcaster)"""
+    if hasattr(instance.stock_quantity, 'resolve_expression'):
+        return
+    StockBroadcaster.publish([
+        (instance.store_id, instance.product_id, instance.stock_quantity, instance.is_available)
+    ])
+
+
+# Suggestion payload cache (see services_suggestions)
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductSuggestion)
+@receiver(post_delete, sender=ProductSuggestion)
+@receiver(post_save, sender=ProductIngredient)
+@receiver(post_delete, sender=ProductIngredient)
+@receiver(post_save, sender=IngredientProduct)
+@receiver(post_delete, sender=IngredientProduct)
+def invalidate_suggestions_catalog(sender, instance, **kwargs):
+    ProductSuggestionService.invalidate_catalog()
+
+
+@receiver(post_save, sender=StoreProduct)
+@receiver(post_delete, sender=StoreProduct)
+def invalidate_suggestions_store(sender, instance, **kwargs):
+    ProductSuggestionService.invalidate_store(instance.store_id)
+
+
+@receiver(post_save, sender=Ingredient)
+def map_new_ingredient(sender, instance, created, **kwargs):
+    """New ingredients get an automatic product mapping when one matches by name"""
+    if not created:
+        return
+    product = match_ingredient_product(instance.name)
+    if product is not None:
+        IngredientProduct.objects.get_or_create(ingredient=instance, defaults={'product': product})
+
+
+# Image derivatives (see core.services_images)
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductImage)
+def schedule_image_derivatives(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    ImageDerivativeService.schedule(instance, 'image')
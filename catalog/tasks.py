@@ -0,0 +1,24 @@
+"""
+Celery tasks for the catalog app
+Import jobs are only queued here when CATALOG_IMPORT_BACKEND = 'celery'
+"""
+from celery import shared_task
+
+from .services_import import ImportJobService
+from .services_inventory import InventoryAnalyticsService
+from .services_stock import StockHoldService
+
+
+@shared_task(name='catalog.process_import_job')
+def process_import_job(job_id):
+    ImportJobService.run(job_id)
+
+
+@shared_task(name='catalog.release_expired_stock_holds')
+def release_expired_stock_holds():
+    return StockHoldService.sweep()
+
+
+@shared_task(name='catalog.create_daily_inventory_snapshot')
+def create_daily_inventory_snapshot():
+    return InventoryAnalyticsService.create_daily_snapshot()
@@ -19,6 +19,7 @@ urlpatterns = [
     # AJAX endpoints
     path('api/product/<int:store_product_id>/details/', views.ProductDetailsAPIView.as_view(), name='product_details_api'),
     path('api/suggestions/<int:product_id>/', views.ProductSuggestionsAPIView.as_view(), name='product_suggestions'),
+    path('api/typeahead/', views.ProductSuggestionsAPIView.as_view(), name='typeahead'),
     path('api/add-to-cart/', views.AddToCartAPIView.as_view(), name='add_to_cart_api'),
     
     # Product Suggestions & "Complete the Dish"
@@ -1,21 +1,43 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from django.shortcuts import redirect
 from django.views.generic import TemplateView, ListView, DetailView, FormView
 from django.http import JsonResponse
-from django.db.models import Q, Count, Min, Max
-from django.core.paginator import Paginator
 from stores.models import Store
-from locations.models import ZipArea
-from .models import Category, Product, StoreProduct, ProductReview
-from stores.models import Store
-from locations.models import ZipArea
-from .models import Category, Product, StoreProduct, ProductReview
+from stores.services import ZipServiceResolver
+from core.pagination import KeysetPaginationMixin
+from .models import Category, Product, StoreProduct, ProductReview, ZipCatalogEntry
+from .services_search import get_search_backend
+from .services_typeahead import TypeaheadService
+from .services_facets import CatalogFacetService
+from .services_listing import ZipCatalogService
+from .services_categories import CategoryTreeService
+from .services_detail import ProductDetailService
 
-class ProductListView(ListView):
+class ProductListView(KeysetPaginationMixin, ListView):
     """Enhanced product listing with advanced filtering"""
     template_name = 'catalog/product_list_enhanced.html'
     context_object_name = 'products'
     paginate_by = 20
     
+    # Every ordering ends in a unique tie-breaker so it can drive keyset pagination
+    SORT_ORDERINGS = {
+        'relevance': ('search_rank', 'id'),
+        'price_low': ('price', 'id'),
+        'price_high': ('-price', 'id'),
+        'newest': ('-listed_at', '-id'),
+        'popular': ('-popularity_score', 'id'),
+        'name': ('product_name', 'id'),
+    }
+    
+    def get_sort(self):
+        search_query = self.request.GET.get('q')
+        sort_by = self.request.GET.get('sort', 'relevance' if search_query else 'name')
+        if sort_by not in self.SORT_ORDERINGS or (sort_by == 'relevance' and not search_query):
+            sort_by = 'name'
+        return sort_by
+    
+    def get_keyset_ordering(self):
+        return self.SORT_ORDERINGS[self.get_sort()]
+    
     def dispatch(self, request, *args, **kwargs):
         # Ensure ZIP code is selected
         if not request.session.get('selected_zip_code'):
@@ -27,48 +49,32 @@ class ProductListView(ListView):
         selected_zip = self.request.session.get('selected_zip_code')
         
         if not selected_zip:
-            return StoreProduct.objects.none()
-        
-        # Get all stores that serve the selected ZIP area through StoreZipCoverage
-        try:
-            from locations.models import ZipArea
-            from stores.models import StoreZipCoverage
-            
-            zip_area = ZipArea.objects.get(zip_code=selected_zip, is_active=True)
-            available_stores = Store.objects.filter(
-                zip_coverages__zip_area=zip_area,
-                zip_coverages__is_active=True,
-                is_active=True,
-                status='open'
-            ).distinct()
-        except ZipArea.DoesNotExist:
-            return StoreProduct.objects.none()
-        
-        # Get products from all stores in the area
-        queryset = StoreProduct.objects.filter(
-            store__in=available_stores,
-            is_available=True,
-            availability_status='in_stock'
-        ).select_related('product', 'store', 'product__category').order_by('product__name')
+            return ZipCatalogEntry.objects.none()
+        
+        # Get all stores that serve the selected ZIP area (shared resolution cache)
+        zip_area = ZipServiceResolver.get_zip_area(selected_zip)
+        if zip_area is None:
+            return ZipCatalogEntry.objects.none()
+        available_store_ids = ZipServiceResolver.get_store_ids(selected_zip)
+        
+        # One materialized row per product: the cheapest offer in the area
+        user = self.request.user if self.request.user.is_authenticated else None
+        queryset = ZipCatalogService.with_store_products(
+            ZipCatalogService.entries_for_zip(zip_area, available_store_ids), user=user
+        )
         
-        # Apply category filter
+        # Apply category / subcategory filter (a category includes its subcategories)
         category_slug = self.request.GET.get('category')
-        if category_slug:
-            queryset = queryset.filter(product__category__slug=category_slug)
-        
-        # Apply subcategory filter
         subcategory_slug = self.request.GET.get('subcategory')
-        if subcategory_slug:
-            queryset = queryset.filter(product__category__slug=subcategory_slug)
+        if subcategory_slug or category_slug:
+            queryset = queryset.filter(
+                category_id__in=CategoryTreeService.get_tree().descendant_ids(subcategory_slug or category_slug)
+            )
         
-        # Apply search filter
+        # Apply search filter (ranked full-text index, see services_search)
         search_query = self.request.GET.get('q')
         if search_query:
-            queryset = queryset.filter(
-                Q(product__name__icontains=search_query) |
-                Q(product__description__icontains=search_query) |
-                Q(product__category__name__icontains=search_query)
-            )
+            queryset = get_search_backend().filter_queryset(queryset, search_query, prefix=True)
         
         # Apply price range filter
         min_price = self.request.GET.get('min_price')
@@ -87,130 +93,67 @@ class ProductListView(ListView):
         # Apply unit type filter
         unit_type = self.request.GET.get('unit_type')
         if unit_type:
-            queryset = queryset.filter(product__unit_type=unit_type)
+            queryset = queryset.filter(unit_type=unit_type)
         
-        # Apply sorting
-        sort_by = self.request.GET.get('sort', 'name')
-        if sort_by == 'price_low':
-            queryset = queryset.order_by('price')
-        elif sort_by == 'price_high':
-            queryset = queryset.order_by('-price')
-        elif sort_by == 'newest':
-            queryset = queryset.order_by('-created_at')
-        elif sort_by == 'popular':
-            # Sort by availability and stock quantity
-            queryset = queryset.order_by('-stock_quantity')
-        else:  # Default to name
-            queryset = queryset.order_by('product__name')
+        # Apply sorting (search results default to relevance order)
+        queryset = queryset.order_by(*self.SORT_ORDERINGS[self.get_sort()])
         
         # Apply availability filter
         only_available = self.request.GET.get('available')
         if only_available == '1':
-            queryset = queryset.filter(stock_quantity__gt=0)
+            queryset = queryset.filter(in_stock=True)
         
         return queryset
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
+        # Templates render the StoreProduct behind each listing entry
+        context['products'] = ZipCatalogService.store_products(context['object_list'])
+        
         # Get ZIP information
         selected_zip = self.request.session.get('selected_zip_code')
-        if selected_zip:
-            try:
-                from locations.models import ZipArea
-                from stores.models import StoreZipCoverage
-                
-                zip_area = ZipArea.objects.get(zip_code=selected_zip, is_active=True)
-                context['selected_zip'] = selected_zip
-                context['zip_area'] = zip_area
-                
-                # Get all stores that serve this ZIP area
-                available_stores = Store.objects.filter(
-                    zip_coverages__zip_area=zip_area,
-                    zip_coverages__is_active=True,
-                    is_active=True,
-                    status='open'
-                ).distinct()
-                context['available_stores'] = available_stores
-                context['store_count'] = available_stores.count()
-            except ZipArea.DoesNotExist:
-                pass
-        
-        # Get categories for filtering (only active categories with products from stores in the area)
-        if selected_zip:
-            try:
-                from locations.models import ZipArea
-                from stores.models import StoreZipCoverage
-                
-                zip_area = ZipArea.objects.get(zip_code=selected_zip, is_active=True)
-                available_stores = Store.objects.filter(
-                    zip_coverages__zip_area=zip_area,
-                    zip_coverages__is_active=True,
-                    is_active=True,
-                    status='open'
-                ).distinct()
-                
-                categories = Category.objects.filter(
-                    is_active=True,
-                    parent__isnull=True,
-                    product__storeproduct__store__in=available_stores,
-                    product__storeproduct__is_available=True
-                ).distinct().order_by('sort_order', 'name')
-                context['categories'] = categories
-            except ZipArea.DoesNotExist:
-                context['categories'] = Category.objects.none()
+        zip_area = ZipServiceResolver.get_zip_area(selected_zip)
+        available_store_ids = []
+        if zip_area:
+            available_store_ids = ZipServiceResolver.get_store_ids(selected_zip)
+            context['selected_zip'] = selected_zip
+            context['zip_area'] = zip_area
+            context['available_stores'] = ZipServiceResolver.get_stores(selected_zip)
+            context['store_count'] = len(available_store_ids)
+        
+        # Keep the auto-selected store (set by HomeView) available to templates
+        store_id = self.request.session.get('selected_store_id')
+        if store_id:
+            for store in context.get('available_stores', []):
+                if store.id == store_id:
+                    context['selected_store'] = store
+                    break
+        
+        # All filter facets come from one cached grouped query (see services_facets)
+        if zip_area:
+            facets = CatalogFacetService.get_facets(
+                selected_zip, CatalogFacetService.filters_from_request(self.request.GET)
+            )
+            context['facets'] = facets
+            context['categories'] = [
+                dict(category, product_count=category['count']) for category in facets['categories']
+            ]
+            context['subcategories'] = facets['subcategories']
+            context['price_range'] = {
+                'min_price': facets['price']['min'],
+                'max_price': facets['price']['max'],
+            }
+            context['unit_types'] = [unit['value'] for unit in facets['unit_types']]
         else:
-            context['categories'] = Category.objects.none()
+            context['categories'] = []
         
-        # Get subcategories if category is selected
         category_slug = self.request.GET.get('category')
-        if category_slug and selected_zip:
-            try:
-                selected_category = Category.objects.get(slug=category_slug)
-                context['selected_category'] = selected_category
-                available_stores = Store.objects.filter(
-                    zip_code=selected_zip,
-                    is_active=True,
-                    status='open'
-                )
-                subcategories = Category.objects.filter(
-                    parent=selected_category,
-                    is_active=True,
-                    product__storeproduct__store__in=available_stores,
-                    product__storeproduct__is_available=True
-                ).distinct().order_by('sort_order', 'name')
-                context['subcategories'] = subcategories
-            except Category.DoesNotExist:
-                pass
-        
-        # Get price range for filtering
-        if selected_zip:
-            available_stores = Store.objects.filter(
-                zip_code=selected_zip,
-                is_active=True,
-                status='open'
-            )
-            price_range = StoreProduct.objects.filter(
-                store__in=available_stores,
-                is_available=True
-            ).aggregate(
-                min_price=Min('price'),
-                max_price=Max('price')
-            )
-            context['price_range'] = price_range
-        
-        # Get unit types for filtering
-        if selected_zip:
-            available_stores = Store.objects.filter(
-                zip_code=selected_zip,
-                is_active=True,
-                status='open'
-            )
-            unit_types = StoreProduct.objects.filter(
-                store__in=available_stores,
-                is_available=True
-            ).values_list('product__unit_type', flat=True).distinct()
-            context['unit_types'] = [ut for ut in unit_types if ut]
+        if category_slug and zip_area:
+            context['selected_category'] = next(
+                (category for category in context['categories'] if category['slug'] == category_slug),
+                None
+            ) or Category.objects.filter(slug=category_slug).first()
         
         # Current filters for display
         context['current_filters'] = {
@@ -220,43 +163,34 @@ class ProductListView(ListView):
             'min_price': self.request.GET.get('min_price', ''),
             'max_price': self.request.GET.get('max_price', ''),
             'unit_type': self.request.GET.get('unit_type', ''),
-            'sort': self.request.GET.get('sort', 'name'),
+            'sort': self.get_sort(),
             'available': self.request.GET.get('available', ''),
         }
         
         return context
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        
-        # Get store and ZIP info
-        store_id = self.request.session.get('selected_store_id')
-        selected_zip = self.request.session.get('selected_zip_code')
-        
-        if store_id and selected_zip:
-            try:
-                store = Store.objects.get(id=store_id)
-                zip_area = ZipArea.objects.get(zip_code=selected_zip)
-                
-                context['selected_store'] = store
-                context['zip_area'] = zip_area
-                
-                # Get categories with product counts for the selected store
-                context['categories'] = Category.objects.filter(
-                    products__store_products__store=store,
-                    products__store_products__is_available=True,
-                    is_active=True
-                ).annotate(
-                    product_count=Count('products__store_products', filter=Q(
-                        products__store_products__store=store,
-                        products__store_products__is_available=True
-                    ))
-                ).distinct().order_by('name')
-                
-            except (Store.DoesNotExist, ZipArea.DoesNotExist):
-                pass
-        
-        return context
+    def render_to_response(self, context, **response_kwargs):
+        # Infinite-scroll clients page through ?cursor=&format=json
+        if self.request.GET.get('format') == 'json':
+            page = context.get('page_obj')
+            return JsonResponse({
+                'products': [
+                    {
+                        'id': store_product.id,
+                        'name': store_product.product.name,
+                        'slug': store_product.product.slug,
+                        'store': store_product.store.name,
+                        'price': str(store_product.price),
+                        'compare_price': str(store_product.compare_price) if store_product.compare_price else None,
+                        'stock': store_product.stock_quantity,
+                    }
+                    for store_product in context['products']
+                ],
+                'next_cursor': getattr(page, 'next_cursor', None),
+                'previous_cursor': getattr(page, 'previous_cursor', None),
+                'count': context['paginator'].count if context.get('paginator') else len(context['object_list']),
+            })
+        return super().render_to_response(context, **response_kwargs)
 
 class CategoryProductsView(ProductListView):
     """Show products from a specific category for the selected store"""
@@ -267,7 +201,9 @@ class CategoryProductsView(ProductListView):
         category_slug = self.kwargs.get('category_slug')
         
         if category_slug:
-            queryset = queryset.filter(product__category__slug=category_slug)
+            queryset = queryset.filter(
+                category_id__in=CategoryTreeService.get_tree().descendant_ids(category_slug)
+            )
         
         return queryset
     
@@ -334,30 +270,26 @@ class ProductDetailView(DetailView):
             return redirect('core:zip_capture')
         return super().dispatch(request, *args, **kwargs)
     
-    def get_object(self):
-        selected_zip = self.request.session.get('selected_zip_code')
-        product_slug = self.kwargs.get('product_slug')
-        
-        if not selected_zip or not product_slug:
-            return None
-        
-        # Get stores in the selected zip area
-        available_stores = Store.objects.filter(
-            zip_code=selected_zip,
-            is_active=True,
-            status='open'
-        )
-        
-        # Get the product from any available store (preferably the cheapest)
-        return StoreProduct.objects.filter(
-            store__in=available_stores,
-            product__slug=product_slug,
-            is_available=True
-        ).select_related('product', 'store').order_by('price').first()
+    def get_detail(self):
+        """Options and related products, resolved once per request (and cached briefly)"""
+        if not hasattr(self, '_detail'):
+            selected_zip = self.request.session.get('selected_zip_code')
+            product_slug = self.kwargs.get('product_slug')
+            if selected_zip and product_slug:
+                self._detail = ProductDetailService.get_detail(product_slug, selected_zip)
+            else:
+                self._detail = {'options': [], 'related_products': []}
+        return self._detail
+    
+    def get_object(self, queryset=None):
+        # The cheapest option in the selected area
+        options = self.get_detail()['options']
+        return options[0] if options else None
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        store_product = self.get_object()
+        store_product = self.object
+        detail = self.get_detail()
 
         # If we found a StoreProduct (product available in selected area), expose detailed context
         if store_product:
@@ -365,117 +297,61 @@ class ProductDetailView(DetailView):
             context['store_product'] = store_product
             context['product'] = store_product.product
 
-            selected_zip = self.request.session.get('selected_zip_code')
-            stores_in_area = Store.objects.filter(
-                zip_code=selected_zip,
-                is_active=True,
-                status='open'
-            )
-
-            # Get all available StoreProduct options for this product from different stores
-            available_store_products = StoreProduct.objects.filter(
-                store__in=stores_in_area,
-                product=store_product.product,
-                is_available=True
-            ).select_related('store').order_by('price')
-
-            context['available_stores'] = available_store_products
-            context['product_options'] = available_store_products
+            # All available StoreProduct options for this product from different stores (cheapest first)
+            context['available_stores'] = detail['options']
+            context['product_options'] = detail['options']
 
             # Derive availability from store-specific data (prefer store_product first)
-            try:
-                context['is_available'] = bool(
-                    store_product.availability_status == 'in_stock' and store_product.stock_quantity > 0
-                )
-            except Exception:
-                context['is_available'] = False
-
-            # Minimum price among available store options (if any)
-            first_opt = available_store_products.first()
-            context['min_price'] = first_opt.price if first_opt else None
-            # Debugging: log key values to help trace availability issues
-            try:
-                print('PRODUCT_DETAIL_DEBUG', 'slug=', store_product.product.slug, 'selected_zip=', selected_zip,
-                      'store_product_id=', store_product.id, 'stock=', getattr(store_product, 'stock_quantity', None),
-                      'availability=', getattr(store_product, 'availability_status', None))
-            except Exception:
-                pass
+            context['is_available'] = bool(
+                store_product.availability_status == 'in_stock' and store_product.stock_quantity > 0
+            )
+            context['min_price'] = store_product.price
 
-            # Get related products from all stores in the area
-            context['related_products'] = StoreProduct.objects.filter(
-                store__in=stores_in_area,
-                product__category=store_product.product.category,
-                is_available=True
-            ).exclude(product=store_product.product).select_related('product', 'store')[:4]
+            # Related products: cheapest offer per product in the same category across the area
+            context['related_products'] = detail['related_products']
 
-            # Get frequently bought together from all stores
-            context['frequently_bought'] = StoreProduct.objects.filter(
-                store__in=stores_in_area,
-                is_available=True,
-                product__category__in=[
-                    store_product.product.category,
-                ]
-            ).exclude(product=store_product.product).select_related('product', 'store')[:3]
+            ProductDetailService.log_sample(
+                'product_detail', slug=store_product.product.slug,
+                zip=self.request.session.get('selected_zip_code'),
+                store_product=store_product.id, stock=store_product.stock_quantity,
+                availability=store_product.availability_status, options=len(detail['options'])
+            )
         else:
-            # Fallback: try to render product-level information even if no StoreProduct is available
+            # Fallback: render product-level information even if no StoreProduct serves this ZIP
             product_slug = self.kwargs.get('product_slug')
-            try:
-                product = Product.objects.get(slug=product_slug)
-                context['product'] = product
-            except Product.DoesNotExist:
-                context['product'] = None
+            product = Product.objects.select_related('category').filter(slug=product_slug).first()
+            context['product'] = product
 
-            # No specific store_product; show any available store options for this product (ignoring zip)
-            try:
-                available_store_products = StoreProduct.objects.filter(
+            # Show any available store options for this product (ignoring zip)
+            available_store_products = list(
+                StoreProduct.objects.filter(
                     product__slug=product_slug,
                     is_available=True
-                ).select_related('store', 'product').order_by('price')
-                context['available_stores'] = available_store_products
-                context['product_options'] = available_store_products
-            except Exception:
-                available_store_products = StoreProduct.objects.none()
-                context['available_stores'] = StoreProduct.objects.none()
-                context['product_options'] = StoreProduct.objects.none()
-
-            # Derive availability by checking store options (ignore zip)
-            try:
-                context['is_available'] = available_store_products.filter(
-                    availability_status='in_stock',
-                    stock_quantity__gt=0
-                ).exists()
-            except Exception:
-                context['is_available'] = False
-
-            # Minimum price among these store options
-            first_opt = available_store_products.first() if hasattr(available_store_products, 'first') else None
-            context['min_price'] = first_opt.price if first_opt else None
-            # Debugging: log fallback values
-            try:
-                print('PRODUCT_DETAIL_DEBUG_FALLBACK', 'slug=', product_slug,
-                      'selected_zip=', self.request.session.get('selected_zip_code'),
-                      'available_count=', available_store_products.count(),
-                      'sample=', [
-                          (p.id, getattr(p, 'stock_quantity', None), getattr(p, 'availability_status', None), getattr(p, 'price', None))
-                          for p in available_store_products[:3]
-                      ])
-            except Exception:
-                pass
-
-            # Related/frequently bought based on product (if available)
-            if context.get('product'):
-                context['related_products'] = StoreProduct.objects.filter(
-                    product__category=context['product'].category,
-                    is_available=True
-                ).exclude(product=context['product']).select_related('product', 'store')[:4]
+                ).select_related('store', 'product').order_by('price', 'id')
+            )
+            context['available_stores'] = available_store_products
+            context['product_options'] = available_store_products
+            context['is_available'] = any(
+                option.availability_status == 'in_stock' and option.stock_quantity > 0
+                for option in available_store_products
+            )
+            context['min_price'] = available_store_products[0].price if available_store_products else None
 
-                context['frequently_bought'] = StoreProduct.objects.filter(
-                    product__category=context['product'].category,
-                    is_available=True
-                ).exclude(product=context['product']).select_related('product', 'store')[:3]
+            if product:
+                context['related_products'] = list(
+                    StoreProduct.objects.filter(
+                        product__category_id=product.category_id,
+                        is_available=True
+                    ).exclude(product=product).select_related('product', 'store')[:4]
+                )
             else:
-                context['related_products'] = StoreProduct.objects.none()
-                context['frequently_bought'] = StoreProduct.objects.none()
+                context['related_products'] = []
+
+            ProductDetailService.log_sample(
+                'product_detail_fallback', slug=product_slug,
+                zip=self.request.session.get('selected_zip_code'),
+                options=len(available_store_products)
+            )
 
         return context
 
@@ -532,26 +408,30 @@ class ProductDetailsAPIView(TemplateView):
             return JsonResponse({'error': 'Product not found'})
 
 class ProductSuggestionsAPIView(TemplateView):
+    """Typeahead completions served from in-memory per-store indexes"""
     def get(self, request, *args, **kwargs):
         query = request.GET.get('q', '')
         store_id = request.session.get('selected_store_id')
         
-        if not store_id or len(query) < 2:
-            return JsonResponse({'suggestions': []})
+        if store_id:
+            store_ids = [store_id]
+        else:
+            store_ids = ZipServiceResolver.get_store_ids(request.session.get('selected_zip_code'))
         
-        products = StoreProduct.objects.filter(
-            store_id=store_id,
-            product__name__icontains=query,
-            is_available=True
-        ).select_related('product')[:5]
+        try:
+            limit = int(request.GET.get('limit', 5))
+        except ValueError:
+            limit = 5
         
         suggestions = [
             {
-                'id': p.id,
-                'name': p.product.name,
-                'price': str(p.price)
+                'id': entry['id'],
+                'name': entry['name'],
+                'slug': entry['slug'],
+                'price': str(entry['price']),
+                'matched': entry.get('matched'),
             }
-            for p in products
+            for entry in TypeaheadService.complete(query, store_ids, limit=limit)
         ]
         
         return JsonResponse({'suggestions': suggestions})
@@ -570,4 +450,13 @@ class AddToCartAPIView(TemplateView):
 
 class FilterOptionsAPIView(TemplateView):
     def get(self, request, *args, **kwargs):
-        return JsonResponse({'filters': {}})
+        """Facets for the session ZIP (or ?zip_code=) and the listing's filter parameters"""
+        zip_code = request.GET.get('zip_code') or request.session.get('selected_zip_code')
+        if not zip_code:
+            return JsonResponse({'filters': {}, 'message': 'Please select a delivery location'}, status=400)
+        
+        filters = CatalogFacetService.filters_from_request(request.GET)
+        return JsonResponse({
+            'filters': CatalogFacetService.get_facets(zip_code, filters),
+            'applied': {key: value for key, value in filters.items() if value},
+        })
@@ -0,0 +1,50 @@
+"""
+In-process background execution
+
+Named thread pools for work that should leave the request thread but does
+not need a durable queue. Each task runs with its own database connection,
+which is closed when the task finishes.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_executors = {}
+_lock = threading.Lock()
+
+
+def get_executor(pool, max_workers=1):
+    with _lock:
+        executor = _executors.get(pool)
+        if executor is None:
+            executor = _executors[pool] = ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix=pool
+            )
+        return executor
+
+
+def _run(func, args, kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception(f"Background task {func.__qualname__} failed")
+    finally:
+        connection.close()
+
+
+def run_in_background(pool, func, *args, max_workers=1, **kwargs):
+    """Run func(*args, **kwargs) on the named pool; returns the Future"""
+    return get_executor(pool, max_workers).submit(_run, func, args, kwargs)
+
+
+def run_after_commit(pool, func, *args, max_workers=1, **kwargs):
+    """Queue func once the current transaction commits (immediately outside one)"""
+    transaction.on_commit(
+        lambda: run_in_background(pool, func, *args, max_workers=max_workers, **kwargs)
+    )
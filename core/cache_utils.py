@@ -0,0 +1,38 @@
+"""
+Utility functions for versioned cache namespaces
+
+A namespace owns a version token stored in the cache. Entries are keyed by
+that token, so bumping the version invalidates every entry in the namespace
+at once without having to track or delete individual keys.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def _version_key(namespace):
+    return f"cache_version:{namespace}"
+
+
+def get_cache_version(namespace):
+    """Return the current version token for a namespace, creating it if missing"""
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        version = time.time_ns()
+        # add() keeps a concurrently created token instead of overwriting it
+        if not cache.add(_version_key(namespace), version, timeout=None):
+            version = cache.get(_version_key(namespace), version)
+    return version
+
+
+def bump_cache_version(namespace):
+    """Invalidate every entry in a namespace by issuing a new version token"""
+    version = time.time_ns()
+    cache.set(_version_key(namespace), version, timeout=None)
+    return version
+
+
+def versioned_key(namespace, *parts):
+    """Build a cache key scoped to the current version of a namespace"""
+    suffix = ':'.join(str(part) for part in parts)
+    return f"{namespace}:{get_cache_version(namespace)}:{suffix}"
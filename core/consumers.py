@@ -14,6 +14,10 @@ from django.utils import timezone
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
+# Large stock batches go here once instead of to one group per product;
+# product subscribers filter the rows they follow (StockUpdateConsumer.stock_bulk)
+STOCK_BULK_GROUP = 'stock_bulk'
+
 
 class StockUpdateConsumer(AsyncWebsocketConsumer):
     """WebSocket consumer for real-time stock updates"""
@@ -21,6 +25,7 @@ class StockUpdateConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.store_id = self.scope['url_route']['kwargs'].get('store_id')
         self.product_id = self.scope['url_route']['kwargs'].get('product_id')
+        self.product_ids = set()
         
         # Join group based on store or product
         if self.store_id:
@@ -35,6 +40,8 @@ class StockUpdateConsumer(AsyncWebsocketConsumer):
             self.group_name,
             self.channel_name
         )
+        if self.product_id:
+            await self.follow_product(self.product_id)
         
         await self.accept()
         logger.info(f"StockUpdate WebSocket connected: {self.group_name}")
@@ -45,8 +52,21 @@ class StockUpdateConsumer(AsyncWebsocketConsumer):
             self.group_name,
             self.channel_name
         )
+        if self.product_ids:
+            await self.channel_layer.group_discard(STOCK_BULK_GROUP, self.channel_name)
         logger.info(f"StockUpdate WebSocket disconnected: {self.group_name}")
     
+    async def follow_product(self, product_id):
+        """Also receive large batches, filtered to the followed products"""
+        if not self.product_ids:
+            await self.channel_layer.group_add(STOCK_BULK_GROUP, self.channel_name)
+        self.product_ids.add(int(product_id))
+    
+    async def unfollow_product(self, product_id):
+        self.product_ids.discard(int(product_id))
+        if not self.product_ids:
+            await self.channel_layer.group_discard(STOCK_BULK_GROUP, self.channel_name)
+    
     async def receive(self, text_data):
         """Handle messages from WebSocket client"""
         try:
@@ -59,6 +79,7 @@ class StockUpdateConsumer(AsyncWebsocketConsumer):
                 if product_id:
                     product_group = f'stock_product_{product_id}'
                     await self.channel_layer.group_add(product_group, self.channel_name)
+                    await self.follow_product(product_id)
                     await self.send(text_data=json.dumps({
                         'type': 'subscription_confirmed',
                         'product_id': product_id
@@ -70,12 +91,13 @@ class StockUpdateConsumer(AsyncWebsocketConsumer):
                 if product_id:
                     product_group = f'stock_product_{product_id}'
                     await self.channel_layer.group_discard(product_group, self.channel_name)
+                    await self.unfollow_product(product_id)
                     await self.send(text_data=json.dumps({
                         'type': 'unsubscription_confirmed',
                         'product_id': product_id
                     }))
             
-        except json.JSONDecodeError:
+        except (json.JSONDecodeError, TypeError, ValueError):
             await self.send(text_data=json.dumps({
                 'type': 'error',
                 'message': 'Invalid JSON data'
@@ -93,6 +115,20 @@ class StockUpdateConsumer(AsyncWebsocketConsumer):
             'timestamp': event['timestamp']
         }))
     
+    async def stock_batch(self, event):
+        """Coalesced stock changes: rows of [product_id, store_id, stock_quantity, is_available]"""
+        await self.send(text_data=json.dumps({
+            'type': 'stock_batch',
+            'changes': event['changes'],
+            'timestamp': event['timestamp']
+        }, separators=(',', ':')))
+    
+    async def stock_bulk(self, event):
+        """A large batch sent once for every product subscriber: forward the followed rows"""
+        changes = [change for change in event['changes'] if change[0] in self.product_ids]
+        if changes:
+            await self.stock_batch({'changes': changes, 'timestamp': event['timestamp']})
+    
     async def low_stock_alert(self, event):
         """Send low stock alert to WebSocket client"""
         await self.send(text_data=json.dumps({
@@ -105,6 +141,46 @@ class StockUpdateConsumer(AsyncWebsocketConsumer):
         }))
 
 
+class ImportJobConsumer(AsyncWebsocketConsumer):
+    """WebSocket consumer for CSV import job progress"""
+    
+    async def connect(self):
+        self.job_id = self.scope['url_route']['kwargs']['job_id']
+        self.group_name = f'import_job_{self.job_id}'
+        
+        user = self.scope['user']
+        if not user.is_authenticated or not await self.can_view_job(user, self.job_id):
+            await self.close()
+            return
+        
+        await self.channel_layer.group_add(
+            self.group_name,
+            self.channel_name
+        )
+        await self.accept()
+    
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(
+            self.group_name,
+            self.channel_name
+        )
+    
+    @database_sync_to_async
+    def can_view_job(self, user, job_id):
+        from catalog.models import ImportJob
+        jobs = ImportJob.objects.filter(pk=job_id)
+        if not user.is_staff:
+            jobs = jobs.filter(store__owner=user)
+        return jobs.exists()
+    
+    async def import_job_update(self, event):
+        """Send job progress to WebSocket client"""
+        await self.send(text_data=json.dumps({
+            'type': 'import_job_update',
+            'job': event['job']
+        }))
+
+
 class OrderTrackingConsumer(AsyncWebsocketConsumer):
     """WebSocket consumer for real-time order tracking"""
     
@@ -609,6 +685,23 @@ async def send_stock_update(product_id, store_id, stock_quantity, is_available,
     await channel_layer.group_send('stock_global', update_data)
 
 
+async def send_stock_batch(changes_by_group, frame_size=500):
+    """Send coalesced stock changes ({group: [row, ...]}) in frames of at most frame_size rows"""
+    from channels.layers import get_channel_layer
+    from django.utils import timezone
+    
+    channel_layer = get_channel_layer()
+    timestamp = timezone.now().isoformat()
+    
+    for group, changes in changes_by_group.items():
+        for start in range(0, len(changes), frame_size):
+            await channel_layer.group_send(group, {
+                'type': 'stock_bulk' if group == STOCK_BULK_GROUP else 'stock_batch',
+                'changes': changes[start:start + frame_size],
+                'timestamp': timestamp
+            })
+
+
 async def send_order_update(order_id, status, message=None, estimated_delivery=None):
     """Send order status update to connected clients"""
     from channels.layers import get_channel_layer
@@ -647,3 +740,15 @@ async def send_delivery_update(delivery_id, status, location=None, estimated_arr
         update_data['estimated_arrival'] = estimated_arrival
     
     await channel_layer.group_send(f'delivery_{delivery_id}', update_data)
+
+
+async def send_import_job_update(job_id, job):
+    """Send import job progress to clients watching the job"""
+    from channels.layers import get_channel_layer
+    
+    channel_layer = get_channel_layer()
+    
+    await channel_layer.group_send(f'import_job_{job_id}', {
+        'type': 'import_job_update',
+        'job': job
+    })
@@ -10,11 +10,11 @@ def global_context(request):
     
     # Add global categories for navigation (available for all users)
     try:
-        from catalog.models import Category
-        context['global_categories'] = Category.objects.filter(
-            is_active=True,
-            parent=None
-        ).prefetch_related('subcategories').order_by('sort_order', 'name')[:8]  # Limit to 8 main categories
+        from catalog.services_categories import CategoryTreeService
+        tree = CategoryTreeService.get_tree()
+        context['global_categories'] = [
+            tree.instance(node.id) for node in tree.roots()[:8]  # Limit to 8 main categories
+        ]
     except:
         context['global_categories'] = []
     
@@ -64,17 +64,10 @@ def global_context(request):
     if selected_zip:
         try:
             # Import here to avoid circular imports
-            from locations.models import ZipArea
-            from stores.models import Store
+            from stores.services import ZipServiceResolver
             
-            zip_area = ZipArea.objects.get(zip_code=selected_zip, is_active=True)
-            available_stores = Store.objects.filter(
-                zip_coverage__zip_area=zip_area,
-                is_active=True,
-                status='open'
-            ).distinct()
-            context['available_stores'] = available_stores
-            context['zip_area'] = zip_area
+            context['available_stores'] = ZipServiceResolver.get_stores(selected_zip)
+            context['zip_area'] = ZipServiceResolver.get_zip_area(selected_zip)
         except:
             context['available_stores'] = []
             context['zip_area'] = None
@@ -121,10 +114,9 @@ def admin_context(request):
             })
             
             # Get categories for dynamic navigation
-            context['all_categories'] = Category.objects.filter(
-                is_active=True,
-                parent=None
-            ).prefetch_related('subcategories').order_by('sort_order', 'name')
+            from catalog.services_categories import CategoryTreeService
+            tree = CategoryTreeService.get_tree()
+            context['all_categories'] = [tree.instance(node.id) for node in tree.roots()]
             
         except Exception as e:
             # Fallback to zero values if there's an error
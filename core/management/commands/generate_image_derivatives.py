@@ -0,0 +1,36 @@
+"""
+Management command to backfill WebP/JPEG derivatives for uploaded images
+"""
+from django.core.management.base import BaseCommand
+from core.services_images import IMAGE_FIELDS, ImageDerivativeService
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG derivatives for images that have none (or all, with --force)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild manifests even when they are up to date',
+        )
+        parser.add_argument(
+            '--model',
+            type=str,
+            help='Only process one model label, e.g. catalog.Product',
+        )
+
+    def handle(self, *args, **options):
+        fields = IMAGE_FIELDS
+        if options['model']:
+            fields = [(label, field) for label, field in IMAGE_FIELDS if label.lower() == options['model'].lower()]
+            if not fields:
+                labels = ', '.join(sorted({label for label, _field in IMAGE_FIELDS}))
+                self.stdout.write(self.style.ERROR(f"Unknown model {options['model']}; choose from {labels}"))
+                return
+
+        for label, field_name in fields:
+            checked, rebuilt = ImageDerivativeService.backfill(label, field_name, force=options['force'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{label}.{field_name}: {checked} images checked, {rebuilt} manifests rebuilt'
+            ))
@@ -0,0 +1,248 @@
+"""
+Keyset (cursor) pagination
+
+Pages are addressed by an opaque cursor that encodes the sort key values
+and tie-breaker ID of the row at the page boundary, so fetching any page
+is a bounded index range scan instead of OFFSET + full COUNT(*). Totals
+are served from a short-lived cached count.
+"""
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist
+from django.db.models import Q
+from django.utils.functional import cached_property
+import base64
+import datetime
+import decimal
+import hashlib
+import json
+import math
+
+CURSOR_PARAM = 'cursor'
+COUNT_CACHE_TIMEOUT = 60
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def approximate_count(queryset, timeout=COUNT_CACHE_TIMEOUT):
+    """COUNT(*) for a queryset, cached briefly by its SQL"""
+    try:
+        sql, params = queryset.order_by().query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+
+    digest = hashlib.md5(f'{sql}|{params}'.encode()).hexdigest()
+    cache_key = f'approx_count:{digest}'
+    count = cache.get(cache_key)
+    if count is None:
+        count = queryset.count()
+        cache.set(cache_key, count, timeout=timeout)
+    return count
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by a fixed ordering whose last element is a unique
+    tie-breaker (normally 'id' or '-id'), e.g. ('-price', 'id').
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        if not ordering:
+            raise ValueError("KeysetPaginator requires an ordering")
+        self.ordering = tuple(ordering)
+        self.per_page = int(per_page)
+        self.queryset = queryset.order_by(*self.ordering)
+
+    @cached_property
+    def count(self):
+        return approximate_count(self.queryset)
+
+    @cached_property
+    def num_pages(self):
+        return max(1, math.ceil(self.count / self.per_page))
+
+    # Cursor encoding
+
+    def encode_cursor(self, obj, direction):
+        values = [_encode_value(self._get_value(obj, field.lstrip('-'))) for field in self.ordering]
+        payload = json.dumps({'v': values, 'd': direction}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            values, direction = payload['v'], payload['d']
+        except (ValueError, KeyError, TypeError):
+            raise InvalidCursor("Malformed cursor")
+
+        if direction not in ('next', 'prev') or len(values) != len(self.ordering):
+            raise InvalidCursor("Cursor does not match this listing")
+        return [self._to_python(field.lstrip('-'), value)
+                for field, value in zip(self.ordering, values)], direction
+
+    @staticmethod
+    def _get_value(obj, path):
+        value = obj
+        for part in path.split('__'):
+            value = getattr(value, part)
+        return value
+
+    def _to_python(self, path, value):
+        """Restore a cursor value using the model field along the lookup path"""
+        model = self.queryset.model
+        field = None
+        try:
+            for part in path.split('__'):
+                field = model._meta.get_field(part)
+                model = field.related_model or model
+            if field.is_relation:
+                field = field.target_field
+            return field.to_python(value)
+        except FieldDoesNotExist:
+            # Annotations (e.g. search_rank) round-trip as plain JSON values
+            return value
+
+    # Page building
+
+    def _boundary_filter(self, values, reverse):
+        """
+        Rows strictly after the boundary row in (possibly reversed) ordering:
+        (a > va) OR (a = va AND b > vb) OR ...
+        """
+        condition = Q()
+        equal_so_far = {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            condition |= Q(**equal_so_far, **{f'{name}__{lookup}': value})
+            equal_so_far[name] = value
+        return condition
+
+    def get_page(self, cursor=None):
+        values, direction = None, 'next'
+        if cursor:
+            try:
+                values, direction = self.decode_cursor(cursor)
+            except InvalidCursor:
+                values, direction = None, 'next'
+
+        reverse = direction == 'prev'
+        queryset = self.queryset
+        if reverse:
+            queryset = queryset.reverse()
+        if values is not None:
+            queryset = queryset.filter(self._boundary_filter(values, reverse))
+
+        # One extra row tells us whether another page exists in this direction
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            has_next, has_previous = values is not None, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        return KeysetPage(rows, self, has_next, has_previous)
+
+
+class KeysetPage:
+    """Page of results with cursors to the neighbouring pages"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_query = ''
+        self.previous_query = ''
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[-1], 'next')
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[0], 'prev')
+        return None
+
+    def build_queries(self, query_dict, param=CURSOR_PARAM):
+        """Set next_query/previous_query to the current GET params with cursors swapped in"""
+        for attr, cursor in (('next_query', self.next_cursor), ('previous_query', self.previous_cursor)):
+            if cursor:
+                params = query_dict.copy()
+                params.pop('page', None)
+                params[param] = cursor
+                setattr(self, attr, params.urlencode())
+
+
+def is_cursor_request(request, param=CURSOR_PARAM):
+    """Cursor mode is opt-in: the parameter only has to be present (may be empty)"""
+    return param in request.GET
+
+
+def get_cursor_page(request, queryset, per_page, ordering, param=CURSOR_PARAM):
+    """Keyset page for function-based views, with navigation queries prepared"""
+    paginator = KeysetPaginator(queryset, per_page, ordering)
+    page = paginator.get_page(request.GET.get(param))
+    page.build_queries(request.GET, param)
+    return page
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin adding an opt-in ?cursor= mode. Without the parameter the
+    view keeps its normal page-number pagination.
+    """
+    keyset_ordering = ('-created_at', '-id')
+    cursor_param = CURSOR_PARAM
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        if not is_cursor_request(self.request, self.cursor_param):
+            return super().paginate_queryset(queryset, page_size)
+
+        page = get_cursor_page(
+            self.request, queryset, page_size, self.get_keyset_ordering(), self.cursor_param
+        )
+        return (page.paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cursor_mode'] = is_cursor_request(self.request, self.cursor_param)
+        return context
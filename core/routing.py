@@ -0,0 +1,9 @@
+from django.urls import re_path
+from . import consumers
+
+websocket_urlpatterns = [
+    re_path(r'ws/stock/$', consumers.StockUpdateConsumer.as_asgi()),
+    re_path(r'ws/stock/store/(?P<store_id>\d+)/$', consumers.StockUpdateConsumer.as_asgi()),
+    re_path(r'ws/stock/product/(?P<product_id>\d+)/$', consumers.StockUpdateConsumer.as_asgi()),
+    re_path(r'ws/imports/(?P<job_id>\d+)/$', consumers.ImportJobConsumer.as_asgi()),
+]
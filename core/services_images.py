@@ -0,0 +1,184 @@
+"""
+Image Derivative Services
+Pre-generated, resized WebP and JPEG copies of uploaded images.
+
+Every registered ImageField has a sibling `<field>_derivatives` JSONField
+holding a manifest of its derivatives:
+
+    {"source": "products/prawns.jpg", "hash": "3f1c9a02b7de",
+     "sizes": {"card": {"width": 320, "height": 240,
+                        "webp": "products/prawns.card.3f1c9a02b7de.webp",
+                        "jpeg": "products/prawns.card.3f1c9a02b7de.jpg"}, ...}}
+
+Derivatives are written next to the original, named after the original's
+content hash, so they can be cached forever and a re-upload never serves a
+stale copy. Saves schedule generation on a background pool after commit;
+the `generate_image_derivatives` command backfills existing media. Until a
+manifest matches the current file, templates fall back to the original.
+"""
+from io import BytesIO
+import hashlib
+import logging
+import os
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+
+from core.background import run_after_commit
+
+logger = logging.getLogger(__name__)
+
+# Longest side in pixels; smaller originals are never upscaled
+DERIVATIVE_SIZES = {
+    'card': 320,
+    'detail': 800,
+    'zoom': 1600,
+}
+
+DERIVATIVE_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# (model label, image field); the manifest lives in `<field>_derivatives`
+IMAGE_FIELDS = [
+    ('catalog.Category', 'image'),
+    ('catalog.Product', 'image'),
+    ('catalog.ProductImage', 'image'),
+    ('stores.Store', 'logo'),
+    ('stores.Store', 'banner_image'),
+]
+
+
+def manifest_field(field_name):
+    return f'{field_name}_derivatives'
+
+
+def current_manifest(instance, field_name):
+    """The field's manifest if it was built from the file currently set (else {})"""
+    field_file = getattr(instance, field_name)
+    manifest = getattr(instance, manifest_field(field_name), None) or {}
+    if not field_file or manifest.get('source') != field_file.name:
+        return {}
+    return manifest
+
+
+def derivative_url(instance, field_name, size='card', image_format='jpeg'):
+    """URL of one derivative, falling back to the original (None without an image)"""
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        return None
+    derivative = current_manifest(instance, field_name).get('sizes', {}).get(size)
+    if derivative and derivative.get(image_format):
+        return field_file.storage.url(derivative[image_format])
+    return field_file.url
+
+
+def srcset(instance, field_name, image_format='jpeg'):
+    """`srcset` value listing every derivative width ('' when none exist yet)"""
+    field_file = getattr(instance, field_name)
+    sizes = current_manifest(instance, field_name).get('sizes', {})
+    return ', '.join(
+        f"{field_file.storage.url(derivative[image_format])} {derivative['width']}w"
+        for derivative in sorted(sizes.values(), key=lambda derivative: derivative['width'])
+        if derivative.get(image_format)
+    )
+
+
+class ImageDerivativeService:
+    """Builds derivative manifests and keeps them in sync with uploads"""
+    POOL = 'image-derivatives'
+
+    @classmethod
+    def schedule(cls, instance, field_name):
+        """Queue generation if the field's file has no up-to-date manifest"""
+        field_file = getattr(instance, field_name)
+        manifest = getattr(instance, manifest_field(field_name)) or {}
+        if (field_file.name or None) == (manifest.get('source') or None):
+            return
+        run_after_commit(cls.POOL, cls.refresh, instance._meta.label, instance.pk, field_name)
+
+    @classmethod
+    def refresh(cls, model_label, pk, field_name, force=False):
+        """(Re)build one instance's manifest; returns True if it was rewritten"""
+        model = apps.get_model(model_label)
+        instance = model.objects.filter(pk=pk).only('pk', field_name, manifest_field(field_name)).first()
+        if instance is None:
+            return False
+
+        field_file = getattr(instance, field_name)
+        manifest = getattr(instance, manifest_field(field_name)) or {}
+        if not force and (field_file.name or None) == (manifest.get('source') or None):
+            return False
+
+        rows = model.objects.filter(pk=pk)
+        if field_file:
+            new_manifest = cls.generate(field_file)
+            # Skip the write if the image was replaced meanwhile; that save queued its own refresh
+            rows = rows.filter(**{field_name: field_file.name})
+        else:
+            new_manifest = {}
+        # Only the manifest column: a full save would re-enter the post_save signals
+        rows.update(**{manifest_field(field_name): new_manifest})
+        return True
+
+    @staticmethod
+    def generate(field_file):
+        """Write the derivatives of one image file; returns its manifest ({} if unreadable)"""
+        from PIL import Image, ImageOps, UnidentifiedImageError
+
+        storage = field_file.storage
+        try:
+            with field_file.open('rb') as source:
+                data = source.read()
+            original = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+            original.load()
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+            logger.warning(f"Cannot build derivatives for {field_file.name}: {str(e)}")
+            return {}
+
+        content_hash = hashlib.sha1(data).hexdigest()[:12]
+        base, _ext = os.path.splitext(field_file.name)
+        manifest = {'source': field_file.name, 'hash': content_hash, 'sizes': {}}
+
+        for size, max_side in sorted(DERIVATIVE_SIZES.items(), key=lambda item: item[1]):
+            resized = original.copy()
+            resized.thumbnail((max_side, max_side), Image.LANCZOS)
+            derivative = {'width': resized.width, 'height': resized.height}
+
+            for image_format, (pil_format, extension, options) in DERIVATIVE_FORMATS.items():
+                name = f"{base}.{size}.{content_hash}.{extension}"
+                if not storage.exists(name):
+                    image = resized
+                    if pil_format == 'JPEG' and image.mode != 'RGB':
+                        # JPEG has no alpha: flatten transparent images onto white
+                        background = Image.new('RGB', image.size, (255, 255, 255))
+                        rgba = image.convert('RGBA')
+                        background.paste(rgba, mask=rgba.getchannel('A'))
+                        image = background
+                    elif image.mode not in ('RGB', 'RGBA'):
+                        image = image.convert('RGBA')
+                    buffer = BytesIO()
+                    image.save(buffer, pil_format, **options)
+                    name = storage.save(name, ContentFile(buffer.getvalue()))
+                derivative[image_format] = name
+
+            manifest['sizes'][size] = derivative
+            # Larger sizes would only repeat the original's resolution
+            if max(original.size) <= max_side:
+                break
+
+        return manifest
+
+    @classmethod
+    def backfill(cls, model_label, field_name, force=False):
+        """Generate missing (or, with force, all) manifests for one field; returns (checked, rebuilt)"""
+        model = apps.get_model(model_label)
+        rows = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+
+        checked = rebuilt = 0
+        for pk in list(rows.values_list('pk', flat=True)):
+            checked += 1
+            if cls.refresh(model_label, pk, field_name, force=force):
+                rebuilt += 1
+        return checked, rebuilt
@@ -0,0 +1,58 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from core.services_images import current_manifest, derivative_url, srcset
+
+register = template.Library()
+
+# Default `sizes` hints per derivative the layout is built around
+DEFAULT_SIZES = {
+    'card': '(max-width: 576px) 50vw, 320px',
+    'detail': '(max-width: 992px) 100vw, 800px',
+    'zoom': '100vw',
+}
+
+
+@register.simple_tag
+def responsive_image(instance, field_name='image', size='card', alt='', sizes=None, **attrs):
+    """
+    <picture> with WebP and JPEG srcsets of an image's derivatives, or a
+    plain <img> of the original until they exist. Extra keyword arguments
+    become <img> attributes (use css_class for class).
+    """
+    if instance is None or not getattr(instance, field_name):
+        return ''
+
+    if 'css_class' in attrs:
+        attrs['class'] = attrs.pop('css_class')
+    attrs.setdefault('loading', 'lazy')
+    extra = format_html_join('', ' {}="{}"', attrs.items())
+    src = derivative_url(instance, field_name, size)
+
+    if not current_manifest(instance, field_name):
+        return format_html('<img src="{}" alt="{}"{}>', src, alt, extra)
+
+    sizes = sizes or DEFAULT_SIZES.get(size, '100vw')
+    return format_html(
+        '<picture style="display: contents">'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}"{}>'
+        '</picture>',
+        srcset(instance, field_name, 'webp'), sizes,
+        src, srcset(instance, field_name, 'jpeg'), sizes, alt, extra
+    )
+
+
+@register.simple_tag
+def image_url(instance, field_name='image', size='card', image_format='jpeg'):
+    """URL of one derivative (the original until derivatives exist)"""
+    if instance is None:
+        return ''
+    return derivative_url(instance, field_name, size, image_format) or ''
+
+
+@register.simple_tag
+def image_srcset(instance, field_name='image', image_format='webp'):
+    if instance is None or not getattr(instance, field_name):
+        return ''
+    return srcset(instance, field_name, image_format)
@@ -9,7 +9,9 @@ import uuid
 import json
 from locations.models import ZipArea
 from stores.models import Store, StoreZipCoverage
-from catalog.models import Category, Product, StoreProduct
+from stores.services import ZipServiceResolver
+from catalog.models import Category, Product
+from catalog.services_listing import ZipCatalogService
 from .models import FAQ, FAQCategory, ChatConversation, ChatMessage, BotResponse, ContactMessage
 from .chat_views import FAQListView, chat_start, chat_messages, chat_close
 from django import forms
@@ -35,7 +37,9 @@ class HomeView(TemplateView):
         
         if selected_zip:
             try:
-                zip_area = ZipArea.objects.get(zip_code=selected_zip, is_active=True)
+                zip_area = ZipServiceResolver.get_zip_area(selected_zip)
+                if zip_area is None:
+                    raise ZipArea.DoesNotExist
                 
                 # Find the best store for this ZIP (Blinkit-style automatic selection)
                 best_store = self.get_best_store_for_zip(zip_area)
@@ -44,36 +48,26 @@ class HomeView(TemplateView):
                     # Store the selected store in session for seamless experience
                     self.request.session['selected_store_id'] = best_store.id
                     
-                    # Get featured products from the selected store
-                    featured_products = StoreProduct.objects.filter(
-                        store=best_store,
-                        is_featured=True,
-                        is_available=True,
-                        availability_status='in_stock'
-                    ).select_related('product', 'store')[:12]
+                    # Product rails come from the materialized per-ZIP listing (cheapest offer per product)
+                    user = self.request.user if self.request.user.is_authenticated else None
+                    entries = ZipCatalogService.with_store_products(
+                        ZipCatalogService.entries_for_zip(zip_area, ZipServiceResolver.get_store_ids(selected_zip)),
+                        user=user
+                    )
                     
-                    # Get fresh arrivals (recently added products)
-                    fresh_arrivals = StoreProduct.objects.filter(
-                        store=best_store,
-                        is_available=True,
-                        availability_status='in_stock'
-                    ).select_related('product', 'product__category', 'store').order_by('-created_at')[:8]
+                    featured_products = ZipCatalogService.store_products(
+                        entries.filter(is_featured=True).order_by('product_name', 'id')[:12]
+                    )
                     
-                    # Get best sellers - first try featured products, then fall back to any available
-                    best_sellers = StoreProduct.objects.filter(
-                        store=best_store,
-                        is_available=True,
-                        availability_status='in_stock',
-                        is_featured=True
-                    ).select_related('product', 'product__category', 'store').order_by('-updated_at')[:8]
+                    # Get fresh arrivals (recently added products)
+                    fresh_arrivals = ZipCatalogService.store_products(
+                        entries.order_by('-listed_at', '-id')[:8]
+                    )
                     
-                    # If no featured products, get any available products as best sellers
-                    if not best_sellers:
-                        best_sellers = StoreProduct.objects.filter(
-                            store=best_store,
-                            is_available=True,
-                            availability_status='in_stock'
-                        ).select_related('product', 'product__category', 'store').order_by('-updated_at')[:8]
+                    # Best sellers by order popularity; featured products first when nothing has sold yet
+                    best_sellers = ZipCatalogService.store_products(
+                        entries.order_by('-popularity_score', '-is_featured', 'product_name')[:8]
+                    )
                     
                     # Get all active categories for now (simplified)
                     categories = Category.objects.filter(
@@ -142,31 +136,12 @@ class HomeView(TemplateView):
         2. Currently open stores
         3. Store with best delivery time/rating (can be enhanced)
         """
-        available_stores = Store.objects.filter(
-            zip_coverages__zip_area=zip_area,
-            zip_coverages__is_active=True,
-            is_active=True,
-            status='open'
-        ).select_related().order_by('name')  # Can add ordering by rating, delivery time, etc.
-        
-        # Return the first available store (can be enhanced with better logic)
-        for store in available_stores:
-            if store.is_open:  # Uses the is_open property that checks business hours
-                return store
-        
-        return None
+        # Candidate stores come pre-ordered from the shared ZIP resolution cache
+        return ZipServiceResolver.get_best_store(zip_area.zip_code)
     
     def get_delivery_info(self, store, zip_area):
         """Get delivery information for the store-ZIP combination"""
-        try:
-            coverage = StoreZipCoverage.objects.get(store=store, zip_area=zip_area)
-            return {
-                'delivery_fee': coverage.get_delivery_fee(),
-                'min_order_value': coverage.get_min_order_value(),
-                'delivery_time': coverage.get_delivery_time(),
-            }
-        except StoreZipCoverage.DoesNotExist:
-            return None
+        return ZipServiceResolver.get_coverage(zip_area.zip_code, store.id)
     
     def get_next_delivery_slot(self, store, zip_area):
         """Get the next available delivery slot for the store-ZIP combination"""
@@ -0,0 +1,7 @@
+try:
+    from .celery import app as celery_app
+except ImportError:
+    # Celery is only required when background jobs run on the 'celery' backend
+    celery_app = None
+
+__all__ = ('celery_app',)
@@ -18,13 +18,14 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'meat_seafood.settings')
 # is populated before importing code that may import ORM models.
 django_asgi_app = get_asgi_application()
 
-from chat.routing import websocket_urlpatterns
+from chat.routing import websocket_urlpatterns as chat_websocket_urlpatterns
+from core.routing import websocket_urlpatterns as core_websocket_urlpatterns
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(
-            websocket_urlpatterns
+            chat_websocket_urlpatterns + core_websocket_urlpatterns
         )
     ),
 })
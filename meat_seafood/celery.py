@@ -0,0 +1,12 @@
+"""
+Celery application for background jobs (`celery -A meat_seafood worker`)
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'meat_seafood.settings')
+
+app = Celery('meat_seafood')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -289,6 +289,27 @@ LOGGING = {
     },
 }
 
+# Fraction of product detail requests that emit a structured debug log record
+PRODUCT_DETAIL_LOG_SAMPLE_RATE = 0.01
+
+# Background CSV imports: 'thread' runs them in a local worker pool, 'celery' queues them
+# (run `celery -A meat_seafood worker`)
+CATALOG_IMPORT_BACKEND = config('CATALOG_IMPORT_BACKEND', default='thread')
+CATALOG_IMPORT_WORKERS = config('CATALOG_IMPORT_WORKERS', default=2, cast=int)
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default=REDIS_URL)
+
+# Checkout stock holds: quantities in a customer's checkout are set aside for this long
+# and count against available stock for everyone else (0 disables holds)
+CATALOG_STOCK_HOLD_MINUTES = config('CATALOG_STOCK_HOLD_MINUTES', default=10, cast=int)
+
+# Periodic jobs for `celery -A meat_seafood beat` (or cron the matching management commands)
+CELERY_BEAT_SCHEDULE = {
+    'release-expired-stock-holds': {
+        'task': 'catalog.release_expired_stock_holds',
+        'schedule': 60.0,
+    },
+}
+
 # Create logs directory if it doesn't exist
 os.makedirs(BASE_DIR / 'logs', exist_ok=True)
 
@@ -21,11 +21,12 @@ from django.utils import timezone
 from datetime import timedelta
 import json
 
+from core.pagination import KeysetPaginationMixin
 from .models import Order, OrderStatusHistory
 from .services import OrderStatusService, OrderWorkflowService, OrderAnalyticsService
 
 
-class OrderManagementView(LoginRequiredMixin, ListView):
+class OrderManagementView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """Enhanced order list view with filtering and management capabilities"""
     model = Order
     template_name = 'orders/order_management.html'
@@ -72,7 +73,7 @@ class OrderManagementView(LoginRequiredMixin, ListView):
         if date_to:
             queryset = queryset.filter(created_at__lte=date_to)
         
-        return queryset.order_by('-created_at')
+        return queryset.order_by('-created_at', '-id')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
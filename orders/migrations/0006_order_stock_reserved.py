@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_order_customer_delivery_confirmed_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_reserved',
+            field=models.BooleanField(default=False, help_text='Item quantities are currently deducted from store stock'),
+        ),
+    ]
@@ -142,6 +142,9 @@ class Order(TimeStampedModel):
     payment_id = models.CharField(max_length=100, blank=True, null=True)
     payment_details = models.JSONField(default=dict, blank=True)
     
+    # Inventory
+    stock_reserved = models.BooleanField(default=False, help_text="Item quantities are currently deducted from store stock")
+    
     # Notes
     customer_notes = models.TextField(blank=True, null=True)
     store_notes = models.TextField(blank=True, null=True)
@@ -288,6 +291,10 @@ class Order(TimeStampedModel):
             self.status = 'cancelled'
             self.save()
             
+            # Return the reserved items to the store's stock
+            from catalog.services_stock import StockReservationService
+            StockReservationService.release_order(self)
+            
             # Create status history entry
             OrderStatusHistory.objects.create(
                 order=self,
@@ -63,6 +63,14 @@ class OrderStatusService:
                 if order.payment_status != 'paid' and order.payment_method != 'cod':
                     return False, f"Payment must be completed before moving to {new_status}"
             
+            # Orders released after a failed payment hold no stock: take it again
+            if new_status == 'confirmed' and not order.stock_reserved:
+                from catalog.services_stock import InsufficientStock, StockReservationService
+                try:
+                    StockReservationService.reserve_order(order)
+                except InsufficientStock as e:
+                    return False, f"Cannot confirm order: {str(e)}"
+            
             # Store old status for history
             old_status = order.status
             
@@ -78,6 +86,10 @@ class OrderStatusService:
             # Save the order
             order.save()
             
+            if new_status == 'cancelled':
+                from catalog.services_stock import StockReservationService
+                StockReservationService.release_order(order)
+            
             # Handle automatic agent assignment for packed orders
             if new_status == 'packed':
                 assignment = cls._auto_assign_delivery_agent(order)
@@ -236,6 +248,16 @@ class OrderWorkflowService:
                 order.payment_details = payment_details
             order.save()
             
+            # A retry after a failed payment: take the stock again
+            if not order.stock_reserved and order.status == 'placed':
+                from catalog.services_stock import InsufficientStock, StockReservationService
+                try:
+                    StockReservationService.reserve_order(order)
+                except InsufficientStock as e:
+                    # Paid but no longer fillable: leave it placed for the store to refund or adjust
+                    cls._hold_for_stock_review(order, e)
+                    return True, "Payment received; order is awaiting store review"
+            
             # Auto-confirm if order is still placed
             if order.status == 'placed':
                 OrderStatusService.update_order_status(
@@ -260,9 +282,13 @@ class OrderWorkflowService:
                 order.payment_details = error_details
             order.save()
             
+            # Don't keep scarce stock locked behind an unpaid order
+            from catalog.services_stock import StockReservationService
+            StockReservationService.release_order(order)
+            
             # Send notification to customer
-            from core.services_notifications import NotificationService
-            NotificationService.notify_payment_failed(order.user, order)
+            from core.services_notifications import send_order_notification
+            send_order_notification(order, 'payment_reminder')
             
             logger.warning(f"Payment failed for order {order.order_number}")
             return True, "Payment failure handled"
@@ -270,6 +296,28 @@ class OrderWorkflowService:
         except Exception as e:
             logger.error(f"Failed to handle payment failure for order {order.order_number}: {str(e)}")
             return False, str(e)
+    
+    @classmethod
+    def _hold_for_stock_review(cls, order, shortage):
+        """Flag a paid order whose stock ran out for a refund or store review"""
+        from django.urls import reverse
+        from core.services_notifications import PushNotificationService
+        
+        note = f"Paid but not confirmed - refund or adjust the order. {str(shortage)}"
+        order.store_notes = f"{order.store_notes}\n{note}" if order.store_notes else note
+        order.save(update_fields=['store_notes'])
+        
+        logger.warning(f"Paid order {order.order_number} held for store review: {str(shortage)}")
+        PushNotificationService().send_notification_to_user(
+            user=order.store.owner,
+            notification_type='stock_low',
+            context={
+                'order_number': order.order_number,
+                'store_name': order.store.name,
+                'product_names': ', '.join(item['product_name'] for item in shortage.shortages),
+                'url': reverse('stores:order_detail', args=[order.order_number]),
+            }
+        )
 
 
 class OrderAnalyticsService:
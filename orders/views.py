@@ -9,6 +9,7 @@ from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 from django.contrib import messages
+from django.db import transaction
 from django.db.models import Avg
 import logging
 import json
@@ -16,9 +17,11 @@ from decimal import Decimal
 
 from .models import Cart, CartItem, Order, OrderItem
 from catalog.models import StoreProduct
+from catalog.services_stock import InsufficientStock, StockHoldService, StockReservationService
 from stores.models import Store
 from locations.models import Address
 from core.models import Setting
+from core.pagination import KeysetPaginationMixin
 
 class CartView(TemplateView):
     template_name = 'orders/cart.html'
@@ -149,14 +152,19 @@ def add_to_cart_view(request):
                 }
             })
         
-        store_product = get_object_or_404(StoreProduct, id=store_product_id)
-        
         if not request.user.is_authenticated:
+            get_object_or_404(StoreProduct, id=store_product_id)
             return JsonResponse({
                 'success': False,
                 'message': 'Please login to add items to cart',
             })
         
+        # One query: the offer plus the units other customers hold in checkout
+        store_product = get_object_or_404(
+            StockHoldService.with_held_quantity(StoreProduct.objects.all(), exclude_user=request.user),
+            id=store_product_id
+        )
+        
         # Check if product is available
         if not store_product.is_available:
             return JsonResponse({
@@ -164,6 +172,12 @@ def add_to_cart_view(request):
                 'message': 'Product is currently not available'
             })
         
+        if quantity > store_product.available_to_sell:
+            return JsonResponse({
+                'success': False,
+                'message': f'Only {store_product.available_to_sell} available right now'
+            })
+        
         # Get or create cart for this store
         cart, created = Cart.objects.get_or_create(
             user=request.user,
@@ -187,6 +201,11 @@ def add_to_cart_view(request):
         )
         
         if not created:
+            if cart_item.quantity + quantity > store_product.available_to_sell:
+                return JsonResponse({
+                    'success': False,
+                    'message': f'Only {store_product.available_to_sell} available right now'
+                })
             # Update quantity if item already exists
             cart_item.quantity += quantity
             cart_item.save()
@@ -415,6 +434,9 @@ class CheckoutView(LoginRequiredMixin, TemplateView):
                 is_active=True
             ).select_related('store').prefetch_related('items__store_product__product')
         
+        # Set the checkout quantities aside for a few minutes
+        StockHoldService.hold_carts(self.request.user, carts)
+        
         # Get user's addresses
         addresses = Address.objects.filter(user=self.request.user).order_by('-is_default', '-created_at')
         
@@ -428,6 +450,7 @@ class CheckoutView(LoginRequiredMixin, TemplateView):
             'total_items': total_items,
             'total_amount': total_amount,
             'store_code': store_code,
+            'stock_hold_minutes': StockHoldService.hold_minutes(),
         })
         
         return context
@@ -461,52 +484,64 @@ class CheckoutView(LoginRequiredMixin, TemplateView):
             else:
                 carts = Cart.objects.filter(user=request.user, is_active=True)
             
-            if not carts.exists():
+            carts = list(carts.select_related('store'))
+            if not carts:
                 return redirect('orders:cart')
             
-            # Create orders for each cart
-            orders_created = []
+            # Prevent order creation if any store is closed
             for cart in carts:
-                # Calculate order totals
-                subtotal = cart.subtotal
-                # Prevent order creation if the store is closed
                 if cart.store.status != 'open':
                     # Return the user to cart with an error message
                     from django.contrib import messages
                     messages.error(request, f"Store '{cart.store.name}' is currently closed and cannot accept orders.")
                     return redirect('orders:cart')
-                delivery_fee = Decimal('0.00')  # Free delivery for now
-                tax_amount = Decimal('0.00')   # No tax for now
-                discount_amount = Decimal('0.00')  # No discount for now
-                total_amount = subtotal + delivery_fee + tax_amount - discount_amount
-                
-                order = Order.objects.create(
-                    user=request.user,
-                    store=cart.store,
-                    delivery_address_id=address_id,
-                    status='placed',
-                    payment_method=payment_method,  # Use selected payment method
-                    subtotal=subtotal,
-                    delivery_fee=delivery_fee,
-                    tax_amount=tax_amount,
-                    discount_amount=discount_amount,
-                    total_amount=total_amount
-                )
-                
-                # Create order items
-                for cart_item in cart.items.all():
-                    OrderItem.objects.create(
-                        order=order,
-                        store_product=cart_item.store_product,
-                        quantity=cart_item.quantity,
-                        unit_price=cart_item.price_at_add
-                    )
-                
-                # Mark cart as inactive
-                cart.is_active = False
-                cart.save()
-                
-                orders_created.append(order)
+            
+            # Create orders for each cart; stock is reserved per order and a
+            # short line rolls back every order of this checkout
+            orders_created = []
+            try:
+                with transaction.atomic():
+                    for cart in carts:
+                        # Calculate order totals
+                        subtotal = cart.subtotal
+                        delivery_fee = Decimal('0.00')  # Free delivery for now
+                        tax_amount = Decimal('0.00')   # No tax for now
+                        discount_amount = Decimal('0.00')  # No discount for now
+                        total_amount = subtotal + delivery_fee + tax_amount - discount_amount
+                        
+                        order = Order.objects.create(
+                            user=request.user,
+                            store=cart.store,
+                            delivery_address_id=address_id,
+                            status='placed',
+                            payment_method=payment_method,  # Use selected payment method
+                            subtotal=subtotal,
+                            delivery_fee=delivery_fee,
+                            tax_amount=tax_amount,
+                            discount_amount=discount_amount,
+                            total_amount=total_amount
+                        )
+                        
+                        # Create order items
+                        for cart_item in cart.items.all():
+                            OrderItem.objects.create(
+                                order=order,
+                                store_product=cart_item.store_product,
+                                quantity=cart_item.quantity,
+                                unit_price=cart_item.price_at_add
+                            )
+                        
+                        StockReservationService.reserve_order(order)
+                        
+                        # Mark cart as inactive
+                        cart.is_active = False
+                        cart.save()
+                        
+                        orders_created.append(order)
+            except InsufficientStock as e:
+                from django.contrib import messages
+                messages.error(request, f"{e}. Please update your cart and try again.")
+                return redirect('orders:cart')
             
             # Handle payment based on selected method
             if payment_method in ['upi', 'card']:
@@ -605,7 +640,7 @@ class CheckoutPaymentView(LoginRequiredMixin, TemplateView):
 class CheckoutConfirmationView(LoginRequiredMixin, TemplateView):
     template_name = 'orders/checkout_confirmation.html'
 
-class OrderListView(LoginRequiredMixin, ListView):
+class OrderListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     template_name = 'orders/order_list.html'
     context_object_name = 'orders'
     paginate_by = 20
@@ -614,7 +649,7 @@ class OrderListView(LoginRequiredMixin, ListView):
         # Return orders for the current user, newest first
         return Order.objects.filter(user=self.request.user).select_related(
             'store', 'delivery_address'
-        ).prefetch_related('items__store_product__product').order_by('-created_at')
+        ).prefetch_related('items__store_product__product').order_by('-created_at', '-id')
 
 class OrderDetailView(LoginRequiredMixin, DetailView):
     model = Order
@@ -726,6 +761,7 @@ class CancelOrderView(LoginRequiredMixin, TemplateView):
                 order.customer_notes = cancellation_details
                 
             order.save()
+            StockReservationService.release_order(order)
             return redirect('orders:order_list')
             
         except Order.DoesNotExist:
@@ -279,17 +279,18 @@ class PaymentProcessor:
     def _handle_successful_payment(self, transaction: PaymentTransaction):
         """Handle post-payment success actions"""
         try:
-            # Send payment confirmation notification
-            from core.services_notifications import send_order_notification
-            send_order_notification(
-                order=transaction.order,
-                notification_type='order_confirmed',
-                context={'payment_amount': str(transaction.amount)}
-            )
+            # Confirm through the workflow so stock is re-reserved (or the order held)
+            from orders.services import OrderWorkflowService
+            OrderWorkflowService.handle_payment_success(transaction.order)
             
-            # Update order status
-            transaction.order.status = 'confirmed'
-            transaction.order.save()
+            # Send payment confirmation notification
+            if transaction.order.status == 'confirmed':
+                from core.services_notifications import send_order_notification
+                send_order_notification(
+                    order=transaction.order,
+                    notification_type='order_confirmed',
+                    context={'payment_amount': str(transaction.amount)}
+                )
             
             # Cache successful payment for analytics
             cache.set(
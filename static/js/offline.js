@@ -442,6 +442,13 @@ class PWAManager {
             
             stockSocket.onmessage = (event) => {
                 const data = JSON.parse(event.data);
+                if (data.type === 'stock_batch') {
+                    // Coalesced rows of [product_id, store_id, stock_quantity, is_available]
+                    data.changes.forEach(([product_id, store_id, stock_quantity, is_available]) => {
+                        this.handleStockUpdate({ product_id, store_id, stock_quantity, is_available });
+                    });
+                    return;
+                }
                 this.handleStockUpdate(data);
             };
             
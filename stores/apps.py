@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class StoresConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'stores'
+    
+    def ready(self):
+        # Import signals
+        import stores.signals
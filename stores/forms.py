@@ -46,6 +46,13 @@ class StoreZipCoverageForm(forms.Form):
             if not created:
                 coverage.is_active = True
                 coverage.save()
+        
+        # The bulk deactivation above bypasses post_save signals
+        from stores.services import StoreCoverageService, ZipServiceResolver
+        from catalog.services_listing import ZipCatalogService
+        ZipServiceResolver.invalidate()
+        StoreCoverageService.invalidate()
+        ZipCatalogService.schedule_store(self.store.id)
 
 
 class DeliveryAgentZipCoverageForm(forms.Form):
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 06:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0006_alter_storestaff_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='store',
+            name='banner_image_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='logo_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -37,6 +37,8 @@ class Store(TimeStampedModel):
     # Branding
     logo = models.ImageField(upload_to='store_logos/', blank=True, null=True)
     banner_image = models.ImageField(upload_to='store_banners/', blank=True, null=True)
+    logo_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    banner_image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     
     # Business Hours (stored as JSON for flexibility)
     business_hours = models.JSONField(default=dict, blank=True)
@@ -58,8 +60,6 @@ class Store(TimeStampedModel):
     @property
     def is_open(self):
         from django.utils import timezone
-        from datetime import datetime, time
-        import json
         
         if self.status != 'open':
             return False
@@ -73,8 +73,15 @@ class Store(TimeStampedModel):
         if active_closure:
             return False
         
+        return self.is_within_business_hours()
+    
+    def is_within_business_hours(self, now=None):
+        """Check business hours only (no closure lookup, so no queries)"""
+        from django.utils import timezone
+        from datetime import datetime
+        
         # Check business hours
-        now = timezone.now()
+        now = now or timezone.now()
         weekday = now.strftime('%A').lower()
         
         if self.business_hours and weekday in self.business_hours:
@@ -24,6 +24,7 @@ from .models import Store
 from orders.models import Order, OrderStatusHistory
 from orders.services import OrderStatusService, OrderWorkflowService, OrderAnalyticsService
 from core.decorators import store_required, StoreRequiredMixin
+from core.pagination import KeysetPaginationMixin
 
 
 class StoreOrderDashboardView(StoreRequiredMixin, TemplateView):
@@ -89,7 +90,7 @@ class StoreOrderDashboardView(StoreRequiredMixin, TemplateView):
         return context
 
 
-class StoreOrderListView(StoreRequiredMixin, ListView):
+class StoreOrderListView(StoreRequiredMixin, KeysetPaginationMixin, ListView):
     """Enhanced store order list with advanced filtering - Store Owner Only"""
     model = Order
     template_name = 'stores/orders/list.html'
@@ -151,14 +152,17 @@ class StoreOrderListView(StoreRequiredMixin, ListView):
             )
         
         # Sort orders
-        sort_by = self.request.GET.get('sort', '-created_at')
-        if sort_by in ['-created_at', 'created_at', '-total_amount', 'total_amount', 'status']:
-            queryset = queryset.order_by(sort_by)
-        else:
-            queryset = queryset.order_by('-created_at')
+        queryset = queryset.order_by(*self.get_keyset_ordering())
         
         return queryset
     
+    def get_keyset_ordering(self):
+        sort_by = self.request.GET.get('sort', '-created_at')
+        if sort_by not in ['-created_at', 'created_at', '-total_amount', 'total_amount', 'status']:
+            sort_by = '-created_at'
+        # Trailing id keeps the ordering total for cursor pagination
+        return (sort_by, '-id' if sort_by.startswith('-') else 'id')
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
@@ -0,0 +1,258 @@
+"""
+Store coverage services
+Resolves customer ZIP codes into the stores that serve them, and keeps a
+process-local store x store coverage overlap index
+"""
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+import logging
+import threading
+import time
+
+from core.cache_utils import bump_cache_version, get_cache_version, versioned_key
+
+logger = logging.getLogger(__name__)
+
+
+class ZipServiceResolver:
+    """
+    Cached, versioned mapping of ZipArea.zip_code -> ordered serving stores.
+
+    Each entry holds the ZipArea itself plus, per store, the coverage
+    overrides (delivery fee, minimum order value, ETA) and the end of any
+    approved closure. The namespace version is bumped by signals on Store,
+    StoreZipCoverage, StoreClosureRequest and ZipArea (see stores.signals).
+    """
+    CACHE_NAMESPACE = 'zip_service'
+    CACHE_TIMEOUT = 300
+
+    @classmethod
+    def invalidate(cls):
+        """Drop every cached ZIP resolution"""
+        bump_cache_version(cls.CACHE_NAMESPACE)
+
+    @classmethod
+    def resolve(cls, zip_code):
+        """Return the cached entry for a ZIP code, or None if it is not served"""
+        if not zip_code:
+            return None
+
+        cache_key = versioned_key(cls.CACHE_NAMESPACE, zip_code)
+        entry = cache.get(cache_key)
+        if entry is None:
+            entry = cls._build_entry(zip_code)
+            cache.set(cache_key, entry, timeout=cls.CACHE_TIMEOUT)
+
+        # Unknown ZIPs are cached as an empty dict to avoid repeated lookups
+        return entry or None
+
+    @classmethod
+    def _build_entry(cls, zip_code):
+        from locations.models import ZipArea
+        from stores.models import StoreZipCoverage, StoreClosureRequest
+
+        try:
+            zip_area = ZipArea.objects.get(zip_code=zip_code, is_active=True)
+        except ZipArea.DoesNotExist:
+            return {}
+
+        coverages = list(
+            StoreZipCoverage.objects.filter(
+                zip_area=zip_area,
+                is_active=True,
+                store__is_active=True,
+                store__status='open'
+            ).select_related('store').order_by('store__name')
+        )
+
+        # Latest approved closure end per store, resolved against "now" at read time
+        closures = dict(
+            StoreClosureRequest.objects.filter(
+                store_id__in=[coverage.store_id for coverage in coverages],
+                status='approved',
+                requested_until__gt=timezone.now()
+            ).values('store_id').annotate(
+                closed_until=Max('requested_until')
+            ).values_list('store_id', 'closed_until')
+        )
+
+        stores = []
+        for coverage in coverages:
+            coverage.zip_area = zip_area
+            stores.append({
+                'store': coverage.store,
+                'store_id': coverage.store_id,
+                'delivery_fee': coverage.get_delivery_fee(),
+                'min_order_value': coverage.get_min_order_value(),
+                'delivery_time': coverage.get_delivery_time(),
+                'closed_until': closures.get(coverage.store_id),
+            })
+
+        return {
+            'zip_area': zip_area,
+            'stores': stores,
+        }
+
+    @classmethod
+    def _active_stores(cls, zip_code):
+        entry = cls.resolve(zip_code)
+        if not entry:
+            return []
+
+        now = timezone.now()
+        return [
+            item for item in entry['stores']
+            if not item['closed_until'] or item['closed_until'] <= now
+        ]
+
+    @classmethod
+    def get_zip_area(cls, zip_code):
+        """Return the active ZipArea for a ZIP code, or None"""
+        entry = cls.resolve(zip_code)
+        return entry['zip_area'] if entry else None
+
+    @classmethod
+    def get_store_ids(cls, zip_code):
+        """Ordered IDs of open, active stores covering the ZIP"""
+        return [item['store_id'] for item in cls._active_stores(zip_code)]
+
+    @classmethod
+    def get_all_store_ids(cls, zip_code):
+        """IDs of every open, active store covering the ZIP, including those in a closure"""
+        entry = cls.resolve(zip_code)
+        return [item['store_id'] for item in entry['stores']] if entry else []
+
+    @classmethod
+    def get_stores(cls, zip_code):
+        """Ordered Store instances covering the ZIP (served from cache)"""
+        return [item['store'] for item in cls._active_stores(zip_code)]
+
+    @classmethod
+    def get_coverage(cls, zip_code, store_id):
+        """Delivery fee, minimum order value and ETA for a store in a ZIP"""
+        for item in cls._active_stores(zip_code):
+            if item['store_id'] == store_id:
+                return {
+                    'delivery_fee': item['delivery_fee'],
+                    'min_order_value': item['min_order_value'],
+                    'delivery_time': item['delivery_time'],
+                }
+        return None
+
+    @classmethod
+    def get_best_store(cls, zip_code):
+        """First store covering the ZIP that is currently within business hours"""
+        now = timezone.now()
+        for item in cls._active_stores(zip_code):
+            if item['store'].is_within_business_hours(now):
+                return item['store']
+        return None
+
+
+class StoreCoverageIndex:
+    """
+    Active ZIP coverage of active stores as one bitset per store (bit i set
+    when the store covers the i-th ZipArea), plus the per-ZIP store lists
+    and the store x store overlap counts derived from them
+    """
+    __slots__ = ('positions', 'zip_ids_by_code', 'bits', 'stores_by_zip', 'neighbors', 'generation', 'built_at')
+
+    def __init__(self, rows, generation):
+        self.positions = {}
+        self.zip_ids_by_code = {}
+        self.bits = {}
+        stores_by_zip = {}
+        for store_id, zip_area_id, zip_code in rows:
+            position = self.positions.setdefault(zip_area_id, len(self.positions))
+            self.zip_ids_by_code[zip_code] = zip_area_id
+            self.bits[store_id] = self.bits.get(store_id, 0) | (1 << position)
+            stores_by_zip.setdefault(zip_area_id, set()).add(store_id)
+        self.stores_by_zip = {
+            zip_area_id: tuple(sorted(store_ids)) for zip_area_id, store_ids in stores_by_zip.items()
+        }
+
+        # Only stores that share at least one ZIP area are paired
+        self.neighbors = {store_id: {} for store_id in self.bits}
+        for store_ids in self.stores_by_zip.values():
+            for store_id in store_ids:
+                row = self.neighbors[store_id]
+                for other_id in store_ids:
+                    if other_id != store_id and other_id not in row:
+                        row[other_id] = (self.bits[store_id] & self.bits[other_id]).bit_count()
+
+        self.generation = generation
+        self.built_at = time.monotonic()
+
+    def is_current(self, generation, max_age):
+        return self.generation == generation and time.monotonic() - self.built_at < max_age
+
+
+class StoreCoverageService:
+    """
+    In-memory coverage lookups used by transfer suggestions
+    (catalog.services_inventory.TransferOptimizer) and the cross-store
+    inventory view. Delivery agent assignment does not use it. Each worker
+    builds the index with one query and rebuilds it lazily once the
+    namespace version is bumped by the Store, StoreZipCoverage and ZipArea
+    signals (see stores.signals).
+    """
+    CACHE_NAMESPACE = 'store_coverage'
+    # Safety net for bulk writes that bypass the signals
+    MAX_INDEX_AGE = 3600
+
+    _index = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def invalidate(cls):
+        """Rebuild every worker's coverage index on its next lookup"""
+        bump_cache_version(cls.CACHE_NAMESPACE)
+
+    @classmethod
+    def get_index(cls):
+        generation = get_cache_version(cls.CACHE_NAMESPACE)
+        index = cls._index
+        if index is not None and index.is_current(generation, cls.MAX_INDEX_AGE):
+            return index
+
+        with cls._lock:
+            # Another thread may have rebuilt it while we waited
+            index = cls._index
+            if index is None or not index.is_current(generation, cls.MAX_INDEX_AGE):
+                index = StoreCoverageIndex(cls._load_rows(), generation)
+                cls._index = index
+        return index
+
+    @staticmethod
+    def _load_rows():
+        from stores.models import StoreZipCoverage
+
+        return list(
+            StoreZipCoverage.objects.filter(
+                is_active=True, store__is_active=True
+            ).values_list('store_id', 'zip_area_id', 'zip_area__zip_code')
+        )
+
+    @classmethod
+    def overlap(cls, store_a, store_b):
+        """Number of ZIP areas both stores actively cover"""
+        index = cls.get_index()
+        return (
+            index.bits.get(getattr(store_a, 'pk', store_a), 0) & index.bits.get(getattr(store_b, 'pk', store_b), 0)
+        ).bit_count()
+
+    @classmethod
+    def stores_covering(cls, zip_area):
+        """IDs of active stores covering a ZipArea (instance, ID or zip code string)"""
+        index = cls.get_index()
+        if isinstance(zip_area, str):
+            zip_area_id = index.zip_ids_by_code.get(zip_area)
+        else:
+            zip_area_id = getattr(zip_area, 'pk', zip_area)
+        return index.stores_by_zip.get(zip_area_id, ())
+
+    @classmethod
+    def neighbors(cls, store):
+        """{store_id: shared ZIP areas} for every other store overlapping this one"""
+        return cls.get_index().neighbors.get(getattr(store, 'pk', store), {})
@@ -0,0 +1,39 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.services_images import ImageDerivativeService
+from locations.models import ZipArea
+from .models import Store, StoreZipCoverage, StoreClosureRequest
+from .services import StoreCoverageService, ZipServiceResolver
+
+
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+@receiver(post_save, sender=StoreZipCoverage)
+@receiver(post_delete, sender=StoreZipCoverage)
+@receiver(post_save, sender=StoreClosureRequest)
+@receiver(post_delete, sender=StoreClosureRequest)
+@receiver(post_save, sender=ZipArea)
+@receiver(post_delete, sender=ZipArea)
+def invalidate_zip_service_cache(sender, instance, **kwargs):
+    """Any coverage-related change invalidates the ZIP -> stores resolution"""
+    ZipServiceResolver.invalidate()
+
+
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+@receiver(post_save, sender=StoreZipCoverage)
+@receiver(post_delete, sender=StoreZipCoverage)
+@receiver(post_save, sender=ZipArea)
+@receiver(post_delete, sender=ZipArea)
+def invalidate_store_coverage_index(sender, instance, update_fields=None, **kwargs):
+    """Store activation, coverage rows and zip codes feed the overlap index"""
+    if sender is Store and update_fields is not None and 'is_active' not in update_fields:
+        return
+    StoreCoverageService.invalidate()
+
+
+@receiver(post_save, sender=Store)
+def schedule_store_image_derivatives(sender, instance, update_fields=None, **kwargs):
+    for field_name in ('logo', 'banner_image'):
+        if update_fields is None or field_name in update_fields:
+            ImageDerivativeService.schedule(instance, field_name)
@@ -47,7 +47,11 @@ urlpatterns = [
     path('bulk-import/', views_bulk_import.bulk_import_products, name='bulk_import'),
     path('bulk-import/validate/', views_bulk_import.validate_csv_data, name='validate_csv'),
     path('bulk-import/history/', views_bulk_import.import_history, name='import_history'),
+    path('bulk-import/jobs/<int:job_id>/', views_bulk_import.import_job_status, name='import_job_status'),
+    path('bulk-import/jobs/<int:job_id>/diff/', views_bulk_import.import_job_diff, name='import_job_diff'),
+    path('bulk-import/jobs/<int:job_id>/apply/', views_bulk_import.import_job_apply, name='import_job_apply'),
     path('bulk-import/sample-csv/', views_bulk_import.download_sample_csv, name='sample_csv'),
+    path('bulk-import/export/', views_bulk_import.export_catalog, name='export_catalog'),
     
     # ZIP Area Management
     path('zip-coverage/', views.manage_zip_coverage, name='manage_zip_coverage'),
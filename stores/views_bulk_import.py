@@ -2,15 +2,19 @@
 CSV Bulk Import System for Products
 """
 import csv
-import io
-from decimal import Decimal, InvalidOperation
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import slugify
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
+from django.core.paginator import Paginator
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.http import require_POST
-from django.db import transaction
-from django.utils.text import slugify
-from catalog.models import Product, StoreProduct, Category
+from catalog.models import Category, ImportJob
+from catalog.services_export import ProductExportService
+from catalog.services_import import (
+    REQUIRED_HEADERS, ImportJobService, missing_headers, read_csv
+)
 from stores.models import Store
 
 @login_required
@@ -53,25 +57,24 @@ def handle_csv_upload(request, store):
         })
     
     try:
-        # Read and process CSV
-        csv_data = csv_file.read().decode('utf-8')
-        csv_reader = csv.DictReader(io.StringIO(csv_data))
+        # Check the header row now; the rows themselves are imported in the background
+        csv_reader = read_csv(csv_file)
         
         # Validate headers
-        required_headers = ['name', 'category', 'price', 'weight', 'unit_type']
-        if not all(header in csv_reader.fieldnames for header in required_headers):
+        if missing_headers(csv_reader):
             return JsonResponse({
                 'success': False,
-                'message': f'CSV must contain these headers: {", ".join(required_headers)}'
+                'message': f'CSV must contain these headers: {", ".join(REQUIRED_HEADERS)}'
             })
         
-        # Process rows
-        results = process_csv_rows(csv_reader, store)
+        csv_file.seek(0)
+        job = ImportJobService.create_job(store, csv_file, user=request.user)
         
         return JsonResponse({
             'success': True,
-            'message': f'Import completed: {results["created"]} created, {results["updated"]} updated, {results["errors"]} errors',
-            'details': results
+            'message': 'Import queued',
+            'job': ImportJobService.serialize(job),
+            'status_url': reverse('stores:import_job_status', args=[job.pk])
         })
         
     except Exception as e:
@@ -80,105 +83,14 @@ def handle_csv_upload(request, store):
             'message': f'Error processing CSV: {str(e)}'
         })
 
-def process_csv_rows(csv_reader, store):
-    """Process each row in the CSV"""
-    results = {
-        'created': 0,
-        'updated': 0,
-        'errors': 0,
-        'error_details': []
-    }
-    
-    with transaction.atomic():
-        for row_num, row in enumerate(csv_reader, start=2):  # Start at 2 because row 1 is headers
-            try:
-                process_single_row(row, store, results)
-            except Exception as e:
-                results['errors'] += 1
-                results['error_details'].append({
-                    'row': row_num,
-                    'error': str(e),
-                    'data': row
-                })
-    
-    return results
-
-def process_single_row(row, store, results):
-    """Process a single CSV row"""
-    # Extract and validate data
-    name = row['name'].strip()
-    category_name = row['category'].strip()
-    price_str = row['price'].strip()
-    weight_str = row['weight'].strip()
-    unit_type = row.get('unit_type', 'grams').strip()
-    description = row.get('description', '').strip()
-    sku = row.get('sku', '').strip()
-    brand = row.get('brand', '').strip()
-    stock_quantity_str = row.get('stock_quantity', '0').strip()
-    is_featured = row.get('is_featured', '').lower() in ['true', 'yes', '1']
-    
-    if not all([name, category_name, price_str, weight_str]):
-        raise ValueError("Missing required fields: name, category, price, or weight")
-    
-    # Validate and convert numeric fields
-    try:
-        price = Decimal(price_str)
-        weight = Decimal(weight_str)
-        stock_quantity = int(stock_quantity_str) if stock_quantity_str else 0
-    except (InvalidOperation, ValueError) as e:
-        raise ValueError(f"Invalid numeric value: {e}")
-    
-    # Get or create category
-    category, created = Category.objects.get_or_create(
-        name=category_name,
-        defaults={
-            'slug': slugify(category_name),
-            'is_active': True
-        }
-    )
-    
-    # Generate slug for product
-    slug = slugify(name)
-    
-    # Make slug unique if needed
-    base_slug = slug
-    counter = 1
-    while Product.objects.filter(slug=slug).exists():
-        slug = f"{base_slug}-{counter}"
-        counter += 1
-    
-    # Get or create product
-    product, product_created = Product.objects.get_or_create(
-        name=name,
-        defaults={
-            'slug': slug,
-            'description': description or f"Fresh {name.lower()} delivered to your doorstep",
-            'category': category,
-            'sku': sku,
-            'brand': brand,
-            'weight_per_unit': weight,
-            'unit_type': unit_type,
-            'is_active': True
-        }
-    )
-    
-    # Create or update store product
-    store_product, sp_created = StoreProduct.objects.update_or_create(
-        store=store,
-        product=product,
-        defaults={
-            'price': price,
-            'stock_quantity': stock_quantity,
-            'is_available': True,
-            'availability_status': 'in_stock' if stock_quantity > 0 else 'out_of_stock',
-            'is_featured': is_featured
-        }
-    )
-    
-    if sp_created or product_created:
-        results['created'] += 1
-    else:
-        results['updated'] += 1
+@login_required
+def import_job_status(request, job_id):
+    """Polling endpoint for an import job's progress"""
+    job = get_object_or_404(ImportJob, pk=job_id, store__owner=request.user)
+    return JsonResponse({
+        'success': True,
+        'job': ImportJobService.serialize(job)
+    })
 
 def download_sample_csv(request):
     """Download a sample CSV file for bulk import"""
@@ -211,84 +123,49 @@ def download_sample_csv(request):
     return response
 
 @login_required
-def import_history(request):
-    """Show import history for the store"""
-    user_store = Store.objects.filter(owner=request.user).first()
-    if not user_store:
-        return redirect('stores:dashboard')
-    
-    # Get recent products added to this store
-    recent_products = StoreProduct.objects.filter(
-        store=user_store
-    ).select_related('product').order_by('-created_at')[:50]
-    
-    context = {
-        'store': user_store,
-        'recent_products': recent_products
-    }
-    
-    return render(request, 'stores/import_history.html', context)
-
 def validate_csv_data(request):
-    """Validate CSV data before actual import"""
+    """Dry run: stage the CSV and diff it against the store's current offers"""
     if request.method != 'POST' or 'csv_file' not in request.FILES:
         return JsonResponse({
             'success': False,
             'message': 'No CSV file provided'
         })
     
+    user_store = Store.objects.filter(owner=request.user).first()
+    if not user_store:
+        return JsonResponse({
+            'success': False,
+            'message': 'No store found for this account'
+        })
+    
     csv_file = request.FILES['csv_file']
     
     try:
-        csv_data = csv_file.read().decode('utf-8')
-        csv_reader = csv.DictReader(io.StringIO(csv_data))
-        
-        validation_results = {
-            'total_rows': 0,
-            'valid_rows': 0,
-            'invalid_rows': 0,
-            'errors': []
-        }
-        
-        required_headers = ['name', 'category', 'price', 'weight', 'unit_type']
-        
         # Check headers
-        if not all(header in csv_reader.fieldnames for header in required_headers):
+        if missing_headers(read_csv(csv_file)):
             return JsonResponse({
                 'success': False,
-                'message': f'Missing required headers: {required_headers}'
+                'message': f'Missing required headers: {REQUIRED_HEADERS}'
             })
         
-        # Validate each row
-        for row_num, row in enumerate(csv_reader, start=2):
-            validation_results['total_rows'] += 1
-            
-            try:
-                # Basic validation
-                if not row['name'].strip():
-                    raise ValueError("Product name is required")
-                
-                if not row['category'].strip():
-                    raise ValueError("Category is required")
-                
-                # Validate price
-                Decimal(row['price'])
-                
-                # Validate weight
-                Decimal(row['weight'])
-                
-                validation_results['valid_rows'] += 1
-                
-            except Exception as e:
-                validation_results['invalid_rows'] += 1
-                validation_results['errors'].append({
-                    'row': row_num,
-                    'error': str(e)
-                })
+        csv_file.seek(0)
+        job, diff_rows = ImportJobService.create_preview(user_store, csv_file, user=request.user)
+        summary = job.preview_summary
+        errors = [row for row in diff_rows if row['action'] == 'error']
         
         return JsonResponse({
             'success': True,
-            'validation_results': validation_results
+            'validation_results': {
+                'total_rows': summary['total_rows'],
+                'valid_rows': summary['total_rows'] - summary['errors'],
+                'invalid_rows': summary['errors'],
+                'errors': [{'row': row['row'], 'error': row['error']} for row in errors[:100]]
+            },
+            'summary': summary,
+            'diff': paginate_diff(diff_rows, request.GET),
+            'job': ImportJobService.serialize(job),
+            'diff_url': reverse('stores:import_job_diff', args=[job.pk]),
+            'apply_url': reverse('stores:import_job_apply', args=[job.pk])
         })
         
     except Exception as e:
@@ -297,6 +174,79 @@ def validate_csv_data(request):
             'message': f'Error validating CSV: {str(e)}'
         })
 
+def paginate_diff(diff_rows, params):
+    """One page of dry-run diff rows, optionally limited to one action"""
+    action = params.get('action')
+    if action:
+        diff_rows = [row for row in diff_rows if row['action'] == action]
+    
+    try:
+        per_page = min(max(int(params.get('per_page', 100)), 1), 500)
+    except ValueError:
+        per_page = 100
+    page = Paginator(diff_rows, per_page).get_page(params.get('page'))
+    
+    return {
+        'rows': list(page.object_list),
+        'page': page.number,
+        'num_pages': page.paginator.num_pages,
+        'count': page.paginator.count,
+        'has_next': page.has_next(),
+    }
+
+@login_required
+def import_job_diff(request, job_id):
+    """Paginated dry-run diff of a previewed import"""
+    job = get_object_or_404(ImportJob, pk=job_id, store__owner=request.user)
+    if job.status != 'draft':
+        return JsonResponse({
+            'success': False,
+            'message': 'This import has already been applied'
+        }, status=409)
+    
+    return JsonResponse({
+        'success': True,
+        'summary': job.preview_summary,
+        'diff': paginate_diff(ImportJobService.get_preview_rows(job), request.GET)
+    })
+
+@require_POST
+@login_required
+def import_job_apply(request, job_id):
+    """Apply a previewed import in the background"""
+    job = get_object_or_404(ImportJob, pk=job_id, store__owner=request.user)
+    if not ImportJobService.apply(job):
+        return JsonResponse({
+            'success': False,
+            'message': 'This import has already been applied'
+        }, status=409)
+    
+    return JsonResponse({
+        'success': True,
+        'message': 'Import queued',
+        'job': ImportJobService.serialize(job),
+        'status_url': reverse('stores:import_job_status', args=[job.pk])
+    })
+
+@login_required
+def export_catalog(request):
+    """Stream the store's catalog as CSV (re-importable) or NDJSON"""
+    user_store = Store.objects.filter(owner=request.user).first()
+    if not user_store:
+        return redirect('stores:dashboard')
+    
+    export = ProductExportService(user_store)
+    export_format = request.GET.get('format', 'csv')
+    filename = f"{slugify(user_store.name)}-catalog-{timezone.now():%Y%m%d}"
+    
+    if export_format == 'ndjson':
+        response = StreamingHttpResponse(export.iter_ndjson(), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.ndjson"'
+    else:
+        response = StreamingHttpResponse(export.iter_csv(), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
 @login_required
 def download_sample_csv(request):
     """Download a sample CSV file for bulk import"""
@@ -337,19 +287,18 @@ def download_sample_csv(request):
 
 @login_required 
 def import_history(request):
-    """View import history for the store owner"""
+    """View import job history for the store owner"""
     user_store = Store.objects.filter(owner=request.user).first()
     if not user_store:
         return redirect('stores:dashboard')
     
-    # For now, show recent products added by this store
-    recent_imports = StoreProduct.objects.filter(
+    import_jobs = ImportJob.objects.filter(
         store=user_store
-    ).select_related('product', 'product__category').order_by('-created_at')[:50]
+    ).select_related('created_by')[:50]
     
     context = {
         'store': user_store,
-        'recent_imports': recent_imports,
+        'import_jobs': import_jobs,
     }
     
     return render(request, 'stores/import_history.html', context)
@@ -13,7 +13,9 @@ from django.db.models import Q, Sum, Count
 from datetime import datetime, timedelta
 import json
 
-from .models import Store, StoreProduct
+from .models import Store
+from catalog.models import StoreProduct
+from core.pagination import get_cursor_page, is_cursor_request
 from orders.models import Order, OrderItem, Cart
 from delivery_new.models import DeliveryAgent, Delivery
 from catalog.models import Product, Category
@@ -133,15 +135,18 @@ def store_orders(request):
         )
     
     # Order by creation time (newest first)
-    orders = orders.order_by('-created_at')
+    orders = orders.order_by('-created_at', '-id')
     
-    # Pagination
-    paginator = Paginator(orders, 20)
-    page_number = request.GET.get('page')
-    page_orders = paginator.get_page(page_number)
+    # Pagination (opt-in keyset mode with ?cursor=)
+    if is_cursor_request(request):
+        page_orders = get_cursor_page(request, orders, 20, ('-created_at', '-id'))
+    else:
+        paginator = Paginator(orders, 20)
+        page_number = request.GET.get('page')
+        page_orders = paginator.get_page(page_number)
     
     # Status choices for filter
-    status_choices = Order.STATUS_CHOICES
+    status_choices = Order.ORDER_STATUS
     
     context = {
         'store': store,